@@ -25,14 +25,27 @@
     File Input:  
         CSV File PPR_ALL.csv
 
+    Shared code:
+        Prices are converted and the year / month / county counts are made with the Stage2 modules (ppr_ingest.validate_price
+        and ppr_aggregate.SalesAggregator), so Stage1 and Stage2 give the same counts. Each row is counted once as it is read,
+        instead of rescanning the whole list for every unique county and month. Prices are counted in one pass (Counter).
+
     Columns:
         Date of Sale (dd/mm/yyyy),Address,Postal Code,County,Price (�),Not Full Market Price,VAT Exclusive,
         Description of Property,Property Size Description
 """
 
 
+from collections import Counter
 from string import ascii_letters
 import math
+import os
+import sys
+
+# Stage2 holds the shared parsing and aggregation code -> add it to the import path.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Stage2"))
+from ppr_aggregate import SalesAggregator
+from ppr_ingest import validate_price
 
 ########################## Pre-Processing starts here ##########################
 try:
@@ -61,6 +74,8 @@ try:
 
         # Frequency of pricing
         pricefrequency = []
+        # Year / month / county counts -> updated once per row as the lines are split. See Stage2/ppr_aggregate.py
+        aggregator = SalesAggregator()
 
         # index variable -> Program status control
         index = 0
@@ -140,24 +155,19 @@ try:
             descr = descr.strip()
 
             # Pricing Validation -> Need to convert to a number for analysis
-            for character in price:    
-                # Check character validity -> issue solved with diamond questionmark invalid character throwing error 
-                # as cast to float fails!
-                if not character.isascii() and not character.isalpha() and not character.isdigit() or character == '€':
-                    price = price.replace(character, "")
-                    continue
-                
-            # After processing the line, make ammendments to the number values:
+            # Euro sign / diamond questionmark invalid character removed by the shared price parser (same as Stage2).
             try:
-                price = float(price)
+                price = validate_price(price)
             except ValueError:
-                print(f"Problem converting price ({price}) to a float value. Line: 105 and index{index}")
+                print(f"Problem converting price ({price}) to a float value. Index: {index}")
+                raise
 
             # Once we have the line split completely, we need to now append to our lists.
             dos.append(d), address.append(a), pobox.append(
                 p),  county.append(c), fullmarketprice.append(f)
             vatexcl.append(v), description.append(
                 descr), priceList.append(price)
+            aggregator.add(d, a, c, descr, price)
 
             # Loading % for user - data preparation
             if int(rows_to_process * 0.25) == index:
@@ -174,61 +184,14 @@ try:
         else:
             print("Completed..")
 
-        # price frequency - > get a shortened version of list for later MODE check. Original way was counting for every single element 
-        # even duplicates.
-        # Issue being faced here is the runtime when counting. We are performing a county on every single element in pricelist n times.
-        # Possible more efficient to remove the element after looping over it or have a more filtered looping approach.
-        index = 0  # set index again to 0 for progress for pricing
-        uniquePrice = set(priceList)     
-        checkedPrice = []
-        temporary_price_list = sorted(list(priceList))
-
-        counter = 0
+        # price frequency -> one pass over the price list with a Counter, no rescan of the list per unique price.
+        # Prices are kept in ascending order for the MODE check -> the lowest price wins a tie, as before.
+        price_counts = Counter(priceList)
+        checkedPrice = sorted(price_counts)
+        pricefrequency = [price_counts[prc] for prc in checkedPrice]
         print()
-        print(f"Calculating frequency of pricing data [{len(uniquePrice)} unique prices of {len(priceList)} sales]..")
-        for prc in sorted(uniquePrice):  
-            index +=1
-            checkedPrice.append(prc)    # Use to index set price. Cannot index set values.
-
-            for pl in temporary_price_list:
-                if prc == pl:
-                    counter += 1
-                else:
-                    break
-            
-             # Now remove the price from the temporary list. We want to do this as the price has now been checked, so we dont want to keep repeating the process for max length
-            if counter != 0:            
-                pricefrequency.append(counter)
-                temporary_price_list = temporary_price_list[counter:]
-                counter = 0
-
-            #temporary_price_list = [x for x in temporary_price_list if x != prc]
-
-            # Loading % for user - pricing frequency preparation
-            if int(len(uniquePrice) * 0.05) == index:
-                print("Processing Status: 5% complete..")
-            if int(len(uniquePrice) * 0.10) == index:
-                print("Processing Status: 10% complete..")
-            if int(len(uniquePrice) * 0.20) == index:
-                print("Processing Status: 20% complete..")
-            if int(len(uniquePrice) * 0.30) == index:
-                print("Processing Status: 30% complete..")
-            if int(len(uniquePrice) * 0.40) == index:
-                print("Processing Status: 40% complete..")
-            if int(len(uniquePrice) * 0.50) == index:
-                print("Processing Status: 50% complete..")
-            if int(len(uniquePrice) * 0.60) == index:
-                print("Processing Status: 60% complete..")
-            if int(len(uniquePrice) * 0.70) == index:
-                print("Processing Status: 70% complete..")
-            if int(len(uniquePrice) * 0.80) == index:
-                print("Processing Status: 80% complete..")
-            if int(len(uniquePrice) * 0.90) == index:
-                print("Processing Status: 90% complete..")
-            if len(uniquePrice) == index:
-                print("Processing Status: 100% complete..")
-        else:
-            print("Completed..")
+        print(f"Calculating frequency of pricing data [{len(checkedPrice)} unique prices of {len(priceList)} sales]..")
+        print("Completed..")
         # User Message:
         print()
         print("Program status: Beginning further data processing:")
@@ -317,31 +280,17 @@ try:
         ################# Option 8 -> EXTRA PROCESSING INFORMATION
         # User Message:
         print("Processing status: 8.Additional Data Determination - Beginning.. ")
-        yearly_house_sales = []
         yearly_range = list(range(first_dos_year, last_dos_year +1))
-        indexes = []
-        # Yearly Range Indexes for amount of sales per year.
-        for year in yearly_range:
-            amount_per_year = len([i for i in dos if str(year) in i])         
-            yearly_house_sales.append(amount_per_year)
-            
-            if len(yearly_house_sales) == 1:
-                starting = 0
-                indexes.append(sum(priceList[starting:amount_per_year-1]))
-                starting = amount_per_year
-            else:
-                indexes.append(sum(priceList[starting:amount_per_year-1]))
-                starting = amount_per_year
+        # Amount of sales per year -> counted by the aggregator, no scan of the dates per year.
+        yearly_house_sales = [aggregator.year_counts.get(year, 0) for year in yearly_range]
 
         # User Message:
         print("Processing status: 8. - Yearly Range Statistics - Completed..")
         # Countys -> Create unique list of countys from data and then an index of total sold for each county
         unique_countys = set(county) 
         countys = list(sorted(unique_countys))    
-        county_sales_index = list()
-
-        for c in countys:
-            county_sales_index.append([len([i for i in county if str(c) in i])])
+        # Sales per county -> counted by the aggregator, no scan of the county list per county.
+        county_sales_index = [[aggregator.county_counts[c]] for c in countys]
 
         # User Message:
         print("Processing status: 8. - County Statistics - Completed..")
@@ -349,42 +298,9 @@ try:
         # User Message:
         print("Processing status: 8. - Monthly Statistics - Beginning..")
         # Months -> Most Common Month
-        unique_dates = set(dos)  # unique amounts of dates across all records.
-        dates_index = list()
-        checked_dates = list()
-
-        index = 0
-        counter = 0
-
-        for u_date in unique_dates:
-            # Set the date checking to only contain the month. Not interested in a specific day.
-            u_date = u_date[3:]
-            
-            if u_date not in checked_dates:
-                # try to split the search to not have to search all elements in the dos list -> that is an ordered list.     
-                for date in dos:
-                    if u_date in date[3:]:
-                        counter += 1
-
-                    if u_date[3:] != date[6:]:
-                        break
-                
-                dates_index.append(counter)
-                checked_dates.append(u_date)
-                
-                counter = 0
-            
-            index += 1
-
-            # Loading % for user - months mode preparation
-            if int(len(unique_dates) * 0.25) == index:
-                print("Processing Status: 25% complete..")
-            if int(len(unique_dates) * 0.50) == index:
-                print("Processing Status: 50% complete..")
-            if int(len(unique_dates) * 0.75) == index:
-                print("Processing Status: 75% complete..")
-            if len(unique_dates) == index:
-                print("Processing Status: 100% complete..")
+        # Sales per month (mm/yyyy) -> counted by the aggregator in the order the months first appear in the file.
+        checked_dates = list(aggregator.month_counts)
+        dates_index = list(aggregator.month_counts.values())
 
         # User Message:
         print("Processing status: 8. - Monthly Statistics - Completed..")
@@ -26,55 +26,71 @@
             ii, Bar Chart - Sales Over Counties
             iii, Bar Chart - Sales Per Month (Specify Year / All)
             iv, Pie Chart - Sales Over Years
+            v, Price Density - Price of Sales over Years (2-D histogram)
+            vi, Line Plot - Sales per Day (downsampled)
+            vii, Histogram / CDF - Price of Sales (fixed / log bins, All / County / Year)
+        11. Filtered Statistics - statistics of the sales matching county / description / year.. filters.
+        12. Export Cleaned Register - ISO dates, numeric prices, filtered rows, written as (compressed) csv.
     
     File Input:  
         CSV File PPR_ALL.csv
 
+    File Output:
+        PPR_OUT.csv  -> one csv row of the main results per run.
+        PPR_RESULTS/ -> summary, year, county, monthly series, price frequency and price histogram tables as csv, JSON Lines and Parquet (or .npz).
+                        See ppr_export.
+
+    Batch Mode (no user input):
+        Give one or more register files on the command line. Each file is processed in its own process and the chosen statistics,
+        the PPR_OUT summary, the result tables (csv / jsonl / columnar), a log and the chosen plots are written to the output directory. eg.
+            python AssignmentP3_Stage2.py PPR_2019.csv PPR_2020.csv --rows 0 --stats all --plots years months --output-dir results
+
+    Profiling (interactive and batch mode):
+        --profile prints the wall time, CPU time, rows per second, process peak memory and memory growth of each stage (ingest,
+        parse, frequency, aggregates, std dev, median, plots..) when the program ends. --profile-report saves it as JSON, --tracemalloc adds the
+        peak Python allocation and --cprofile saves cProfile stats. See ppr_profile.
+
     Columns:
         Date of Sale (dd/mm/yyyy),Address,Postal Code,County,Price (�),Not Full Market Price,VAT Exclusive,
         Description of Property,Property Size Description
 """
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout
 from sys import exit
-import math
+import argparse
+import os
+import time
 import matplotlib.pyplot as plt
+from ppr_aggregate import SalesAggregator
+from ppr_cache import append_register_cache, count_appended_rows, load_register_cache, read_cache_meta, read_checkpoint, save_register_cache
+from ppr_cube import SalesCube
+from ppr_export import EXPORT_FORMATS, append_summary_csv, export_clean_register, export_results
+from ppr_filter import FILTER_COLUMNS, BitmapIndex, filtered_statistics, parse_year_range
+from ppr_histogram import HISTOGRAM_BINS, HISTOGRAM_SCALES, PriceHistogram
+from ppr_index import DateIndex
+from ppr_ingest import count_register_rows, parse_register_parallel, stream_register_rows
+from ppr_plots import (PLOT_NAMES, daily_sales, draw_counties_bar, draw_daily_sales, draw_month_bar, draw_price_density, draw_price_histogram,
+                       draw_years_pie, draw_years_scatter, month_plot_jobs, plot_jobs, price_density, render_plots)
+from ppr_profile import PROFILER, ProgressReporter, install_profiling
+from ppr_stats import grouped_quantiles, price_frequency, price_quantiles, statistics_from_running, top_prices
+from ppr_table import SalesTable, SalesTableBuilder
+from ppr_timeseries import county_totals, monthly_series
+
+# Worker processes used to parse the file when all records are processed. 1 parses in the main process only.
+INGEST_WORKERS = os.cpu_count() or 1
+
+# Most common price points shown by option 6 and how they are counted.
+TOP_PRICES = 10
+TOP_PRICE_METHODS = ("exact", "space-saving")
+
+# How the medians / quartiles of option 5 are found -> exact (selection) or sketch (approximate, bounded memory).
+MEDIAN_METHODS = ("exact", "sketch")
+
+# Batch mode -> statistic name: main menu option, and the plots that can be saved.
+BATCH_STATISTICS = {"count": 1, "max": 2, "min": 3, "mean": 4, "median": 5, "mode": 6, "stddev": 7, "extra": 8}
+BATCH_PLOTS = PLOT_NAMES
 
 ############## Function Definition: ################
-def print_processing_status(index: int, max_rows: int):
-    """Function to output processing status for loop statements.
-
-    Args:
-        index (int): [Current loop index value]
-        max_rows (int): [Maximum loop size]
-    """
-    
-
-     # Loading % for user - data preparation
-    if int(max_rows * 0.05) == index:
-        print("Processing Status: 5% complete..")
-    if int(max_rows * 0.10) == index:
-        print("Processing Status: 10% complete..")
-    if int(max_rows * 0.20) == index:
-        print("Processing Status: 20% complete..")
-    if int(max_rows * 0.30) == index:
-        print("Processing Status: 30% complete..")
-    if int(max_rows * 0.40) == index:
-        print("Processing Status: 40% complete..")
-    if int(max_rows * 0.50) == index:
-        print("Processing Status: 50% complete..")
-    if int(max_rows * 0.60) == index:
-        print("Processing Status: 60% complete..")
-    if int(max_rows * 0.70) == index:
-        print("Processing Status: 70% complete..")
-    if int(max_rows * 0.80) == index:
-        print("Processing Status: 80% complete..")
-    if int(max_rows * 0.90) == index:
-        print("Processing Status: 90% complete..")
-    if max_rows == index:
-        print("Processing Status: 100% complete..")
-        return True
-
-    return False
-
 def select_rows_for_processing(max_length:int):
     """Function to allow user to specify rows for processing from CSV file.
 
@@ -108,102 +124,116 @@ def select_rows_for_processing(max_length:int):
 
     return rows_to_process
 
-def validate_price(prc:str):
-    """Function to validate the price string split from the data file line.
+def ingest_register(csv_in, rows_to_process:int, total_rows:int):
+    """Function to stream the rows of the register into the table and aggregator in a single pass.
 
     Args:
-        prc (str): [price string value from the import and split of the line from csv file.]
-        The string will be checked to validate the characters will be valid for casting to float value.
+        csv_in ([file]): [Open csv file positioned after the header line.]
+        rows_to_process (int): [Rows to process in the program.]
+        total_rows (int): [Rows in the file -> used for the processing status.]
+
     Returns:
-        prc [float]: [prc transformed from string to float value.]
+        sales[SalesTable]: [Columnar table of the rows processed.]
+        aggregator[SalesAggregator]: [Year / month / county counts and price sketch of the rows processed.]
     """
-    try:    
-        if not prc:
-            # Should not happen. Price should be filled. If not, then we can raise an error or assign value of 0
-                print(f"Problem converting price. Price is null. Assigning 0 value. Line: 105 and index{index}")
-                prc = "0"
-                
-        # Remove the commas in the string price
-        prc = prc.replace(',', "")
-
-        # Pricing Validation -> Need to convert to a number for analysis
-        for character in prc:    
-            # Check character validity -> issue solved with diamond questionmark invalid character throwing error 
-            # as cast to float fails!
-            if not character == "." and not character.isdigit() or character == '€':
-                prc = prc.replace(character, "")
-                continue
-            
-        # After processing the line, make ammendments to the number values:
-        
-            prc = float(prc)
-    except ValueError:
-        print(f"Problem converting price ({prc}) to a float value. Line: 105 and index{index}")
+    # Address and postcode are not kept per row -> the aggregator keeps the addresses of the highest / lowest sale.
+    builder = SalesTableBuilder()
+    aggregator = SalesAggregator()
+    # Progress is printed at most every few seconds -> see ppr_profile.ProgressReporter.
+    progress = ProgressReporter(min(rows_to_process, total_rows))
+    index = 0
+
+    # Rows are parsed one line at a time by the generator. It stops reading the file once rows_to_process is reached.
+    for d, a, p, c, f, v, descr, price in stream_register_rows(csv_in, rows_to_process):
+        index += 1
+
+        # Once we have the line split completely, we need to now append to our table.
+        builder.append(d, c, f, v, descr, price)
+        aggregator.add(d, a, c, descr, price)
 
-    return prc
+        # Processing Status Information
+        progress.update(index)
 
-def calculate_price_frequency(pricelist:list):
+    progress.finish()
+    print("Completed..")
+
+    # Rows still buffered for the accumulators -> see SalesAggregator.flush().
+    return builder.build(), aggregator.flush()
+
+def calculate_price_frequency(sales:SalesTable, aggregator:SalesAggregator = None, method:str = "exact"):
     """Function to calculate the mode of the pricelist.
 
-        For output to the user, we inform them of how many unique values are in the price list. This is done using the python set()
-        The price list is then looped over to create a dictionary. If the value is located we add 1 to the key/value pair for the frequency.
+        For output to the user, we inform them of how many unique values are in the price list.
+        Every price is counted in one pass over the price column with numpy (see ppr_stats.price_frequency). With the
+        space-saving method the prices kept by the price sketch of the aggregator are used instead -> no pass over the
+        prices and at most ppr_aggregate.SPACE_SAVING_CAPACITY prices held.
 
     Args:
-        pricelist (list): [List created from the splitting of input file for the price values.]
+        sales (SalesTable): [Columnar table of the rows processed.]
+        aggregator (SalesAggregator, optional): [Aggregator of the rows processed. Needed for space-saving]. Defaults to None.
+        method (str, optional): [Method from TOP_PRICE_METHODS]. Defaults to "exact".
+
+    Raises:
+        ValueError: [Raised for an unknown method.]
 
     Returns:
         pricefreq_dict[dictionary]: [Dictionary containing unqiue price keys with frequency of appearence as values.]
     """
-    index = 0
-    uniquePrice = set(priceList)     
-    pricefreq_dict = dict()
+    if method == "exact":
+        pricefreq_dict = price_frequency(sales.prices)
+        message = f"Calculating frequency of pricing data [{len(pricefreq_dict)} unique prices of {len(sales)} sales].."
+    elif method == "space-saving":
+        sketch = aggregator.price_sketch
+        pricefreq_dict = {price: count for price, count, _ in sketch.top(sketch.capacity)}
+        message = f"Estimating frequency of pricing data [{len(pricefreq_dict)} most common prices of {len(sales)} sales].."
+    else:
+        raise ValueError(f"Unknown top prices method: {method}")
 
     print()
-    print(f"Calculating frequency of pricing data [{len(uniquePrice)} unique prices of {len(priceList)} sales]..")
-    for prc in pricelist: 
-        index +=1
-
-        if prc in pricefreq_dict.keys():
-           pricefreq_dict[prc] = pricefreq_dict[prc] + 1
-        else:
-            pricefreq_dict[prc] = 1
-        
-        # Loading % for user - pricing frequency preparation
-        if print_processing_status(index, len(priceList)):
-            break
-    else:
-        print("Completed..")
+    print(message)
+    print("Completed..")
 
     return pricefreq_dict
 
-def total_price_values(priceList:list):
-    """Function to populate total_price_values from the pricelist.
+def calculate_top_prices(sales:SalesTable, aggregator:SalesAggregator, n:int = TOP_PRICES, method:str = "exact"):
+    """Function to find the most common prices (mode and the price points table of option 6).
 
     Args:
-        priceList (list): [List created from the splitting of input file for the price values.]
+        sales (SalesTable): [Columnar table of the rows processed.]
+        aggregator (SalesAggregator): [Aggregator of the rows processed -> its price sketch was fed while the rows were read.]
+        n (int, optional): [Number of prices]. Defaults to TOP_PRICES.
+        method (str, optional): [exact -> counted with numpy on the price column, ranked with a heap. space-saving -> bounded
+        memory estimate kept by the aggregator (see ppr_stats.SpaceSaving)]. Defaults to "exact".
+
+    Raises:
+        ValueError: [Raised for an unknown method.]
 
     Returns:
-        Sum, Length , Maximum Value and Minimum Value tuple returned for processing.
+        top_prices[list]: [List of (price, frequency) tuples, most common first.]
     """
-    return sum(priceList), len(priceList), max(priceList), min(priceList)
+    if method == "exact":
+        return top_prices(sales.prices, n)
+    if method == "space-saving":
+        return [(price, count) for price, count, _ in aggregator.price_sketch.top(n)]
+    raise ValueError(f"Unknown top prices method: {method}")
 
-def get_date_values(dos: list):
+def get_date_values(sales:SalesTable):
     """Function to populate key date values for processing in the application.
     Parts of the program rely on splitting the data by the dates to locate specify values.
     Instead of having multiple lists / variables with the key values, it is more performant to have a dictionary with the specified 
     keys with the corresponding values.
 
     Args:
-        dos (list): [List containing the Dates Of Sales that have been split in the csv file.]
+        sales (SalesTable): [Columnar table of the rows that have been split in the csv file.]
 
     Returns:
         date_values[dictionary]: [Dictionary containing the essential key date splits for use in the program.]
     """
-    first_dos = dos[0]
-    last_dos = dos[len(dos)-1]
+    first_dos = sales.dos(0)
+    last_dos = sales.dos(len(sales)-1)
 
-    date_values = {"Total Months": 0, "Total Years":  0, "First Dos": dos[0] , "First Dos Month": int(first_dos[3:5]), "First Dos Year": int(first_dos[6:]), 
-    "Last Dos":  dos[len(dos)-1], "Last Dos Month":  int(last_dos[3:5]), "Last Dos Year": int(last_dos[6:]),}
+    date_values = {"Total Months": 0, "Total Years":  0, "First Dos": first_dos , "First Dos Month": int(first_dos[3:5]), "First Dos Year": int(first_dos[6:]), 
+    "Last Dos":  last_dos, "Last Dos Month":  int(last_dos[3:5]), "Last Dos Year": int(last_dos[6:]),}
     
     # Determine how many months are used in the first year: Eg. starting in may (month 5 -> So we need to take 5 away from total but add any month after final year)
     date_values["Total Years"] = date_values["Last Dos Year"] - date_values["First Dos Year"]
@@ -215,196 +245,470 @@ def get_date_values(dos: list):
 
     return date_values
 
-def mean_of_pricelist(priceList:list, number:int):
-    """Function to calculate the mean of the pricelist.
-    Number represents the total months or total years. This is used to visualize the data in different dimensions for the mean over the months and years.
+def calculate_median_of_pricelist(sales:SalesTable, date_index:DateIndex, aggregator:SalesAggregator = None, method:str = "exact"):
+    """Function to calculate the median of the pricelist.
+
+    The median and quartiles are found by selection on the price column (see ppr_stats.price_quantiles) so the prices do not
+    need to be sorted. The median is also calculated for each county and each year. The prices of a year are a slice of the
+    date index, so no grouping of the rows by year is needed.
+    The sketch method reads the KLL sketches the aggregator fed while the rows were read instead (see ppr_stats.QuantileSketch)
+    -> approximate values without another pass over the prices.
+
+    Args:
+        sales (SalesTable): [Columnar table of the rows that have been split in the csv file.]
+        date_index (DateIndex): [Date index of the table -> see ppr_index.]
+        aggregator (SalesAggregator, optional): [Aggregator of the rows processed. Needed for sketch]. Defaults to None.
+        method (str, optional): [Method from MEDIAN_METHODS]. Defaults to "exact".
+
+    Raises:
+        ValueError: [Raised for an unknown method.]
+
+    Returns:
+        quartiles[dictionary]: [Dictionary of 0.25, 0.5 and 0.75 -> price.]
+        county_medians[dictionary]: [Dictionary of county -> median price.]
+        year_medians[dictionary]: [Dictionary of year -> median price.]
+    """
+    if method == "sketch":
+        quartiles = aggregator.quantile_sketch.quantiles((0.25, 0.5, 0.75))
+        county_medians = {county: sketch.quantile(0.5) for county, sketch in aggregator.county_quantile_sketches.items()}
+        year_medians = {year: aggregator.year_quantile_sketches[year].quantile(0.5) for year in sorted(aggregator.year_quantile_sketches)}
+        return quartiles, county_medians, year_medians
+    if method != "exact":
+        raise ValueError(f"Unknown median method: {method}")
+
+    quartiles = price_quantiles(sales.prices, (0.25, 0.5, 0.75))
+
+    county_names = sales.categories["county"]
+    county_medians = {county_names[code]: q[0.5] for code, q in grouped_quantiles(sales.prices, sales.codes["county"]).items()}
+    year_medians = dict()
+    for year in date_index.years():
+        year_prices = date_index.prices[date_index.year_slice(year)]
+        if len(year_prices):
+            year_medians[year] = price_quantiles(year_prices)[0.5]
+
+    return quartiles, county_medians, year_medians
+
+def calculate_yearly_house_sales(cube:SalesCube, date_values:dict):
+    """Function to calculate yearly house sales.
+    This function rolls the SalesCube up to yearly counts and also uses the date values dictionary with essential key values.
+
+    The counts are placed into a dictionary year_dict with key values from first DOS to Last DOS. Years outside of that range
+    (file not in date order) are added after the range.
 
     Args:
-        priceList (list): [List created from the splitting of input file for the price values.]
-        number (int): [Length to calculate the mean with.]
+        cube (SalesCube): [Cube of the rows processed.]
+        date_values (dict): [Dictionary created by Get_Date_Values() function with essential key values for processing.]
 
     Returns:
-        Sum of pricelist / number IF number is more than 1. Otherwise the mean is the sum of the list
+        Return year_dict (dictionary) with each year and total sales for that year, the yearly_range list, the year with most houses sold and
+        year with least houses sold.
     """
-    if number <=1:
-        return sum(priceList)
-    
-    return sum(priceList) / number
+    # Create list between first DOS and Last DOS. eg. 2010, 2011, 2012... 2020
+    yearly_range = list(range(date_values["First Dos Year"], date_values["Last Dos Year"] +1))
+    # Create a dictionary with Each Year as a Key and set the value to the sales counted for that year.
+    year_counts = cube.counts("year")
+    year_dict = {year: year_counts.get(year, 0) for year in yearly_range}
+    for year, count in year_counts.items():
+        if year not in year_dict:
+            year_dict[year] = count
 
-def calculate_median_of_pricelist(length_of_pricelist:int, priceList:list):
-    """Function to calculate the median of the pricelist.
+    year_most_houses_sold = max(year_dict, key=year_dict.get)
+    year_least_houses_sold = min(year_dict, key=year_dict.get)
 
-    Calculating the mid point of the pricelist with variation if the length is an even number. If the length is an even number,
-     we first must take the value of the pricelist at the mid_index -1 , add this to the value at the mid index and then divide this value
-     by 2 . This will give the median value.
+    return year_dict, yearly_range, year_most_houses_sold, year_least_houses_sold
+
+def calculate_most_month_of_sale(aggregator:SalesAggregator):
+    """Function to calculate the month with most sales across the rows processed.
+    The SalesAggregator counts each month (mm/yyyy) as the rows are read. Keys are kept in the order the month first appears in the file.
 
     Args:
-        length_of_pricelist (int): [Length of the current pricelist.]
-        priceList (list): [List created from the splitting of input file for the price values.]
+        aggregator (SalesAggregator): [Aggregator fed every row during the streaming ingest.]
 
     Returns:
-        mid_index[int]: [middle index point of the pricelist.]
-        mid_pricelist[int]: [Median Value of the pricelist.]
+        dates_dict[Dictionary]: [Dictionary containing the dates mm/yyyy and their frequencies.]
     """
-    mid_index = int(length_of_pricelist / 2) 
+    return aggregator.month_counts
 
-    if length_of_pricelist % 2 == 1:
-        mid_pricelist = priceList[mid_index]
-    else:
-        mid_pricelist = (priceList[mid_index -1] + priceList[mid_index]) / 2
-    return mid_index, mid_pricelist
+def calculate_county_sales(cube:SalesCube):
+    """Function to calculate county sales.
+    The SalesCube is rolled up to the county axis. Counties are kept in the order they first appear in the file.
+
+    Args:
+        cube (SalesCube): [Cube of the rows processed.]
 
-def calculate_standard_deviation(pricelist:list, sumlist = 0, lengthlist = 0, total_months = 0, total_years = 0):
-    """[Function to Calculate the Standard Deviation By Month, Year and Overall]
+    Returns:
+        county_dict[dictionary]: [Dictionary containing unique counties and also their frequencies]
+    """
+    return cube.counts("county") # return a dictionary -> Contains unqiue counties and also frequency
+
+def load_register(csv_path:str, choose_rows, workers:int = INGEST_WORKERS):
+    """Function to read the register into the table, counts and cube.
+
+    The table and counts of the whole file are loaded from the cache when the file has not changed since the last run. When rows
+    have only been added to the end of the file, just those rows are parsed and added to the cache -> see ppr_cache.
+    When all rows are selected the file is read through the memory mapped reader, split across worker processes when there is more
+    than one CPU -> see ppr_ingest.MappedRegister. Otherwise the selected rows are streamed in order.
 
     Args:
-        pricelist (list): [List created from the splitting of input file for the price values.]
-        sumlist (int, optional): [Optional Parameter. Can be passed to access total months and total year deviation]. Defaults to 0.
-        lengthlist (int, optional): [Optional Parameter. Can be passed to access total months and total year deviation]. Defaults to 0.
-        total_months (int, optional): [Optional Parameter. Can be passed to access total months and total year deviation]. Defaults to 0.
-        total_years (int, optional): [Optional Parameter. Can be passed to access total months and total year deviation]. Defaults to 0.
+        csv_path (str): [Path to the csv file.]
+        choose_rows ([function]): [Function given the rows in the file and returning the rows to process eg. select_rows_for_processing.]
+        workers (int, optional): [Worker processes used to parse the whole file]. Defaults to INGEST_WORKERS.
 
     Returns:
-        std_dev[float]: [Standard deviation based on mean of whole price list]
-        month_std_dev[float]: [Standard deviation based on mean of (sum of pricelist / total months)]
-        year_std_dev[float]: [Standard deviation based on mean of (sum of pricelist / total years)]
+        sales[SalesTable]: [Columnar table of the rows processed.]
+        aggregator[SalesAggregator]: [Year / month / county counts and price sketch of the rows processed.]
+        cube[SalesCube]: [Count / sum / sum of squares / min / max per (year, month, county, description) cell.]
+        rows_to_process[int]: [Rows processed.]
     """
-    std_dev = 0
-    month_std_dev = 0
-    year_std_dev = 0
+    with open(csv_path, encoding="utf-8") as csv_in:
+        # discard first line of headers:
+        _ = csv_in.readline()
 
-    if (sumlist > 0) and (lengthlist > 1):
-        price_deviations = [ ((x - (sumlist / lengthlist)) **2) for x in priceList]
+        # User Message:
+        print("Program status: File import - Started..")
+        # A valid cache already knows the row count. Otherwise count the lines without holding them in memory
+        # -> the rows are streamed one at a time further down.
+        # A cache of an older, shorter copy of the register is a checkpoint -> only the rows added since are counted.
+        with PROFILER.span("ingest") as span:
+            cache_meta = read_cache_meta(csv_path)
+            checkpoint = None if cache_meta else read_checkpoint(csv_path)
+            if cache_meta:
+                total_rows = cache_meta["Total Rows"]
+            elif checkpoint:
+                total_rows = checkpoint["Total Rows"] + count_appended_rows(csv_path, checkpoint)
+            else:
+                total_rows = count_register_rows(csv_path)
+            span["Rows"] = total_rows
 
-        # If months is not = 0
-        if total_months > 0:
-            month_deviations = [ ((x - (sumlist / total_months)) **2) for x in priceList]
-            month_std_dev = math.sqrt(sum(month_deviations)/(total_months -1))
+        # User Message:
+        print(f"Program status: File successfully scanned. {total_rows} lines recognised..")
 
-        # Year: Only if total years is > 0 do we caculate.
-        if total_years > 0:
-            year_deviations = [ ((x - (sumlist / total_years)) **2) for x in priceList]
-            year_std_dev = math.sqrt(sum(year_deviations)/(total_years -1))
+        rows_to_process = min(choose_rows(total_rows), total_rows)
 
+        # User Message:
+        print("Program status: Pre-processing beginning.. ")
 
-        # Calculate deviation for price
-        std_dev = math.sqrt(sum(price_deviations)/(length_of_pricelist -1))
-    elif len(pricelist) > 0:
-        l_mean = sum(pricelist) / len(pricelist)
-        squared_deviations = [ (x - l_mean) ** 2 for x in pricelist ]
-        std_dev =  math.sqrt(sum(squared_deviations) / (len(pricelist) - 1))
+        # Rows are stored column by column in a typed table -> see ppr_table.SalesTable.
+        # Year / month / county counts and the price sketch are all updated in the same pass -> see ppr_aggregate.SalesAggregator.
+        with PROFILER.span("parse", rows_to_process):
+            cached = load_register_cache(csv_path, rows_to_process, cache_meta)
+            appended = append_register_cache(csv_path, checkpoint) if checkpoint and rows_to_process >= total_rows else None
+            if appended:
+                sales, aggregator, cube, new_rows = appended
+                print(f"Program status: Parsed data loaded from cache. {new_rows} new lines added to {os.path.basename(csv_path)} since the last run parsed..")
+            elif cached:
+                sales, aggregator, cube = cached
+                print(f"Program status: Parsed data loaded from cache ({os.path.basename(csv_path)} unchanged)..")
+            else:
+                if rows_to_process >= total_rows:
+                    print(f"Program status: Parsing file with up to {workers} worker processes..")
+                    sales, aggregator = parse_register_parallel(csv_path, workers)
+                    print("Completed..")
+                else:
+                    sales, aggregator = ingest_register(csv_in, rows_to_process, total_rows)
 
-    else:
-        print("Invalid parameters been passed. No calculation completed.")
+                # Count / sum / sum of squares / min / max per (year, month, county, description) cell -> see ppr_cube.SalesCube.
+                cube = SalesCube.from_table(sales)
 
-    return std_dev, month_std_dev, year_std_dev
+        # Only a parse of the whole file is cached -> a short test run never replaces the full cache.
+        if not (appended or cached) and rows_to_process >= total_rows:
+            try:
+                with PROFILER.span("cache", rows_to_process):
+                    save_register_cache(csv_path, total_rows, rows_to_process, sales, aggregator, cube)
+            except OSError:
+                print("Program status: Parsed data could not be cached. Continuing..")
 
-def calculate_yearly_house_sales(priceList:list, dos:list, date_values:dict):
-    """Function to calculate yearly house sales.
-    This function utilizes the dates of sale and also the date values dictionary with essential key values.
+    return sales, aggregator, cube, rows_to_process
 
-    Loop over each DOS, slice the value from the year value only of dd/mm/yyyy. cast this to a int.
-    check this value against a newly created dictionary year_dict with key values from first DOS to Last DOS.
+def analyse_register(sales:SalesTable, aggregator:SalesAggregator, cube:SalesCube, top_method:str = "exact", median_method:str = "exact"):
+    """Function to calculate every value used by the menu options and plots.
 
     Args:
-        priceList (list): [List created from the splitting of input file for the price values.]
-        dos (list): [List created from the splitting of input file for the date of sale values.]
-        date_values (dict): [Dictionary created by Get_Date_Values() function with essential key values for processing.]
+        sales (SalesTable): [Columnar table of the rows processed.]
+        aggregator (SalesAggregator): [Year / month / county counts and price sketch of the rows processed.]
+        cube (SalesCube): [Cube of the rows processed.]
+        top_method (str, optional): [Method used for the most common prices, from TOP_PRICE_METHODS]. Defaults to "exact".
+        median_method (str, optional): [Method used for the medians / quartiles, from MEDIAN_METHODS]. Defaults to "exact".
 
     Returns:
-        Return year_dict (dictionary) with each year and total sales for that year, the yearly_range list, the year with most houses sold and
-        year with least houses sold.
+        results[dictionary]: [Dictionary of the calculated values. Keys are Title Case eg. "Price Stats", "Year Dict".]
     """
-    # Create list between first DOS and Last DOS. eg. 2010, 2011, 2012... 2020
-    yearly_range = list(range(date_values["First Dos Year"], date_values["Last Dos Year"] +1))
-    # Create a dictionary with Each Year as a Key and set the value to 0.
-    year_dict = {year: 0 for year in yearly_range}
+    results = {"Sales": sales, "Aggregator": aggregator, "Cube": cube}
 
-    for d in dos:
-        d = int(d[6:])
-        if d in year_dict.keys():
-            year_dict[d] = year_dict[d] + 1
+    # Calculate Price Frequency -> estimated from the price sketch of the aggregator with the space-saving method.
+    with PROFILER.span("frequency", len(sales)):
+        results["Price Frequency"] = calculate_price_frequency(sales, aggregator, top_method)
+
+    # User Message:
+    print()
+    print("Program status: Beginning further data processing:")
+    ################# Begin processing for User Menu Data: #################
+    ################# Option 4 - > Mean of pricelist (date values)
+    # Mean value for this data set is based on the sum of the prices (total) / the total number of months or years
+    # Date format is dd/mm/yyyy
+    # We want to take the first and last value in the DOS list.
+    # We can then do a substring on this value, convert to integer and get perform a calculation to get the total amounts
+    # for months and years. We can plug these values into our calculations.
+    date_values = results["Date Values"] = get_date_values(sales)
+
+    ################# Option 1, 2, 3, 4, 7 -> Count, Max, Min, Mean and Standard Deviation of Pricelist
+    # All price statistics come from the running count / sum / mean / M2 / min / max the aggregator kept while the rows were read
+    # -> no further pass over the prices. See ppr_stats.RunningStats
+    with PROFILER.span("std dev", len(sales)):
+        price_stats = results["Price Stats"] = statistics_from_running(aggregator.price_stats, date_values["Total Months"], date_values["Total Years"])
+    print("Processing status: 1.Data Count - Completed..")
+    print("Processing status: 2.Maximum Price Determination - Completed.. ")
+    print("Processing status: 3.Minimum Price Determination - Completed.. ")
+
+    # Sum of pricelist / number of months or years IF number is more than 1. Otherwise the mean is the sum of the list
+    results["Mean Months"] = price_stats["Sum"] / date_values['Total Months'] if date_values['Total Months'] > 1 else price_stats["Sum"]
+    results["Mean Years"] = price_stats["Sum"] / date_values['Total Years'] if date_values['Total Years'] > 1 else price_stats["Sum"]
+    print("Processing status: 4.Mean Data Determination - Completed.. ")
+
+    # Rows sorted by date with the offset of each month -> year / month / period queries are slices. See ppr_index.DateIndex.
+    with PROFILER.span("date index", len(sales)):
+        date_index = results["Date Index"] = DateIndex(sales)
+
+    ################# Option 5 -> Median of Pricelist
+    # Median by selection rather than the mid-point of the unsorted list
+    with PROFILER.span("median", len(sales)):
+        results["Quartiles"], results["County Medians"], results["Year Medians"] = calculate_median_of_pricelist(sales, date_index, aggregator, median_method)
+    print("Processing status: 5.Median Data Determination - Completed.. ")
+
+    # Price histograms (fixed and log bins) of the register, each county and each year -> one pass over the prices per scale.
+    # See ppr_histogram.PriceHistogram
+    with PROFILER.span("histograms", len(sales)):
+        results["Price Histograms"] = {scale: PriceHistogram.from_table(sales, HISTOGRAM_BINS, scale) for scale in HISTOGRAM_SCALES}
+
+    ################# Option 6 -> MODE of PriceList
+    # Mode and most common price points from one pass over the prices -> no lookup in the full frequency dictionary.
+    with PROFILER.span("top prices", len(sales)):
+        results["Top Prices"] = calculate_top_prices(sales, aggregator, TOP_PRICES, top_method)
+    print("Processing status: 6.Mode Data Determination - Completed.. ")
+
+    ################# Option 7
+    # Because we have done mean values based on year, month and pricing, we should include this here.
+    # Calculated with the other price statistics above (Std Dev, Month Std Dev, Year Std Dev).
+
+    ################# Option 8 -> EXTRA PROCESSING INFORMATION
+    print("Processing status: 8.Additional Data Determination - Beginning.. ")
+    with PROFILER.span("aggregates - years", len(sales)):
+        results["Year Dict"], results["Yearly Range"], results["Year Most Sold"], results["Year Least Sold"] = calculate_yearly_house_sales(cube, date_values)
+    print("Processing status: 8. - Yearly Range Statistics - Completed..")
+
+    # Countys -> Create dictionary of countys from data and freq of total sold for each county
+    with PROFILER.span("aggregates - counties", len(sales)):
+        results["County Dict"] = calculate_county_sales(cube)
+
+    print("Processing status: 8. - County Statistics - Completed..")
+
+    # User Message:
+    print("Processing status: 8. - Monthly Statistics - Beginning..")
+    # Months -> Most Common Month
+    with PROFILER.span("aggregates - months", len(sales)):
+        results["Dates Dict"] = calculate_most_month_of_sale(aggregator)
+    # Chronological monthly sales / total / mean / median series of the register and each county, with moving averages and
+    # year over year change -> used by the years, counties and months plots. See ppr_timeseries.MonthlySeries
+    with PROFILER.span("time series", len(sales)):
+        results["Monthly Series"], results["County Monthly Series"] = monthly_series(sales, date_index)
+    # One bitmap per county / description / full market price / vat exclusive / year value -> see ppr_filter.BitmapIndex.
+    with PROFILER.span("bitmap index", len(sales)):
+        results["Bitmap Index"] = BitmapIndex(sales)
+    print("Processing status: 8. - Monthly Statistics - Completed..")
+    print("Processing status: 8.Additional Data Determination - Completed.. ")
+
+    return results
+
+def print_statistic(pick:int, results:dict):
+    """Function to print the result of a main menu option (1 - 8).
+
+    Args:
+        pick (int): [Menu option 1 - 8.]
+        results (dict): [Dictionary created by analyse_register().]
+    """
+    price_stats, date_values = results["Price Stats"], results["Date Values"]
+    aggregator = results["Aggregator"]
+
+    if pick == 1:  # Number of records
+        print(f"Number of records   :    {price_stats['Count']}")
+        print(f"Total Euros :   €{price_stats['Sum']:.2f}")
+    elif pick == 2:  # Max value
+        print(f"Maximum value of    :   €{price_stats['Max']:.2f}")
+    elif pick == 3:  # Min value
+        print(f"Minimum value of    :   €{price_stats['Min']:.2f}")
+    elif pick == 4:  # Mean value
+        print(f"You are checking the mean values between {date_values['First Dos']} and {date_values['Last Dos']}")
+        # Check for 0 divisble numbers: -> If 0, then we are only checking 1 month values. There is no average of months available.
+        if results["Mean Months"] == price_stats["Sum"]:
+            print(f"Mean value (1 month(s)) of   :    €{results['Mean Months']:.2f}")
         else:
-            year_dict[d] = 1
-       
-    year_most_houses_sold = max(year_dict, key=year_dict.get)
-    year_least_houses_sold = min(year_dict, key=year_dict.get)
+            print(f"Mean value ({date_values['Total Months']} months) of   :    €{results['Mean Months']:.2f}")
+
+        # If total years is = 0, then we are only viewing sales in 1 year (12 months) -> No output necessary
+        if date_values['Total Years'] > 0:
+            print(f"Mean value ({date_values['Total Years']} years) of    :   €{results['Mean Years']:.2f}")
+
+        # Give an average value of sale based on the amount of sales and the total cost
+        print(f"Mean value (per sale)[sum/total sales] of    :   €{price_stats['Sum'] / price_stats['Count']:.2f}")
+    elif pick == 5:  # Median value
+        quartiles, county_medians = results["Quartiles"], results["County Medians"]
+        print(f"Median value of  : €{quartiles[0.5]:.2f}")
+        print(f"Lower / Upper Quartile  : €{quartiles[0.25]:.2f} / €{quartiles[0.75]:.2f}")
+        print()
+        print("Median value per year:")
+        for year, median in results["Year Medians"].items():
+            print(f"{year}  : €{median:.2f}")
+        print()
+        print("Median value per county:")
+        for c in sorted(county_medians):
+            print(f"{c}  : €{county_medians[c]:.2f}")
+    elif pick == 6:  # Mode value
+        mode, frequency = results["Top Prices"][0]
+        print("Mode Value:")
+        print("Price        |       Frequency")
+        print(f"€{mode}     |       {frequency}")
+        print()
+        print("Most common price points:")
+        for price, frequency in results["Top Prices"]:
+            print(f"€{price:<12.2f}|       {frequency}")
+    elif pick == 7:  # Standard deviation
+        print(f"Standard Deviation for price lists: {price_stats['Std Dev']:.2f}")
+        if date_values['Total Months'] > 0:
+            print(f"Standard Deviation for price (monthly): {price_stats['Month Std Dev']:.2f}")
+        if date_values['Total Years'] > 0:
+            print(f"Standard Deviation for price (yearly): {price_stats['Year Std Dev']:.2f}")
+        print()
+        print("Year  |   Sales   |   Mean €      |   Standard Deviation €")
+        for year, stats in aggregator.year_stats.items():
+            print(f"{year}  |   {stats.count:<7} |   {stats.mean:<11.2f} |   {stats.std_dev():.2f}")
+    elif pick == 8: # Extra Data Mining
+        dates_dict, county_dict = results["Dates Dict"], results["County Dict"]
+        print("Extra Data Mining:")
+        print("Years with Sales  / Total Sales / Year:")
+        print(f"{results['Yearly Range']}")
+        print(f"{results['Year Dict']}")
+        print(f"Year of most houses sold: {results['Year Most Sold']}")
+        print(f"Year of least houses sold: {results['Year Least Sold']}")
+        print(f"Month/Year most houses sold: {max(dates_dict, key=dates_dict.get)} with {max(dates_dict.values())}")
+        print(f"Month/Year least houses sold: {min(dates_dict, key=dates_dict.get)} with {min(dates_dict.values())}")
+        print(f"Highest Money Price Paid - Year / Price: {aggregator.highest_sale[0]} €{price_stats['Max']:.2f} - (Address/Description: {aggregator.highest_sale[1]}, {aggregator.highest_sale[2]}/ {aggregator.highest_sale[3]})")
+        print(f"Lowest Money Price Paid - Year / Price: {aggregator.lowest_sale[0]} €{price_stats['Min']:.2f} - (Address/Description: {aggregator.lowest_sale[1]}, {aggregator.lowest_sale[2]} / {aggregator.lowest_sale[3]})")
+        print()
+        print(f"Counties with House Sales:\n{sorted(county_dict)}\n")
+        print(f"County with most properties sold: {max(county_dict, key=county_dict.get)} with {max(county_dict.values())}")
+        print(f"County with least properties sold: {min(county_dict, key=county_dict.get)} with {min(county_dict.values())}")
+    else:
+        print("Something went wrong. Option not valid..")
+        print("Location: print_statistic()")
 
-    return year_dict, yearly_range, year_most_houses_sold, year_least_houses_sold
+def read_user_filters(bitmap_index:BitmapIndex):
+    """Function to ask the user for the filters of options 11 and 12.
+
+    The user can filter on county, description, full market price, vat exclusive and year. Several values of one filter are
+    separated by a comma (eg. Dublin, Cork or 2014-2016, 2019). Typed text is matched to the values of the register.
 
-def calculate_most_month_of_sale(dos:list):
-    """Function to calculate the month with most sales across the rows processed.
-    Get the length of DOS and store this (More performant to store this instead of calculating each time)
-    Loop over each date and slice from month values eg. mm/2020.
-    Build dictionary with the values as keys (unique) and the values as the frequency.
-    Display processing status to the user based on length of DOS and the current index.
     Args:
-        dos (list): [List created from the splitting of input file for the date of sale values.]
+        bitmap_index (BitmapIndex): [Bitmap index of the register -> values to match the typed text against.]
 
     Returns:
-        dates_dict[Dictionary]: [Dictionary containing the dates mm/yyyy and their frequencies.]
+        filters[dictionary]: [Column name -> list of values. None when a filter matches nothing.]
     """
-    dos_length = len(dos)
-    index = 0
-    dates_dict = dict()
-    
-    for u_date in dos:
-        # Set the date checking to only contain the month. Not interested in a specific day.
-        u_date = u_date[3:]
-        
-        if u_date in dates_dict.keys():
-           dates_dict[u_date] = dates_dict[u_date] + 1
-        else:
-            dates_dict[u_date] = 1
-      
-        index += 1
+    print("Leave a filter blank to include every value. Separate values with a comma.")
+    filters = dict()
+    for column, prompt in (("county", "County (eg. Dublin): "), ("description", "Description (eg. New): "),
+                           ("fullmarketprice", "Full Market Price (Yes / No): "), ("vatexcl", "VAT Exclusive (Yes / No): "), ("year", "Year (yyyy / yyyy-yyyy): ")):
+        text = input(prompt)
+        if not text.strip():
+            continue
 
-        # Loading % for user - months mode preparation
-        if print_processing_status(index, dos_length):
-            break
+        matched = []
+        for part in text.split(","):
+            if column == "year":
+                # Years are typed as yyyy or yyyy-yyyy
+                try:
+                    matched += parse_year_range(part)
+                except ValueError:
+                    print(f"Please enter a year in the format of yyyy or yyyy-yyyy: {part.strip()}")
+                    return None
+            else:
+                matched += bitmap_index.match_values(column, part)
 
-    return dates_dict
+        if not matched:
+            print(f"No values match: {text}")
+            return None
+        filters[column] = matched
+
+    return filters
+
+def calculate_filtered_statistics(results:dict):
+    """Function to calculate the statistics of the sales matching filters typed by the user (option 11).
+
+    The filters are read with read_user_filters() and combined with the bitmap index -> see ppr_filter.
 
-def calculate_county_sales(county:list):
-    """Function to calculate county sales.
-    Get the length of county and store this (More performant to store this instead of calculating each time)
-    Loop over each county.
-    Build dictionary with the values as keys (unique) and the values as the frequency.
-    Display processing status to the user based on length of county and the current index.
     Args:
-        county (list): [List of counties that have been sliced from the input file during import.]
+        results (dict): [Dictionary created by analyse_register().]
+    """
+    bitmap_index = results["Bitmap Index"]
+    print("Filtered Statistics -> ", end="")
+    filters = read_user_filters(bitmap_index)
+    if filters is None:
+        return
+
+    rows = bitmap_index.row_numbers(bitmap_index.select(filters))
+    if len(rows) == 0:
+        print("No sales match the filters.")
+        return
+
+    filtered_stats = filtered_statistics(results["Sales"], rows)
+    print(f"Number of records   :    {filtered_stats['Count']}")
+    print(f"Total Euros :   €{filtered_stats['Sum']:.2f}")
+    print(f"Maximum value of    :   €{filtered_stats['Max']:.2f}")
+    print(f"Minimum value of    :   €{filtered_stats['Min']:.2f}")
+    print(f"Mean value (per sale) of    :   €{filtered_stats['Mean']:.2f}")
+    print(f"Median value of  : €{filtered_stats['Median']:.2f}")
+    print(f"Mode value of  : €{filtered_stats['Mode']} with {filtered_stats['Mode Frequency']}")
+    print(f"Standard Deviation for price lists: {filtered_stats['Std Dev']:.2f}")
+
+def export_cleaned_register(csv_path:str, results:dict, rows_to_process:int):
+    """Function to write a cleaned copy of the register for the sales matching filters typed by the user (option 12).
+
+    The register is streamed again from the csv file and written in blocks -> see ppr_export.export_clean_register().
+    A file name ending in .gz / .bz2 / .xz / .zst is compressed.
 
-    Returns:
-        county_dict[dictionary]: [Dictionary containing unique counties and also their frequencies]
+    Args:
+        csv_path (str): [Path to the register csv file.]
+        results (dict): [Dictionary created by analyse_register().]
+        rows_to_process (int): [Rows processed -> the same rows are exported.]
     """
-    county_dict = dict()
-    county_len = len(county)
-    index = 0
-    for c in county:
-        index += 1
-        if c in county_dict.keys():
-            county_dict[c] = county_dict[c] + 1
-        else:
-            county_dict[c] = 1
-        
-        print_processing_status(index, county_len)
-            
-    return county_dict # return a dictionary -> Contains unqiue counties and also frequency
+    print("Export Cleaned Register -> ", end="")
+    filters = read_user_filters(results["Bitmap Index"])
+    if filters is None:
+        return
 
-def create_plots():
-    """Function to create use plots. 
-    This function is used handle the user plot module. 
+    out_path = input("Output file (default PPR_CLEAN.csv.gz): ").strip() or "PPR_CLEAN.csv.gz"
+    try:
+        rows_written = export_clean_register(csv_path, out_path, filters, rows_to_process)
+        print(f"Processing Status: {rows_written} rows written to {out_path}")
+    except (OSError, ValueError) as error:
+        print(f"Could not export the register: {error}")
+
+def create_plots(results:dict):
+    """Function to create use plots.
+    This function is used handle the user plot module.
     The function will display a menu for the user to choose a plot from. This will loop until an exit value has been reached.
     The choice the user enters determines the program flow and what plot will be created / saved.
 
+    Args:
+        results (dict): [Dictionary created by analyse_register().]
+
     Raises:
-        ValueError: [Raising value error to capture the errors from invalid user input. Use this to print error message and continue in 
+        ValueError: [Raising value error to capture the errors from invalid user input. Use this to print error message and continue in
         the loop statement.]
     """
     print('''    Welcome to User Graphical Plots.
           You can choose from the following options for plots for sales:''')
     print_user_plot_menu()
-    
+
     pick = 1
     while pick != 10:
         # Take user input : Handle incorrect choice to ensuer program does not terminate
@@ -412,145 +716,293 @@ def create_plots():
             pick = int(input("Enter your choice: "))
             if pick == 10:
                 continue # contine as loop will break
-            
-            if pick < 0 or pick > 4:
+
+            if pick < 0 or pick > 7:
                 raise ValueError
         except ValueError:
             print("You entered an invalid choice.")
             continue
-        
+
         # Handle user selection with processing based on choice.
         if pick == 0:
             print_user_plot_menu()
         elif pick == 1:     # Scatter Plot - Sales over Years
-            create_scatter_plot(1)
+            create_scatter_plot(1, results)
         elif pick == 2:     # Bar chart - Sales over Years
-            create_scatter_plot(2)
+            create_scatter_plot(2, results)
         elif pick == 3:                # Bar chart Plot - Sales over Counties
-            create_scatter_plot(3)
+            create_scatter_plot(3, results)
+        elif pick == 4:
+            create_scatter_plot(4, results) # pie chart - Sales Over Years
         else:
-            create_scatter_plot(4) # pie chart - Sales Over Years
-            
-def create_multi_bar(year:str, to_output):
-    """Function to generate multiple / single bar charts 
-    Parameters are dynamic but linked to TotalSalesPerMonthIn bar chart.
+            create_scatter_plot(pick, results) # Price density / Sales per day / Histogram -> binned / downsampled for large inputs
+
+def save_plot(fig, figure_name:str):
+    """Function to show a figure and save it to the local directory. The figure is closed afterwards to free its memory.
 
     Args:
-        year (str): [Year / Beginning year that is being reviewed at the point in time]
-        to_output ([type]): [to_output is a dictionary containing values to be used in the bar chart]
+        fig ([matplotlib.figure.Figure]): [Figure to save.]
+        figure_name (str): [File name of the plot without extension.]
     """
-    fig2, ax = plt.subplots()
-    fig2.suptitle("Bar Chart")
-    
-    # Dynamic Name
-    figure_name = "TotalSalesPerMonthIn" + year  
-    ax.set_title(figure_name)    
-    # Bar Chart
-    y_pos = [ i for i in range(len(to_output))]
-    
-    ax.set_yticks(y_pos)
-    ax.set_yticklabels(to_output.keys())            
-    ax.set_ylabel("Date")
-    ax.set_xlabel("Total Sales")         
-    ax.barh(y_pos, to_output.values(), align="center")
     # Plot the axes
-    plt.show()         
-    # Dynamic Name
-    fig2.savefig(str(figure_name), bbox="tight") 
+    plt.show()
+    fig.savefig(figure_name, bbox_inches="tight")
+    plt.close(fig)
     print("Plot saved to local directory.")
 
-def create_pie_chart():
-    """Function to generate pie chart 
+def create_multi_bar(year:str, to_output, moving_average:dict = None):
+    """Function to generate multiple / single bar charts
+    Parameters are dynamic but linked to TotalSalesPerMonthIn bar chart.
 
-    Pie chart to represent the Sales Over Years and to display percentage on the chart to 2 decimal places for accuracy.
+    Args:
+        year (str): [Year / Beginning year that is being reviewed at the point in time]
+        to_output ([type]): [to_output is a dictionary containing values to be used in the bar chart]
+        moving_average (dict, optional): [Month -> moving average of the sales drawn over the bars]. Defaults to None.
     """
-    fig, ax = plt.subplots()
-    ax.set_title("Sales Over All Years")
-
-    ax.pie(year_dict.values(), labels = year_dict.keys(), autopct="%.2f%%")
-    
-    plt.show()
-    fig.savefig("SalesOverYearsPieChart", bbox="tight") 
-    print("Plot saved to local directory.")
+    fig2, ax = plt.subplots()
+    # Dynamic Name
+    figure_name = "TotalSalesPerMonthIn" + year
+    draw_month_bar(fig2, ax, figure_name, to_output, moving_average)
+    save_plot(fig2, figure_name)
 
-def create_scatter_plot(option: int):
+def create_scatter_plot(option: int, results:dict):
 
     """Function to handle user input to decide plots to generate.
 
+    Args:
+        option (int): [Plot menu option 1 - 7.]
+        results (dict): [Dictionary created by analyse_register().]
     """
-    # Figures that are permitted are Sales Over Years and Sales Over Counties. 
+    # Figures that are permitted are Sales Over Years and Sales Over Counties.
     # We can utilize the already created dictionaries.
-    
+
     if option == 1:
         # Initialize figure and axes
         fig, ax = plt.subplots()
-        fig.suptitle("Scatter Plot")
-        ax.set_title("Total Sales over Years")
-        ax.set_xlabel("Years")
-        ax.set_ylabel("Sales")
-        
-        ax.scatter(list(year_dict.keys()), list(year_dict.values()), marker=".")
-        
-        # Plot the axes
-        plt.show()
-        
-        fig.savefig("ScatterSalesAndYears", bbox="tight")
-        print("Plot saved to local directory.")
-    
+        draw_years_scatter(fig, ax, results["Monthly Series"].yearly_counts())
+        save_plot(fig, "ScatterSalesAndYears")
+
     elif option == 2:
         # Initialize figure and axes
         fig2, ax = plt.subplots()
-        fig2.suptitle("Bar Chart")
-        
-        ax.set_title("Total Sales over Counties")
-       
-        # Bar Chart
-        y_pos = [ i for i in range(len(county_dict))]
-        
-        ax.set_yticks(y_pos)
-        ax.set_yticklabels(county_dict.keys())
-        
-        ax.set_ylabel("Counties")
-        ax.set_xlabel("Total Sales")
-       
-        ax.barh(y_pos, county_dict.values(), align="center")
-        # Plot the axes
-        plt.show()
-        
-        fig2.savefig("BarChartSalesAndCounties", bbox="tight")
-        print("Plot saved to local directory.")
-    
+        draw_counties_bar(fig2, ax, county_totals(results["County Monthly Series"]))
+        save_plot(fig2, "BarChartSalesAndCounties")
+
     elif option == 3:
         # Initialize figure and axes
-        try:    
-            year = input("Enter a year / ALL: ")
-            
+        series = results["Monthly Series"]
+        try:
+            year = input("Enter a year / range of years (yyyy-yyyy) / ALL: ")
+
+            # Monthly counts and the 3 month moving average come from the chronological monthly series -> no scan of dates_dict.
             if year.lower() == "all":
-                for yr in yearly_range:            
-                    to_output = {k:v for k,v in dates_dict.items() if str(yr) in k}
-                    
-                    if len(to_output)>0:     
-                        create_multi_bar(str(yr), to_output)  
+                # One chart per year -> rendered without windows in worker processes and saved. See ppr_plots.render_plots.
+                with PROFILER.span("plots") as span:
+                    saved = render_plots(month_plot_jobs(series, results["Yearly Range"], "."), INGEST_WORKERS)
+                    span["Rows"] = len(saved)
+                print(f"{len(saved)} plots saved to local directory.")
             else:
-                # Check for year len to ensure it is 4 characters long:
-                if len(year) == 4:                    
-                    to_output = {k:v for k,v in dates_dict.items() if year in k}
-                    if len(to_output)>0:       
-                        create_multi_bar(year, to_output)
+                # Check for year len to ensure it is 4 characters long (or two years separated by -):
+                first_year, _, last_year = year.partition("-")
+                if len(first_year) == 4 and len(last_year) in (0, 4):
+                    to_output = series.monthly_counts(int(first_year), int(last_year or first_year))
+                    if len(to_output)>0:
+                        create_multi_bar(year, to_output, series.monthly_rolling(int(first_year), int(last_year or first_year)))
                     else:
                         print("No dates which match selection.")
                 else:
-                    print("Please enter a year in the format of yyyy.")
+                    print("Please enter a year in the format of yyyy or yyyy-yyyy.")
 
         except ValueError:
-            print("You entered an incorrect year.")     
+            print("You entered an incorrect year.")
 
     elif option == 4:
-        create_pie_chart()
+        # Pie chart to represent the Sales Over Years and to display percentage on the chart to 2 decimal places for accuracy.
+        fig, ax = plt.subplots()
+        draw_years_pie(fig, ax, results["Year Dict"])
+        save_plot(fig, "SalesOverYearsPieChart")
+    elif option == 5:
+        # Every sale is counted into a grid of date x price cells -> one image however many rows. See ppr_plots.price_density.
+        fig, ax = plt.subplots()
+        draw_price_density(fig, ax, price_density(results["Sales"].dates, results["Sales"].prices))
+        save_plot(fig, "PriceDensityOverYears")
+    elif option == 6:
+        # Sales per day downsampled to a fixed number of points -> see ppr_plots.daily_sales.
+        fig, ax = plt.subplots()
+        draw_daily_sales(fig, ax, daily_sales(results["Sales"].dates))
+        save_plot(fig, "SalesPerDay")
+    elif option == 7:
+        # Histogram / CDF from the bins counted in analyse_register() -> see ppr_histogram.PriceHistogram.
+        scale = input(f"Enter the bin scale ({' / '.join(HISTOGRAM_SCALES)}): ").strip().lower()
+        if scale not in results["Price Histograms"]:
+            print(f"Please enter one of: {', '.join(HISTOGRAM_SCALES)}.")
+            return
+
+        histogram = results["Price Histograms"][scale]
+        group = input("Enter a county / year / ALL: ").strip()
+        try:
+            counts = histogram.counts_for(group.title() if not group.isdigit() else group)
+        except KeyError:
+            print("No sales which match selection.")
+            return
+
+        title = "All Sales" if group.lower() == "all" else group.title()
+        fig, ax = plt.subplots()
+        draw_price_histogram(fig, ax, title, histogram.edges, counts, scale)
+        save_plot(fig, f"PriceHistogram{scale.title()}{title.replace(' ', '')}")
     else:
         print("Something went wrong. Option not valid..")
         print("Location: create_scatter_plot()")
 
+def run_batch_file(csv_path:str, rows:int, statistics:list, plots:list, output_dir:str, workers:int = INGEST_WORKERS, exports:tuple = EXPORT_FORMATS,
+                   clean_filters:dict = None, top_method:str = "exact", median_method:str = "exact"):
+    """Function to run the whole program on one register file without user input (batch mode).
+
+    Files written to the output directory (name = csv file name without extension):
+        name_statistics.txt -> output of the chosen menu options.
+        name_OUT.csv        -> same summary as PPR_OUT.csv.
+        name_summary.csv / name_years.jsonl / ... -> result tables in the chosen formats (see ppr_export).
+        name_log.txt        -> processing status messages.
+        name_*.png          -> chosen plots.
+        name_clean.csv.gz   -> cleaned register filtered with --filter (only with --clean).
+
+    Args:
+        csv_path (str): [Path to the register csv file.]
+        rows (int): [Maximum rows to process. 0 processes every row.]
+        statistics (list): [Main menu options (1 - 8) to write.]
+        plots (list): [Plot names from BATCH_PLOTS.]
+        output_dir (str): [Directory to write the results in.]
+        workers (int, optional): [Worker processes used to parse the file]. Defaults to INGEST_WORKERS.
+        exports (tuple, optional): [Result table formats from ppr_export.EXPORT_FORMATS]. Defaults to every format.
+        clean_filters (dict, optional): [Filters of the cleaned register, None -> no cleaned register is written]. Defaults to None.
+        top_method (str, optional): [Method used for the most common prices, from TOP_PRICE_METHODS]. Defaults to "exact".
+        median_method (str, optional): [Method used for the medians / quartiles, from MEDIAN_METHODS]. Defaults to "exact".
+
+    Returns:
+        summary[dictionary]: [Dictionary with the keys File, Rows, Seconds and Spans (stage timings of this file -> see ppr_profile).]
+    """
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    started = time.perf_counter()
+    # Worker processes are reused between files -> only keep the stages of this file.
+    PROFILER.clear()
+
+    # Status messages go to the log file -> files processed at the same time do not mix their messages on screen.
+    with open(os.path.join(output_dir, name + "_log.txt"), "w", encoding="utf-8") as log_out, redirect_stdout(log_out):
+        sales, aggregator, cube, rows_to_process = load_register(csv_path, lambda total_rows: rows or total_rows, workers)
+        results = analyse_register(sales, aggregator, cube, top_method, median_method)
+
+        with PROFILER.span("export"):
+            append_summary_csv(os.path.join(output_dir, name + "_OUT.csv"), rows_to_process, results)
+            export_results(rows_to_process, results, output_dir, name + "_", exports)
+        # Plots are rendered without windows (Agg) in worker processes -> see ppr_plots.
+        with PROFILER.span("plots"):
+            render_plots(plot_jobs(results, plots, output_dir, name + "_"), workers)
+
+        if clean_filters is not None:
+            # Typed --filter text -> values of this register, by the same rule as the menu filters.
+            clean_filters = results["Bitmap Index"].resolve_filters(clean_filters)
+            for column in [column for column, accepted in clean_filters.items() if accepted == []]:
+                print(f"Processing Status: No {column} values match the --filter -> no rows written.")
+            with PROFILER.span("clean export") as span:
+                rows_written = span["Rows"] = export_clean_register(csv_path, os.path.join(output_dir, name + "_clean.csv.gz"), clean_filters, rows)
+            print(f"Processing Status: Cleaned register -> {rows_written} rows written.")
+
+    with open(os.path.join(output_dir, name + "_statistics.txt"), "w", encoding="utf-8") as statistics_out, redirect_stdout(statistics_out):
+        print(f"Data Processing of {os.path.basename(csv_path)} -> Rows processed: {rows_to_process}")
+        print(f"You can analyse the property prices since {results['Date Values']['First Dos']} - {results['Date Values']['Last Dos']}.")
+        for pick in statistics:
+            print()
+            print_statistic(pick, results)
+
+    return {"File": csv_path, "Rows": rows_to_process, "Seconds": time.perf_counter() - started, "Spans": PROFILER.spans}
+
+def run_batch(args):
+    """Function to process every register file given on the command line, several files at the same time.
+
+    Args:
+        args ([argparse.Namespace]): [Arguments returned by parse_arguments().]
+
+    Returns:
+        failures[int]: [Number of files that could not be processed -> used as the exit code.]
+    """
+    statistics = sorted(set(BATCH_STATISTICS.values())) if "all" in args.stats else [BATCH_STATISTICS[name] for name in args.stats]
+    plots = list(BATCH_PLOTS) if "all" in args.plots else args.plots
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # Files are processed in separate processes. With more than one file at a time each file is parsed and plotted in its own
+    # process only -> no pools of worker processes started inside the batch workers.
+    jobs = max(1, min(args.jobs or INGEST_WORKERS, len(args.files)))
+    workers = 1 if jobs > 1 else INGEST_WORKERS
+    print(f"Batch status: Processing {len(args.files)} file(s), {jobs} at a time. Results -> {args.output_dir}")
+
+    failures = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(run_batch_file, csv_path, args.rows, statistics, plots, args.output_dir, workers, tuple(args.export),
+                                   args.filter if args.clean else None, args.top_prices, args.median): csv_path for csv_path in args.files}
+        for future in as_completed(futures):
+            try:
+                summary = future.result()
+                print(f"Batch status: {summary['File']} -> {summary['Rows']} rows processed in {summary['Seconds']:.2f}s")
+                PROFILER.add(summary["Spans"], os.path.basename(summary["File"]) + ": ")
+            except (OSError, ValueError, TypeError, ZeroDivisionError, IndexError) as error:
+                failures += 1
+                print(f"Batch status: {futures[future]} -> Failed: {error}")
+
+    return failures
+
+def parse_arguments(argv:list = None):
+    """Function to read the command line arguments.
+
+    Args:
+        argv (list, optional): [Arguments to read]. Defaults to None -> sys.argv.
+
+    Returns:
+        args[argparse.Namespace]: [files, rows, stats, plots, export, clean, filter (dictionary of column -> values), output_dir, jobs, top_prices,
+        median and the profiling options profile, profile_report, tracemalloc and cprofile.]
+    """
+    parser = argparse.ArgumentParser(description="Data processing of the Property Price Register. Run without files for the interactive menu on PPR_ALL.csv.")
+    parser.add_argument("files", nargs="*", help="Register csv files to process in batch mode (no user input).")
+    parser.add_argument("--rows", type=int, default=0, help="Maximum rows to process per file. 0 processes every row.")
+    parser.add_argument("--stats", nargs="+", choices=list(BATCH_STATISTICS) + ["all"], default=["all"], help="Menu statistics to write.")
+    parser.add_argument("--plots", nargs="*", choices=list(BATCH_PLOTS) + ["all"], default=[], help="Plots to save.")
+    parser.add_argument("--export", nargs="*", choices=EXPORT_FORMATS, default=list(EXPORT_FORMATS), help="Result table formats to write.")
+    parser.add_argument("--clean", action="store_true", help="Write a cleaned copy of each register (name_clean.csv.gz).")
+    parser.add_argument("--filter", action="append", default=[], metavar="COLUMN=VALUES",
+                        help=f"Filter of the cleaned register eg. county=Dublin,Cork or description=new or year=2014-2016,2019. Text is matched as in "
+                             f"the menu -> exact (ignoring case) or else every value containing it. Columns: {', '.join(FILTER_COLUMNS)}.")
+    parser.add_argument("--output-dir", default="batch_output", help="Directory for the results of each file.")
+    parser.add_argument("--jobs", type=int, default=0, help="Files processed at the same time. 0 -> one per CPU.")
+    parser.add_argument("--top-prices", choices=TOP_PRICE_METHODS, default="exact",
+                        help="How the most common prices are counted -> exact, or space-saving (bounded memory estimate).")
+    parser.add_argument("--median", choices=MEDIAN_METHODS, default="exact",
+                        help="How the medians and quartiles are found -> exact (selection), or sketch (approximate, from the KLL sketches fed while the file is read).")
+    parser.add_argument("--profile", action="store_true", help="Print the time, CPU time, rows per second and memory growth of each stage at exit.")
+    parser.add_argument("--profile-report", metavar="FILE", help="Save the stage report as JSON at exit.")
+    parser.add_argument("--tracemalloc", action="store_true", help="Trace Python memory allocation for the stage report (slower).")
+    parser.add_argument("--cprofile", metavar="FILE", help="Run under cProfile and save the stats (pstats format) at exit.")
+    args = parser.parse_args(argv)
+
+    # COLUMN=VALUES -> dictionary of column -> list of values, as used by the filter engine. Years are yyyy or yyyy-yyyy.
+    filters = dict()
+    for text in args.filter:
+        column, _, values = text.partition("=")
+        column = column.strip().lower()
+        if column not in FILTER_COLUMNS or not values.strip():
+            parser.error(f"--filter expects COLUMN=VALUES with a column from {', '.join(FILTER_COLUMNS)}: {text}")
+        for value in values.split(","):
+            if column != "year":
+                filters.setdefault(column, []).append(value.strip())
+                continue
+            try:
+                years = parse_year_range(value)
+            except ValueError:
+                years = []
+            if not years:
+                parser.error(f"--filter year expects years in the format of yyyy or yyyy-yyyy: {value.strip()}")
+            filters.setdefault(column, []).extend(years)
+    args.filter = filters
+    return args
+
 def print_user_menu():
     """Function to print user menu for main program.
 
@@ -566,7 +1018,9 @@ def print_user_menu():
     7 - Standard Deviation
     8 - Extra Data Mining
     9 - Create Graphical Plots
-    10 - Exit''')
+    10 - Exit
+    11 - Filtered Statistics (County / Description / Year..)
+    12 - Export Cleaned Register (filtered, compressed csv)''')
 
 def print_user_plot_menu():
     """Function to generate user plot menu when processing the plot module.
@@ -577,291 +1031,124 @@ def print_user_plot_menu():
     2 - Bar Chart - Sales over Counties
     3 - Bar Chart - Sales Per Month (Specify Year)
     4 - Pie Chart - Sales Per Year 
+    5 - Price Density - Price of Sales over Years
+    6 - Line Plot - Sales per Day
+    7 - Histogram / CDF - Price of Sales (All / County / Year)
     10 - Exit''')
 
 ############## END OF  Function Definition: ################
 
+# Worker processes re-import this file on some platforms -> only run the program when started directly.
+if __name__ == "__main__":
+    # Files on the command line -> batch mode, no user input. See parse_arguments().
+    arguments = parse_arguments()
+    # Stage timings / cProfile stats are written when the program ends -> see ppr_profile.
+    install_profiling(arguments.profile, arguments.profile_report, arguments.tracemalloc, arguments.cprofile)
+    if arguments.files:
+        exit(run_batch(arguments))
+
+    ########################## Pre-Processing starts here ##########################
+    # index variable -> Program status control
+    index = 0
+    try:
+        sales, aggregator, cube, rows_to_process = load_register("PPR_ALL.csv", select_rows_for_processing)
+        index = len(sales)
 
-########################## Pre-Processing starts here ##########################
-try:
-    with open("PPR_ALL.csv", encoding="utf-8") as csv_in, open("PPR_OUT.csv", "a") as csv_out:
-
-        # discard first line of headers:
-        _ = csv_in.readline()
-
-        # User Message:
-        print("Program status: File import - Started..")
-        # Read data from csv file into a variable which will accept the list returned from readLines()
-        data = csv_in.readlines()
-        
-        # User Message:
-        print(f"Program status: File successfully split into lines. {len(data)} lines recognised..")
-
-        # declare variables for us in program with the file input.
-        dos, address, pobox, county, fullmarketprice, vatexcl = [],[],[],[],[],[]
-        description, priceList = [],[]
-
-        # index variable -> Program status control
-        index = 0
-        rows_to_process = select_rows_for_processing(len(data))
-       
-        # User Message:
-        print("Program status: Pre-processing beginning.. ")
-
-        for line in data:
-            index += 1
-
-            d = ""
-            a = ""
-            p = ""
-            c = ""
-            f = ""
-            v = ""
-            descr = ""
-            price = ""
-            
-            # Split into an array based on "
-            valuesquotes = line.strip().split('"') # strip \n and split on ""
-            
-            # Date -> Strip the commas from the date value
-            d = valuesquotes[0].strip(',') # Remove commas from date value -> needed for analysis.
-
-            # Address -> Processing complete after split()
-            a = valuesquotes[1]  
-
-            # Postcode and County Values:
-            # Needs splitting -> Contains 4 values , , , , -> only need value 2 and 3
-            # County also contains an additional space before the word eg , Kildare,. Need to remove this.
-            # Tip: _ character is used as a discard character. We can assign data to this to discard at runtime.
-            pob_county = valuesquotes[2] 
-            _, p, c, _ = pob_county.split(',')
-            c = c.strip()
-            
-            # Price -> Strip commas (keep decimals) -> Validate Price incase of special characters
-            price = valuesquotes[3]
-            price = validate_price(price)
-
-            # Full_Market_Price, Vat_Excl and Description:
-            # During our initial split on quotes, we now have values in index 4 of valuesquotes that has 4 values split by commas.
-            # However we only require the last 3 values for our data analysis. As split requires parameters matching, we can use _ to discard
-            # data again and act as a placeholder.
-            # We also need to remove spaces from in front of the values too (using strip())
-            _, f, v, descr = valuesquotes[4].split(',')
-            f = f.strip()
-            v = v.strip()
-            descr = descr.strip()
-
-            # Once we have the line split completely, we need to now append to our lists.
-            dos.append(d), address.append(a), pobox.append(
-                p),  county.append(c), fullmarketprice.append(f)
-            vatexcl.append(v), description.append(
-                descr), priceList.append(price)
-            
-            # Processing Status Information
-            if print_processing_status(index, rows_to_process):
-                break
-
-        else:
-            print("Completed..")
-
-
-        # Calculate Price Frequency
-        pricefreq_dict  = calculate_price_frequency(priceList)
-
-        # User Message:
-        print()
-        print("Program status: Beginning further data processing:")
-        ################# Begin processing for User Menu Data: #################
-        ################# Option 1, 2, 3 -> Number of Records, Max of Pricelist, Min of Pricelist
-        sum_of_pricelist, length_of_pricelist, max_of_pricelist, min_of_pricelist = total_price_values(priceList)
-        print("Processing status: 1.Data Count - Completed..")
-        print("Processing status: 2.Maximum Price Determination - Completed.. ")
-        print("Processing status: 3.Minimum Price Determination - Completed.. ")
-
-        ################# Option 4 - > Mean of pricelist
-        # Mean value for this data set is based on the sum of the prices (total) / the total number of months or years
-        # Date format is dd/mm/yyyy
-        # We want to take the first and last value in the DOS list.
-        # We can then do a substring on this value, convert to integer and get perform a calculation to get the total amounts
-        # for months and years. We can plug these values into our calculations.
-        date_values = get_date_values(dos)
-        mean_months = mean_of_pricelist(priceList, date_values['Total Months'])
-        mean_years = mean_of_pricelist(priceList, date_values['Total Years'])
-        print("Processing status: 4.Mean Data Determination - Completed.. ")
-
-        ################# Option 5 -> Median of Pricelist
-        # Find the mid-point of the list
-        mid_index, mid_pricelist = calculate_median_of_pricelist(length_of_pricelist, priceList)
-        print("Processing status: 5.Median Data Determination - Completed.. ")
-
-        ################# Option 6 -> MODE of PriceList
-        # pricefrequency calculated above already by calculate_price_frequency()
-        print("Processing status: 6.Mode Data Determination - Completed.. ")
-
-        ################# Option 7
-        # Because we have done mean values based on year, month and pricing, we should include this here.
-        price_std_dev, month_std_dev, year_std_dev = calculate_standard_deviation(priceList, sum_of_pricelist, length_of_pricelist, date_values["Total Months"], date_values["Total Years"]) 
-
-        ################# Option 8 -> EXTRA PROCESSING INFORMATION
-        print("Processing status: 8.Additional Data Determination - Beginning.. ")
-        year_dict, yearly_range, year_most_houses_sold, year_least_houses_sold = calculate_yearly_house_sales(priceList, dos, date_values) 
-        print("Processing status: 8. - Yearly Range Statistics - Completed..")
-        
-        # Countys -> Create dictionary of countys from data and freq of total sold for each county 
-        county_dict = calculate_county_sales(county)
-        
-        print("Processing status: 8. - County Statistics - Completed..")
-
-        # User Message:
-        print("Processing status: 8. - Monthly Statistics - Beginning..")
-        # Months -> Most Common Month
-        dates_dict = calculate_most_month_of_sale(dos)
-        print("Processing status: 8. - Monthly Statistics - Completed..")
-        print("Processing status: 8.Additional Data Determination - Completed.. ")
-
-        # With all price amounts split into 
-        year_month_most_sales_index = priceList.index(max_of_pricelist)
-        year_month_least_sales_index = priceList.index(min_of_pricelist)
-        # After we have the index with the most / least expensive amount,we can return the date of this sale:
-        year_month_most_sales_dos = dos[year_month_most_sales_index]
-        year_month_least_sales_dos = dos[year_month_least_sales_index]
+        # Every value used by the menu and the plots -> see analyse_register()
+        results = analyse_register(sales, aggregator, cube, arguments.top_prices, arguments.median)
 
         ################################################################
         # Finally, output some data to a file of the mentioned results:
-        out_header = ["Total Sales €", "Max Sale €", "Min Sales €", "Mean Sales €", "Mode Sales €", "Standard Dev Of Price €"]
-        out_data = [sum_of_pricelist, max_of_pricelist, min_of_pricelist, (sum_of_pricelist/length_of_pricelist), (max(pricefreq_dict, key=pricefreq_dict.get), max(pricefreq_dict)), price_std_dev]
-        csv_out.write("Data Processing -> Rows processed: " + str(rows_to_process) + "\n")
-        csv_out.write(str(out_header) + "\n")
-        csv_out.write(str(out_data) + "\n")
-        csv_out.write("\n")
+        # Real csv / JSON Lines / columnar files -> see ppr_export.
+        with PROFILER.span("export"):
+            append_summary_csv("PPR_OUT.csv", rows_to_process, results)
+            export_results(rows_to_process, results, "PPR_RESULTS")
 
         print("Processing Status: Ouput file created - PPR_OUT.csv")
+        print("Processing Status: Result tables written - PPR_RESULTS")
         # User Message:
         print()
         print("Program status: pre-processing completed..")
 
-except FileNotFoundError:
-    print("Opps. File not found. Check location.")
-    exit(0)
-except FileExistsError:
-    print("File not found. Check location.")
-    exit(0)
-except IsADirectoryError:
-    print("Path is a directory and NOT a file.")
-    exit(0)
-except PermissionError:
-    print(PermissionError)
-    exit(0)
-except ValueError:
-    print(ValueError)
-    print("Error occurring during assignment of value. See index: ", index)
-    print(valuesquotes)
-    exit(0)
-except TypeError:
-    print("Type assignment error. Error: ", TypeError)
-    exit(0)
-except KeyboardInterrupt:
-    print("Program stopped by user key interrupt.")
-    exit(0)
-except ZeroDivisionError:
-    print("Program has run into an error.")
-    print(ZeroDivisionError)
-    exit(0)
-else:
-    print("File has been imported to program.")
-    print()
-finally:
-    print("You can now analyse the data.")
+    except FileNotFoundError:
+        print("Opps. File not found. Check location.")
+        exit(0)
+    except FileExistsError:
+        print("File not found. Check location.")
+        exit(0)
+    except IsADirectoryError:
+        print("Path is a directory and NOT a file.")
+        exit(0)
+    except PermissionError:
+        print(PermissionError)
+        exit(0)
+    except ValueError as error:
+        print(error)
+        print("Error occurring during assignment of value. See index: ", index)
+        exit(0)
+    except TypeError:
+        print("Type assignment error. Error: ", TypeError)
+        exit(0)
+    except KeyboardInterrupt:
+        print("Program stopped by user key interrupt.")
+        exit(0)
+    except ZeroDivisionError:
+        print("Program has run into an error.")
+        print(ZeroDivisionError)
+        exit(0)
+    else:
+        print("File has been imported to program.")
+        print()
+    finally:
+        print("You can now analyse the data.")
 
-########################## Pre-Processing ENDS here ##########################
+    ########################## Pre-Processing ENDS here ##########################
 
 
-########################## Data Processing starts here ##########################
-# User Menu:
-print()
-print("Welcome to Data Processing of PPR_ALL.csv!")
-print(f"You can analyse the property prices since {date_values['First Dos']} - {date_values['Last Dos']}.")
-print_user_menu()
+    ########################## Data Processing starts here ##########################
+    # User Menu:
+    print()
+    print("Welcome to Data Processing of PPR_ALL.csv!")
+    print(f"You can analyse the property prices since {results['Date Values']['First Dos']} - {results['Date Values']['Last Dos']}.")
+    print_user_menu()
 
-# Setting a default value for pick for control loop.
-pick = 1
-while pick != 10:
-    try:
-        # Take user input : Handle incorrect choice to ensuer program does not terminate
+    # Setting a default value for pick for control loop.
+    pick = 1
+    while pick != 10:
         try:
-            print()
-            pick = int(input("Enter your choice: "))
-            if pick == 10:
-                continue # contine as loop will break
+            # Take user input : Handle incorrect choice to ensuer program does not terminate
+            try:
+                print()
+                pick = int(input("Enter your choice: "))
+                if pick == 10:
+                    continue # contine as loop will break
             
-            if pick < 0 or pick > 9:
-                raise ValueError
-        except ValueError:
-            print("You entered an invalid choice.")
-            continue
+                if pick < 0 or pick > 12:
+                    raise ValueError
+            except ValueError:
+                print("You entered an invalid choice.")
+                continue
         
-        # Handle user selection with processing based on choice.
-        if pick == 0:
-            print_user_menu()
-        elif pick == 1:  # Number of records
-            print(f"Number of records   :    {length_of_pricelist}")
-            print(f"Total Euros :   €{sum_of_pricelist:.2f}")
-        elif pick == 2:  # Max value
-            print(f"Maximum value of    :   €{max_of_pricelist:.2f}")
-        elif pick == 3:  # Min value
-            print(f"Minimum value of    :   €{min_of_pricelist:.2f}")
-        elif pick == 4:  # Mean value
-            print(f"You are checking the mean values between {date_values['First Dos']} and {date_values['Last Dos']}")
-            # Check for 0 divisble numbers: -> If 0, then we are only checking 1 month values. There is no average of months available.
-            if mean_months == sum_of_pricelist:
-                print(f"Mean value (1 month(s)) of   :    €{mean_months:.2f}") 
-            else:
-                print(f"Mean value ({date_values['Total Months']} months) of   :    €{mean_months:.2f}") 
-            
-            # If total years is = 0, then we are only viewing sales in 1 year (12 months) -> No output necessary
-            if date_values['Total Years'] > 0:
-                print(f"Mean value ({date_values['Total Years']} years) of    :   €{mean_years:.2f}") 
-            
-            # Give an average value of sale based on the amount of sales and the total cost 
-            print(f"Mean value (per sale)[sum/total sales] of    :   €{sum_of_pricelist / length_of_pricelist:.2f}") 
-        elif pick == 5:  # Median value
-            print("Median value of  : €", mid_pricelist , " at index: ", mid_index)
-        elif pick == 6:  # Mode value
-            print("Mode Value:")
-            print("Price        |       Frequency")
-            print(f"€{max(pricefreq_dict, key=pricefreq_dict.get)}     |       {max(pricefreq_dict.values())}")
-        elif pick == 7:  # Standard deviation
-            print(f"Standard Deviation for price lists: {price_std_dev:.2f}")
-            if date_values['Total Months'] > 0:
-                print(f"Standard Deviation for price (monthly): {month_std_dev:.2f}")
-            if date_values['Total Years'] > 0:
-                print(f"Standard Deviation for price (yearly): {year_std_dev:.2f}")
-        elif pick == 8: # Extra Data Mining
-            print("Extra Data Mining:")
-            print("Years with Sales  / Total Sales / Year:")
-            print(f"{yearly_range}")
-            print(f"{year_dict}")
-            print(f"Year of most houses sold: {year_most_houses_sold}")
-            print(f"Year of least houses sold: {year_least_houses_sold}")
-            print(f"Month/Year most houses sold: {max(dates_dict, key=dates_dict.get)} with {max(dates_dict.values())}")
-            print(f"Month/Year least houses sold: {min(dates_dict, key=dates_dict.get)} with {min(dates_dict.values())}")
-            print(f"Highest Money Price Paid - Year / Price: {(year_month_most_sales_dos)} €{max_of_pricelist:.2f} - (Address/Description: {address[year_month_most_sales_index]}, {county[year_month_most_sales_index]}/ {description[year_month_most_sales_index]})")
-            print(f"Lowest Money Price Paid - Year / Price: {(year_month_least_sales_dos)} €{min_of_pricelist:.2f} - (Address/Description: {address[year_month_least_sales_index]}, {county[year_month_least_sales_index]} / {description[year_month_least_sales_index]})")
-            print()
-            print(f"Counties with House Sales:\n{sorted(county_dict)}\n")
-            print(f"County with most properties sold: {max(county_dict, key=county_dict.get)} with {max(county_dict.values())}")
-            print(f"County with least properties sold: {min(county_dict, key=county_dict.get)} with {min(county_dict.values())}")
-        else: # Visualization using Plots
-            create_plots()
-            print_user_menu()
+            # Handle user selection with processing based on choice.
+            if pick == 0:
+                print_user_menu()
+            elif pick <= 8:  # Statistics -> see print_statistic()
+                print_statistic(pick, results)
+            elif pick == 9: # Visualization using Plots
+                create_plots(results)
+                print_user_menu()
+            elif pick == 11: # Filtered statistics
+                calculate_filtered_statistics(results)
+            else: # Cleaned (filtered) copy of the register
+                export_cleaned_register("PPR_ALL.csv", results, rows_to_process)
             
-    except KeyboardInterrupt:
-        print("Program stopped by user key interrupt.")
-        pick = 10
+        except KeyboardInterrupt:
+            print("Program stopped by user key interrupt.")
+            pick = 10
 
-else:
-    print("\nThank you for reviewing the data. Program finished.")
+    else:
+        print("\nThank you for reviewing the data. Program finished.")
 
-print()
+    print()
 
-########################## Data Processing ENDS here ##########################
+    ########################## Data Processing ENDS here ##########################
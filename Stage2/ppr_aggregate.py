@@ -0,0 +1,224 @@
+# Single pass aggregation of the Property Price Register.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Count sales per year, per month (mm/yyyy) and per county while the rows are being read, and keep bounded memory
+    estimates of the most common prices (Space-Saving sketch -> see ppr_stats.SpaceSaving) and of the price quantiles of the
+    register, each year and each county (KLL sketches -> see ppr_stats.QuantileSketch).
+
+    Before this, the main program made a separate pass over the data for each of calculate_price_frequency(),
+    calculate_yearly_house_sales(), calculate_county_sales() and calculate_most_month_of_sale(). The SalesAggregator is fed
+    each parsed row once from the streaming ingest loop and updates every count together.
+
+    The dictionaries keep their keys in the order they are first seen in the file, which is the order the menu output and the
+    plots have always used. Aggregators built over separate chunks of the file can be combined with merge(), which is also how
+    the rows appended to the register since the last run are added to the saved counts (see ppr_cache).
+
+    aggregate_table() builds the same counts from the columns of an already parsed SalesTable with numpy, for readers that
+    produce whole columns at once (eg. the memory mapped reader).
+
+    Next to the counts, a RunningStats accumulator (count, sum, mean, M2, min, max -> see ppr_stats) is kept for every price and
+    per year, month and county. Accumulators merge exactly, so the standard deviation of any of these groups is known after
+    parallel or incremental runs without keeping the prices. add() only buffers the price and its group keys -> every
+    CHUNK_SIZE rows (and on flush()) the buffer is turned into grouped accumulators with numpy (RunningStats.grouped()) and
+    merged in, instead of four Welford updates per row. The same chunk of prices is added to the price sketch and, grouped
+    the same way, to the quantile sketches.
+"""
+import numpy as np
+from ppr_stats import CHUNK_SIZE, QuantileSketch, RunningStats, SpaceSaving
+from ppr_table import SalesTable, ordinals_to_year_month
+
+# Prices counted by the most common prices sketch.
+SPACE_SAVING_CAPACITY = 1000
+
+class SalesAggregator:
+    """Group-by counts for the register, updated one row at a time.
+
+    Attributes:
+        rows (int): [Number of rows added.]
+        year_counts (dict): [Year (int) -> sales.]
+        month_counts (dict): [Month / Year (mm/yyyy) -> sales.]
+        county_counts (dict): [County -> sales.]
+        price_sketch (SpaceSaving): [Estimated most common prices.]
+        quantile_sketch (QuantileSketch): [Approximate quantiles of every price.]
+        year_quantile_sketches (dict): [Year (int) -> QuantileSketch of the prices of that year.]
+        county_quantile_sketches (dict): [County -> QuantileSketch.]
+        price_stats (RunningStats): [Count / sum / mean / M2 / min / max of every price.]
+        year_stats (dict): [Year (int) -> RunningStats of the prices of that year.]
+        month_stats (dict): [Month / Year (mm/yyyy) -> RunningStats.]
+        county_stats (dict): [County -> RunningStats.]
+        highest_sale (tuple): [(Date of sale, Address, County, Description, Price) of the first row with the highest price.]
+        lowest_sale (tuple): [(Date of sale, Address, County, Description, Price) of the first row with the lowest price.]
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.year_counts = dict()
+        self.month_counts = dict()
+        self.county_counts = dict()
+        self.price_sketch = SpaceSaving(SPACE_SAVING_CAPACITY)
+        self.quantile_sketch = QuantileSketch()
+        self.year_quantile_sketches = dict()
+        self.county_quantile_sketches = dict()
+        self.price_stats = RunningStats()
+        self.year_stats = dict()
+        self.month_stats = dict()
+        self.county_stats = dict()
+        self.highest_sale = None
+        self.lowest_sale = None
+        # Date of sale -> (year, mm/yyyy). Dates repeat for every sale on the same day so each one is sliced once.
+        self._date_keys = dict()
+        # Prices, years, months and counties of the rows not yet in the accumulators -> see flush().
+        self._pending = ([], [], [], [])
+
+    def add(self, d:str, a:str, c:str, descr:str, price:float):
+        """Function to add a single parsed row to every count.
+
+        Args:
+            d (str): [Date of sale (dd/mm/yyyy).]
+            a (str): [Address. Only kept for the highest / lowest sale.]
+            c (str): [County.]
+            descr (str): [Description of property.]
+            price (float): [Price of the sale.]
+        """
+        keys = self._date_keys.get(d)
+        if keys is None:
+            keys = self._date_keys[d] = (int(d[6:]), d[3:])
+        year, month = keys
+
+        self.rows += 1
+        self.year_counts[year] = self.year_counts.get(year, 0) + 1
+        self.month_counts[month] = self.month_counts.get(month, 0) + 1
+        self.county_counts[c] = self.county_counts.get(c, 0) + 1
+        for values, value in zip(self._pending, (price, year, month, c)):
+            values.append(value)
+        if len(self._pending[0]) >= CHUNK_SIZE:
+            self.flush()
+
+        # Keep the first row with the highest / lowest price.
+        if self.highest_sale is None or price > self.highest_sale[4]:
+            self.highest_sale = (d, a, c, descr, price)
+        if self.lowest_sale is None or price < self.lowest_sale[4]:
+            self.lowest_sale = (d, a, c, descr, price)
+
+    def flush(self):
+        """Function to add the buffered rows of add() to the price, year, month and county accumulators and the sketches.
+
+        Called every CHUNK_SIZE rows by add() and by merge(). Call it once the last row has been added, before the
+        accumulators are read.
+
+        Returns:
+            self[SalesAggregator]: [This aggregator, updated.]
+        """
+        prices, years, months, counties = self._pending
+        if not prices:
+            return self
+
+        price_array = np.array(prices, dtype=np.float64)
+        self.price_stats.add_many(price_array)
+        self.price_sketch.update_many(price_array)
+        self.quantile_sketch.update_many(price_array)
+        for group_stats, keys in ((self.year_stats, years), (self.month_stats, months), (self.county_stats, counties)):
+            chunk_stats = RunningStats.grouped(np.array(keys), price_array)
+            # Groups are added in the order first seen -> the same order as the counts.
+            for key in dict.fromkeys(keys):
+                group_stats.setdefault(key, RunningStats()).merge(chunk_stats[key])
+        for group_sketches, keys in ((self.year_quantile_sketches, years), (self.county_quantile_sketches, counties)):
+            for key, sketch in QuantileSketch.grouped(np.array(keys), price_array).items():
+                group_sketches.setdefault(key, QuantileSketch()).merge(sketch)
+
+        for values in self._pending:
+            values.clear()
+        return self
+
+    def __getstate__(self):
+        # The date key cache is rebuilt on demand -> no need to send it between processes.
+        self.flush()
+        state = self.__dict__.copy()
+        state["_date_keys"] = dict()
+        return state
+
+    def merge(self, other):
+        """Function to add the counts of an aggregator built over a later part of the file.
+
+        Args:
+            other (SalesAggregator): [Aggregator of the rows that follow the rows of this aggregator.]
+
+        Returns:
+            self[SalesAggregator]: [This aggregator, updated.]
+        """
+        self.flush()
+        other.flush()
+        self.rows += other.rows
+        for mine, theirs in ((self.year_counts, other.year_counts), (self.month_counts, other.month_counts),
+                            (self.county_counts, other.county_counts)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+        self.price_stats.merge(other.price_stats)
+        self.price_sketch.merge(other.price_sketch)
+        self.quantile_sketch.merge(other.quantile_sketch)
+        for mine, theirs in ((self.year_stats, other.year_stats), (self.month_stats, other.month_stats), (self.county_stats, other.county_stats)):
+            for key, stats in theirs.items():
+                mine.setdefault(key, RunningStats()).merge(stats)
+        for mine, theirs in ((self.year_quantile_sketches, other.year_quantile_sketches), (self.county_quantile_sketches, other.county_quantile_sketches)):
+            for key, sketch in theirs.items():
+                mine.setdefault(key, QuantileSketch()).merge(sketch)
+
+        if other.highest_sale is not None and (self.highest_sale is None or other.highest_sale[4] > self.highest_sale[4]):
+            self.highest_sale = other.highest_sale
+        if other.lowest_sale is not None and (self.lowest_sale is None or other.lowest_sale[4] < self.lowest_sale[4]):
+            self.lowest_sale = other.lowest_sale
+
+        return self
+
+def _first_seen_counts(values):
+    # Unique values and their counts, ordered by where each value first appears.
+    unique_values, first_index, counts = np.unique(values, return_index=True, return_counts=True)
+    order = np.argsort(first_index, kind="stable")
+    return unique_values[order].tolist(), counts[order].tolist()
+
+def aggregate_table(sales:SalesTable, address_of = None):
+    """Function to build the SalesAggregator counts of a whole table in one vectorised pass.
+
+    The result is the same as calling SalesAggregator.add() for every row of the table in order.
+
+    Args:
+        sales (SalesTable): [Parsed table.]
+        address_of (function, optional): [Function returning the address of a row number. The table does not hold addresses]. Defaults to None -> no address.
+
+    Returns:
+        aggregator[SalesAggregator]: [Counts of the table rows.]
+    """
+    aggregator = SalesAggregator()
+    aggregator.rows = len(sales)
+    if len(sales) == 0:
+        return aggregator
+
+    years, months = ordinals_to_year_month(sales.dates)
+    aggregator.year_counts = dict(zip(*_first_seen_counts(years)))
+    month_keys, month_counts = _first_seen_counts(years * 12 + months - 1)
+    aggregator.month_counts = {f"{key % 12 + 1:02d}/{key // 12}": count for key, count in zip(month_keys, month_counts)}
+    county_codes, county_counts = _first_seen_counts(sales.codes["county"])
+    aggregator.county_counts = {sales.categories["county"][code]: count for code, count in zip(county_codes, county_counts)}
+
+    # Accumulators per group -> kept in the same first seen order as the counts.
+    aggregator.price_stats = RunningStats().add_many(sales.prices)
+    aggregator.price_sketch.update_many(sales.prices)
+    aggregator.quantile_sketch.update_many(sales.prices)
+    year_stats = RunningStats.grouped(years, sales.prices)
+    aggregator.year_stats = {year: year_stats[year] for year in aggregator.year_counts}
+    month_stats = RunningStats.grouped(years * 12 + months - 1, sales.prices)
+    aggregator.month_stats = {f"{key % 12 + 1:02d}/{key // 12}": month_stats[key] for key in month_keys}
+    county_stats = RunningStats.grouped(sales.codes["county"], sales.prices)
+    aggregator.county_stats = {sales.categories["county"][code]: county_stats[code] for code in county_codes}
+    year_sketches = QuantileSketch.grouped(years, sales.prices)
+    aggregator.year_quantile_sketches = {year: year_sketches[year] for year in aggregator.year_counts}
+    county_sketches = QuantileSketch.grouped(sales.codes["county"], sales.prices)
+    aggregator.county_quantile_sketches = {sales.categories["county"][code]: county_sketches[code] for code in county_codes}
+
+    # argmax / argmin return the first row with the highest / lowest price.
+    for attribute, row in (("highest_sale", int(np.argmax(sales.prices))), ("lowest_sale", int(np.argmin(sales.prices)))):
+        address = address_of(row) if address_of else ""
+        setattr(aggregator, attribute, (sales.dos(row), address, sales.value("county", row), sales.value("description", row), float(sales.prices[row])))
+
+    return aggregator
@@ -0,0 +1,343 @@
+# Benchmarks for the Property Price Register program.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Measure the speed of the program on register style data so changes can be compared between runs.
+
+    Synthetic register (write_synthetic_register()):
+        Writes a PPR_ALL.csv style file of any size (eg. 10k - 10M rows) from a fixed random seed, so the same seed and size
+        always give the same file. Rows follow the register layout -> quoted addresses containing commas, Dublin postal codes,
+        quoted prices with a € or mis-encoded � prefix and thousands separators, 26 counties weighted towards Dublin / Cork,
+        Yes / No flags, new and second-hand descriptions and dates of sale in order across the chosen years.
+
+    Stage benchmark (benchmark_stages()):
+        Times each stage of the program separately on a synthetic register -> streaming ingest, mapped ingest, validate_price,
+        calculate_price_frequency, sales cube, county / year / month aggregations, date index, date range queries (monthly
+        counts and quarter statistics from the index slices), monthly series, standard deviation, median and plotting.
+
+    Price parsing micro-benchmark (benchmark_price_parsing()):
+        Compares the original per-character validate_price() loop with ppr_ingest.parse_price() (one row at a time) and
+        ppr_ingest.parse_price_column() (whole column at once) on register style price strings eg. €343,000.00 / �5,001.00.
+
+    Results are written as JSON. Give an earlier results file with --compare to see the change of each stage.
+
+    Usage:
+        python ppr_benchmark.py --sizes 10000 1000000 --output benchmark.json
+        python ppr_benchmark.py --sizes 10000 1000000 --compare benchmark.json
+"""
+from contextlib import redirect_stdout
+from datetime import date, datetime
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import timeit
+import matplotlib
+# Plots are only rendered to files -> no window is needed.
+matplotlib.use("Agg")
+from AssignmentP3_Stage2 import (analyse_register, calculate_county_sales, calculate_median_of_pricelist, calculate_most_month_of_sale,
+                                 calculate_price_frequency, calculate_yearly_house_sales, get_date_values, ingest_register)
+from ppr_cube import SalesCube
+from ppr_index import DateIndex
+from ppr_ingest import count_register_rows, parse_price, parse_price_column, parse_register_parallel, validate_price
+from ppr_plots import PLOT_NAMES, plot_jobs, render_plots
+from ppr_stats import RunningStats, statistics_from_running
+from ppr_table import ordinals_to_year_month
+from ppr_timeseries import monthly_series
+
+# Header line of the register (Property Size Description column already removed).
+REGISTER_HEADER = "Date of Sale (dd/mm/yyyy),Address,Postal Code,County,Price (�),Not Full Market Price,VAT Exclusive,Description of Property\n"
+# Counties of the register and their weight -> roughly the share of sales of each county.
+COUNTY_WEIGHTS = {"Dublin": 30, "Cork": 12, "Galway": 6, "Kildare": 6, "Meath": 5, "Limerick": 4, "Wicklow": 4, "Wexford": 4, "Louth": 3,
+                  "Kerry": 3, "Donegal": 3, "Tipperary": 3, "Mayo": 3, "Clare": 3, "Waterford": 3, "Westmeath": 2, "Kilkenny": 2, "Sligo": 1,
+                  "Laois": 2, "Offaly": 1, "Cavan": 1, "Roscommon": 1, "Carlow": 1, "Monaghan": 1, "Longford": 1, "Leitrim": 1}
+DESCRIPTIONS = ("Second-Hand Dwelling house /Apartment", "New Dwelling house /Apartment")
+STREETS = ("Main St", "Church Rd", "The Green", "Oak Park", "St. John's Tce", "Station Rd", "Castle View", "Apt 4, River Ct")
+# Prices agreed in round numbers -> gives the price list a clear mode, as in the real register.
+ROUND_PRICES = (150000, 200000, 250000, 300000, 350000)
+# Sizes accepted by the suite.
+MIN_ROWS, MAX_ROWS = 10000, 10000000
+# Rows joined and written to the file at a time.
+WRITE_BLOCK_ROWS = 10000
+
+def write_synthetic_register(path:str, rows:int, seed:int = 0, first_year:int = 2010, last_year:int = 2021):
+    """Function to write a synthetic register file in the PPR_ALL.csv format.
+
+    Args:
+        path (str): [File to write.]
+        rows (int): [Data rows to write (header not included).]
+        seed (int, optional): [Random seed -> the same seed and rows give the same file]. Defaults to 0.
+        first_year (int, optional): [Year of the first sale]. Defaults to 2010.
+        last_year (int, optional): [Year of the last sale]. Defaults to 2021.
+
+    Returns:
+        path[str]: [File written.]
+    """
+    generator = random.Random(seed)
+    counties, weights = list(COUNTY_WEIGHTS), list(COUNTY_WEIGHTS.values())
+    first_day = date(first_year, 1, 1).toordinal()
+    days = date(last_year, 12, 31).toordinal() - first_day + 1
+
+    with open(path, "w", encoding="utf-8", newline="\n") as csv_out:
+        csv_out.write(REGISTER_HEADER)
+        for block_start in range(0, rows, WRITE_BLOCK_ROWS):
+            block_rows = min(WRITE_BLOCK_ROWS, rows - block_start)
+            county_block = generator.choices(counties, weights, k=block_rows)
+            lines = []
+            for offset, county in enumerate(county_block):
+                # Sales are spread evenly over the years and written in date order.
+                dos = date.fromordinal(first_day + (block_start + offset) * days // rows).strftime("%d/%m/%Y")
+                postcode = f"Dublin {generator.randint(1, 24)}" if county == "Dublin" and generator.random() < 0.6 else ""
+                if generator.random() < 0.25:
+                    price = generator.choice(ROUND_PRICES)
+                else:
+                    price = round(generator.lognormvariate(12.3, 0.55), 2)
+                description = DESCRIPTIONS[generator.random() < 0.2]
+                lines.append(f'{dos},"{generator.randint(1, 250)} {generator.choice(STREETS)}, Town{generator.randint(0, 499)}",{postcode},'
+                             f'{county},"{generator.choice(("€", "�"))}{price:,.2f}",{("No", "Yes")[generator.random() < 0.05]},'
+                             f'{("No", "Yes")[description == DESCRIPTIONS[1]]},{description}\n')
+            csv_out.writelines(lines)
+
+    return path
+
+def legacy_validate_price(prc:str):
+    """Function holding the original per-character price validation loop. Kept as the baseline for the benchmark.
+
+    Args:
+        prc (str): [price string value eg. €343,000.00]
+
+    Returns:
+        prc [float]: [prc transformed from string to float value.]
+    """
+    prc = prc.replace(',', "")
+    for character in prc:
+        if not character == "." and not character.isdigit() or character == '€':
+            prc = prc.replace(character, "")
+            continue
+    return float(prc)
+
+def register_price_strings(rows:int, seed:int = 0):
+    """Function to create price strings in the format found in the register.
+
+    Args:
+        rows (int): [Number of prices.]
+        seed (int, optional): [Random seed so runs are repeatable]. Defaults to 0.
+
+    Returns:
+        prices[list]: [Price strings with a € or mis-encoded � prefix and thousands separators.]
+    """
+    generator = random.Random(seed)
+    return [f"{generator.choice(('€', '�'))}{round(generator.lognormvariate(12.3, 0.6), 2):,.2f}" for _ in range(rows)]
+
+def benchmark_price_parsing(rows:int = 100000, repeat:int = 3):
+    """Function to time the legacy loop, parse_price() and parse_price_column() on the same price strings.
+
+    Args:
+        rows (int, optional): [Number of price strings]. Defaults to 100000.
+        repeat (int, optional): [Timings taken for each parser. The fastest is kept]. Defaults to 3.
+
+    Raises:
+        ValueError: [Raised if the parsers do not return the same prices.]
+
+    Returns:
+        results[dictionary]: [Seconds per row for each parser and the speedup of the new parsers over the legacy loop.]
+    """
+    raw_prices = register_price_strings(rows)
+
+    legacy = [legacy_validate_price(prc) for prc in raw_prices]
+    if legacy != [parse_price(prc) for prc in raw_prices] or legacy != parse_price_column(raw_prices).tolist():
+        raise ValueError("Price parsers disagree on the benchmark prices.")
+
+    timings = {
+        "legacy_validate_price": min(timeit.repeat(lambda: [legacy_validate_price(prc) for prc in raw_prices], number=1, repeat=repeat)),
+        "parse_price": min(timeit.repeat(lambda: [parse_price(prc) for prc in raw_prices], number=1, repeat=repeat)),
+        "parse_price_column": min(timeit.repeat(lambda: parse_price_column(raw_prices), number=1, repeat=repeat)),
+    }
+
+    results = {"Rows": rows}
+    for name, seconds in timings.items():
+        results[f"{name} seconds per row"] = seconds / rows
+        results[f"{name} speedup"] = timings["legacy_validate_price"] / seconds
+
+    return results
+
+def _timed(timings:dict, stage:str, function, *args):
+    # Run function(*args), store the seconds taken under the stage name and return the result.
+    started = time.perf_counter()
+    result = function(*args)
+    timings[stage] = time.perf_counter() - started
+    return result
+
+def _running_std_dev(sales, date_values:dict):
+    # Standard deviations the way the program finds them -> the RunningStats the aggregator keeps for the whole register and
+    # per year / month / county (see ppr_aggregate.aggregate_table), then statistics_from_running() on the register accumulator.
+    years, months = ordinals_to_year_month(sales.dates)
+    for groups in (years, years * 12 + months - 1, sales.codes["county"]):
+        RunningStats.grouped(groups, sales.prices)
+    return statistics_from_running(RunningStats().add_many(sales.prices), date_values["Total Months"], date_values["Total Years"])
+
+def benchmark_stages(path:str, workers:int = 1, plots:bool = True):
+    """Function to time each stage of the program on a register file.
+
+    Status messages of the program are discarded so only the work is timed.
+
+    Args:
+        path (str): [Register csv file eg. written by write_synthetic_register().]
+        workers (int, optional): [Worker processes for the mapped ingest and plotting]. Defaults to 1.
+        plots (bool, optional): [Include the plotting stage]. Defaults to True.
+
+    Returns:
+        timings[dictionary]: [Stage name -> seconds.]
+    """
+    timings = dict()
+    with redirect_stdout(io.StringIO()):
+        total_rows = _timed(timings, "count_rows", count_register_rows, path)
+
+        # Ingest -> line by line stream (used for part of the file) and the memory mapped reader (whole file).
+        with open(path, encoding="utf-8") as csv_in:
+            csv_in.readline()
+            _timed(timings, "ingest_stream", ingest_register, csv_in, total_rows, total_rows)
+        sales, aggregator = _timed(timings, "ingest_mapped", parse_register_parallel, path, workers)
+
+        # validate_price on the raw price strings of the file (4th quoted value -> after the address).
+        with open(path, encoding="utf-8") as csv_in:
+            csv_in.readline()
+            raw_prices = [line.split('"')[3] for line in csv_in]
+        _timed(timings, "validate_price", lambda prices: [validate_price(prc) for prc in prices], raw_prices)
+
+        _timed(timings, "calculate_price_frequency", calculate_price_frequency, sales)
+        cube = _timed(timings, "sales_cube", SalesCube.from_table, sales)
+        date_values = get_date_values(sales)
+        _timed(timings, "county_sales", calculate_county_sales, cube)
+        _timed(timings, "yearly_sales", calculate_yearly_house_sales, cube, date_values)
+        _timed(timings, "month_sales", calculate_most_month_of_sale, aggregator)
+        date_index = _timed(timings, "date_index", DateIndex, sales)
+        years = date_index.years()
+        _timed(timings, "monthly_counts", lambda: [date_index.monthly_counts(year) for year in years])
+        _timed(timings, "quarter_statistics", lambda: [date_index.slice_statistics(date_index.quarter_slice(year, quarter))
+                                                      for year in years for quarter in range(1, 5)])
+        _timed(timings, "monthly_series", monthly_series, sales, date_index)
+        _timed(timings, "std_dev", _running_std_dev, sales, date_values)
+        _timed(timings, "median", calculate_median_of_pricelist, sales, date_index, aggregator)
+
+        if plots:
+            results = analyse_register(sales, aggregator, cube)
+            with tempfile.TemporaryDirectory() as output_dir:
+                _timed(timings, "plotting", lambda: render_plots(plot_jobs(results, PLOT_NAMES, output_dir), workers))
+
+    return timings
+
+def run_suite(sizes:list, seed:int = 0, workers:int = 1, plots:bool = True, data_dir:str = None, price_rows:int = 100000, repeat:int = 3):
+    """Function to run the stage benchmark on a synthetic register of each size and the price parsing micro-benchmark.
+
+    Args:
+        sizes (list): [Rows of each synthetic register (MIN_ROWS - MAX_ROWS).]
+        seed (int, optional): [Random seed of the synthetic registers]. Defaults to 0.
+        workers (int, optional): [Worker processes for the mapped ingest and plotting]. Defaults to 1.
+        plots (bool, optional): [Include the plotting stage]. Defaults to True.
+        data_dir (str, optional): [Directory to keep the synthetic registers in -> reused by later runs]. Defaults to None -> temporary files.
+        price_rows (int, optional): [Price strings for the price parsing micro-benchmark. 0 skips it]. Defaults to 100000.
+        repeat (int, optional): [Timings per price parser. The fastest is kept]. Defaults to 3.
+
+    Raises:
+        ValueError: [Raised for a size outside MIN_ROWS - MAX_ROWS.]
+
+    Returns:
+        report[dictionary]: [Run details and the timings of each size -> written to JSON by the command line.]
+    """
+    for rows in sizes:
+        if not MIN_ROWS <= rows <= MAX_ROWS:
+            raise ValueError(f"Benchmark sizes must be between {MIN_ROWS} and {MAX_ROWS} rows: {rows}")
+
+    report = {"Created": datetime.now().isoformat(timespec="seconds"), "Python": platform.python_version(), "Platform": platform.platform(),
+              "CPUs": os.cpu_count(), "Seed": seed, "Workers": workers, "Sizes": dict()}
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for rows in sizes:
+            path = os.path.join(data_dir or temp_dir, f"synthetic_{rows}_{seed}.csv")
+            if data_dir:
+                os.makedirs(data_dir, exist_ok=True)
+            if not os.path.exists(path):
+                started = time.perf_counter()
+                write_synthetic_register(path, rows, seed)
+                print(f"Benchmark status: {rows} row register written in {time.perf_counter() - started:.2f}s")
+
+            timings = benchmark_stages(path, workers, plots)
+            report["Sizes"][str(rows)] = {"Rows": rows, "Bytes": os.path.getsize(path), "Stages": timings}
+            print(f"Benchmark status: {rows} rows -> {sum(timings.values()):.2f}s over {len(timings)} stages")
+
+    if price_rows:
+        report["Price Parsing"] = benchmark_price_parsing(price_rows, repeat)
+
+    return report
+
+def compare_reports(previous:dict, current:dict):
+    """Function to compare the stage timings of two reports.
+
+    Args:
+        previous (dict): [Earlier report eg. loaded from the JSON file of an earlier run.]
+        current (dict): [Report of this run.]
+
+    Returns:
+        changes[list]: [List of (size, stage, previous seconds, current seconds, ratio) for stages in both reports.]
+    """
+    changes = []
+    for size, result in current["Sizes"].items():
+        previous_stages = previous.get("Sizes", dict()).get(size, dict()).get("Stages", dict())
+        for stage, seconds in result["Stages"].items():
+            if stage in previous_stages and previous_stages[stage] > 0:
+                changes.append((size, stage, previous_stages[stage], seconds, seconds / previous_stages[stage]))
+    return changes
+
+def print_report(report:dict):
+    """Function to print the stage timings of a report as a table."""
+    for size, result in report["Sizes"].items():
+        print(f"Stage benchmark -> {size} rows ({result['Bytes'] / (1 << 20):.1f} MB)")
+        print("Stage                      |   Seconds   |   µs per row")
+        for stage, seconds in result["Stages"].items():
+            print(f"{stage:<27}|   {seconds:>7.3f}   |   {seconds / result['Rows'] * 1e6:>8.3f}")
+        print()
+
+    if "Price Parsing" in report:
+        results = report["Price Parsing"]
+        print(f"Price parsing benchmark -> {results['Rows']} rows")
+        print("Parser                   |   µs per row   |   Speedup")
+        for name in ("legacy_validate_price", "parse_price", "parse_price_column"):
+            print(f"{name:<25}|   {results[f'{name} seconds per row'] * 1e6:>10.3f}   |   {results[f'{name} speedup']:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark suite for the Property Price Register program.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[MIN_ROWS], help=f"Rows of each synthetic register ({MIN_ROWS} - {MAX_ROWS}).")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the synthetic registers.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for the mapped ingest and plotting.")
+    parser.add_argument("--no-plots", action="store_true", help="Skip the plotting stage.")
+    parser.add_argument("--data-dir", help="Keep the synthetic registers in this directory and reuse them in later runs.")
+    parser.add_argument("--rows", type=int, default=100000, help="Number of register style price strings to parse. 0 skips the price benchmark.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timings per parser. The fastest is reported.")
+    parser.add_argument("--output", help="JSON file to write the results to.")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare the stage timings with.")
+    args = parser.parse_args()
+
+    try:
+        report = run_suite(args.sizes, args.seed, args.workers, not args.no_plots, args.data_dir, args.rows, args.repeat)
+    except ValueError as error:
+        parser.error(str(error))
+    print()
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as json_out:
+            json.dump(report, json_out, indent=2)
+        print(f"Benchmark status: Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as json_in:
+            previous = json.load(json_in)
+        print()
+        print(f"Compared with {args.compare} ({previous.get('Created')}) -> ratio above 1 is slower")
+        for size, stage, before, after, ratio in compare_reports(previous, report):
+            print(f"{size:>9} rows  {stage:<27}{before:>9.3f}s -> {after:>9.3f}s   {ratio:.2f}x{'   <- slower' if ratio > 1.1 else ''}")
@@ -0,0 +1,423 @@
+# Binary cache of the parsed Property Price Register.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Save the parsed register (SalesTable columns) and its counts (SalesAggregator) to disk so the next start of the program
+    can skip reading and parsing PPR_ALL.csv when the file has not changed.
+
+    Files (written next to the csv file):
+        PPR_ALL.csv.cache.npz      -> numpy arrays of the year / month / county counts, the price and quantile sketches, the
+                                      SalesCube and the values of the dictionary encoded columns (small, rewritten on every save).
+        PPR_ALL.csv.cache.dates    -> raw column files (int32 dates, float64 prices, uint16 codes) with one value per row.
+        PPR_ALL.csv.cache.prices      New rows are written after the saved rows, and the files are memory mapped when loaded.
+        PPR_ALL.csv.cache.codes_*
+        PPR_ALL.csv.cache.json     -> fingerprint of the csv file the arrays were built from.
+
+    The fingerprint is the size, modification time and content hash of the csv file. If the size and modification time match,
+    the cache is used straight away. If only the modification time differs (eg. file copied) the content hash is checked.
+    The content hash is a chain over the byte ranges the cache was built from (Segments): hash(previous hash + hash of the
+    range), so an append only hashes the new bytes.
+
+    Incremental append mode:
+        The register only grows -> new sales are added to the end of PPR_ALL.csv. The cache is also a checkpoint: it records the
+        byte offset it was built up to. When the file has grown and the chained content hash of every byte before that offset
+        still matches, only the rows after the offset are parsed (read_checkpoint() / append_register_cache()). Hashing the
+        saved bytes is far cheaper than parsing them, and an edit anywhere in the saved rows is found. The new columns are
+        written after the saved rows of the column files (which are not mapped while they are written) and their counts and
+        cube are merged into the saved ones, so a monthly refresh parses only the new sales. Any other change means the cache
+        is out of date and the csv file is parsed again.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+from ppr_aggregate import SalesAggregator
+from ppr_cube import SalesCube
+from ppr_ingest import MappedRegister
+from ppr_stats import QuantileSketch, RunningStats, SpaceSaving
+from ppr_table import CATEGORY_COLUMNS, SalesTable
+
+# Increase when the layout of the cache files changes -> older cache files are then ignored.
+CACHE_VERSION = 8
+# Column files of the table -> file name suffix: dtype of the values.
+COLUMN_DTYPES = {"dates": np.int32, "prices": np.float64}
+COLUMN_DTYPES.update({f"codes_{name}": np.uint16 for name in CATEGORY_COLUMNS})
+
+def cache_paths(csv_path:str):
+    """Function to return the paths of the cache files belonging to a csv file.
+
+    Args:
+        csv_path (str): [Path to the csv file.]
+
+    Returns:
+        data_path[str], meta_path[str]: [Path of the .npz arrays and of the .json fingerprint.]
+    """
+    return csv_path + ".cache.npz", csv_path + ".cache.json"
+
+def column_path(csv_path:str, column:str):
+    """Function to return the path of the raw file of a table column (name from COLUMN_DTYPES)."""
+    return f"{csv_path}.cache.{column}"
+
+def content_hash(path:str, start:int = 0, end:int = None, chunk_size:int = 1 << 20):
+    """Function to hash a byte range of a file in chunks.
+
+    Args:
+        path (str): [Path to the file.]
+        start (int, optional): [First byte]. Defaults to 0.
+        end (int, optional): [Byte after the last one]. Defaults to None -> end of the file.
+        chunk_size (int, optional): [Bytes read per chunk]. Defaults to 1 MiB.
+
+    Returns:
+        digest[str]: [Hex digest of the bytes.]
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as raw_in:
+        raw_in.seek(start)
+        remaining = os.fstat(raw_in.fileno()).st_size - start if end is None else end - start
+        while remaining > 0:
+            chunk = raw_in.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            remaining -= len(chunk)
+    return digest.hexdigest()
+
+def chain_hash(previous:str, segment:str):
+    """Function to combine the hash of the bytes before a segment with the hash of the segment -> hex digest."""
+    return hashlib.blake2b(bytes.fromhex(previous) + bytes.fromhex(segment), digest_size=20).hexdigest()
+
+def segments_hash(path:str, segments:list):
+    """Function to hash a file as the chain of the byte ranges ending at each offset of segments (see file_fingerprint())."""
+    digest, start = "", 0
+    for end in segments:
+        digest, start = chain_hash(digest, content_hash(path, start, end)), end
+    return digest
+
+def file_fingerprint(path:str, size:int, previous:dict = None):
+    """Function to fingerprint the first size bytes of the csv file by size, modification time and content hash.
+
+    Args:
+        path (str): [Path to the csv file.]
+        size (int): [Bytes the cache is built from.]
+        previous (dict, optional): [Fingerprint of a shorter copy of the file (checkpoint) -> only the bytes after it are
+        hashed]. Defaults to None -> the whole range is hashed.
+
+    Returns:
+        fingerprint[dictionary]: [Dictionary with the keys Size, Mtime, Hash and Segments (end offset of every hashed range).]
+    """
+    digest, start, segments = "", 0, []
+    if previous:
+        digest, start, segments = previous["Hash"], previous["Size"], list(previous["Segments"])
+    return {"Size": size, "Mtime": os.stat(path).st_mtime_ns, "Hash": chain_hash(digest, content_hash(path, start, size)),
+            "Segments": segments + [size]}
+
+def _load_meta(csv_path:str):
+    # Cache details and the current size / modification time of the csv file, or None when there is no usable cache.
+    data_path, meta_path = cache_paths(csv_path)
+    try:
+        with open(meta_path, encoding="utf-8") as meta_in:
+            meta = json.load(meta_in)
+        status = os.stat(csv_path)
+    except (OSError, ValueError):
+        return None, None
+
+    if meta.get("Version") != CACHE_VERSION or not all(os.path.exists(path) for path in [data_path] + [column_path(csv_path, column) for column in COLUMN_DTYPES]):
+        return None, None
+    return meta, status
+
+def read_cache_meta(csv_path:str):
+    """Function to read the cache fingerprint and check it still matches the csv file.
+
+    Args:
+        csv_path (str): [Path to the csv file.]
+
+    Returns:
+        meta[dictionary]: [Cache details (Version, Fingerprint, Offset, Total Rows, Rows) or None when there is no valid cache.]
+    """
+    meta, status = _load_meta(csv_path)
+    fingerprint = meta.get("Fingerprint", {}) if meta else {}
+    if meta is None or fingerprint.get("Size") != status.st_size:
+        return None
+
+    if fingerprint.get("Mtime") != status.st_mtime_ns:
+        # Same size but touched / copied -> only trust the cache if the content is the same.
+        if fingerprint.get("Hash") != segments_hash(csv_path, fingerprint.get("Segments", [])):
+            return None
+        fingerprint["Mtime"] = status.st_mtime_ns
+        _write_json(cache_paths(csv_path)[1], meta)
+
+    return meta
+
+def read_checkpoint(csv_path:str):
+    """Function to check whether the csv file has only had rows added since the cache was built.
+
+    Args:
+        csv_path (str): [Path to the csv file.]
+
+    Returns:
+        meta[dictionary]: [Cache details (see read_cache_meta()) when rows can be appended to the cache, otherwise None.]
+    """
+    meta, status = _load_meta(csv_path)
+    if meta is None or meta.get("Rows") != meta.get("Total Rows"):
+        return None
+
+    # The file must be longer and the cached part must end on a full line -> otherwise the last row may have been changed.
+    offset = meta.get("Offset", 0)
+    if offset <= 0 or status.st_size <= offset:
+        return None
+    with open(csv_path, "rb") as raw_in:
+        raw_in.seek(offset - 1)
+        if raw_in.read(1) != b"\n":
+            return None
+
+    # Every cached byte must be unchanged -> an edit in the middle of the saved rows would leave the columns out of date.
+    fingerprint = meta.get("Fingerprint", {})
+    if fingerprint.get("Size") != offset or fingerprint.get("Hash") != segments_hash(csv_path, fingerprint.get("Segments", [])):
+        return None
+
+    return meta
+
+def count_appended_rows(csv_path:str, meta:dict):
+    """Function to count the rows added after the checkpoint offset.
+
+    Args:
+        csv_path (str): [Path to the csv file.]
+        meta (dict): [Result of read_checkpoint().]
+
+    Returns:
+        rows[int]: [Number of rows added since the cache was built.]
+    """
+    with MappedRegister(csv_path) as register:
+        return register.count_rows(meta["Offset"])
+
+def _write_json(path:str, values:dict):
+    # Write to a temporary file first so an interrupted write never leaves a half written cache behind.
+    with open(path + ".tmp", "w", encoding="utf-8") as json_out:
+        json.dump(values, json_out)
+    os.replace(path + ".tmp", path)
+
+def _sale_arrays(prefix:str, sale):
+    if sale is None:
+        return {}
+    return {f"{prefix}_text": np.array(sale[:4]), f"{prefix}_price": np.array(sale[4], dtype=np.float64)}
+
+def _sale_from_arrays(prefix:str, arrays):
+    if f"{prefix}_text" not in arrays:
+        return None
+    return tuple(arrays[f"{prefix}_text"].tolist()) + (float(arrays[f"{prefix}_price"]),)
+
+def write_table_columns(csv_path:str, sales:SalesTable, rows:int = 0):
+    """Function to write the columns of a table to the raw column files, after the first rows already in the files.
+
+    The files must not be memory mapped while they are written. With rows the values are written in place after those rows
+    (any values left past them by an interrupted append are overwritten or ignored -> only the rows in the cache details are
+    ever read). Without rows new files replace the old ones, so tables still mapping the old files are not changed.
+
+    Args:
+        csv_path (str): [Path to the csv file.]
+        sales (SalesTable): [Table to write. Its codes must use the category values saved in the .npz file.]
+        rows (int, optional): [Rows kept at the start of the files]. Defaults to 0 -> the files are replaced.
+    """
+    columns = {"dates": sales.dates, "prices": sales.prices}
+    columns.update({f"codes_{name}": sales.codes[name] for name in CATEGORY_COLUMNS})
+    for column, values in columns.items():
+        dtype = np.dtype(COLUMN_DTYPES[column])
+        path = column_path(csv_path, column)
+        if rows:
+            with open(path, "r+b") as column_out:
+                column_out.seek(rows * dtype.itemsize)
+                np.ascontiguousarray(values, dtype=dtype).tofile(column_out)
+        else:
+            with open(path + ".tmp", "wb") as column_out:
+                np.ascontiguousarray(values, dtype=dtype).tofile(column_out)
+            os.replace(path + ".tmp", path)
+
+def read_table_columns(csv_path:str, rows:int, categories:dict):
+    """Function to create a SalesTable from the first rows of the raw column files, memory mapped (read only).
+
+    Args:
+        csv_path (str): [Path to the csv file.]
+        rows (int): [Rows to read.]
+        categories (dict): [Dictionary encoded column -> list of values, as saved in the .npz file.]
+
+    Raises:
+        ValueError: [Raised when a column file holds fewer rows.]
+
+    Returns:
+        sales[SalesTable]: [Table of the cached rows.]
+    """
+    columns = dict()
+    for column, dtype in COLUMN_DTYPES.items():
+        path = column_path(csv_path, column)
+        if os.path.getsize(path) < rows * np.dtype(dtype).itemsize:
+            raise ValueError(f"Cache column {column} is shorter than {rows} rows")
+        # np.memmap cannot map an empty file.
+        columns[column] = np.memmap(path, dtype=dtype, mode="r", shape=(rows,)) if rows else np.zeros(0, dtype=dtype)
+
+    codes = {name: columns[f"codes_{name}"] for name in CATEGORY_COLUMNS}
+    return SalesTable(columns["dates"], columns["prices"], codes, categories)
+
+def aggregator_to_arrays(aggregator:SalesAggregator):
+    """Function to convert the counts of a SalesAggregator to a dictionary of numpy arrays for np.savez().
+
+    Args:
+        aggregator (SalesAggregator): [Aggregator to convert.]
+
+    Returns:
+        arrays[dictionary]: [Array name -> numpy array. Keys and counts are stored in dictionary order.]
+    """
+    aggregator.flush()
+    arrays = {
+        "year_keys": np.array(list(aggregator.year_counts), dtype=np.int32),
+        "year_counts": np.array(list(aggregator.year_counts.values()), dtype=np.int64),
+        "month_keys": np.array(list(aggregator.month_counts), dtype=str),
+        "month_counts": np.array(list(aggregator.month_counts.values()), dtype=np.int64),
+        "county_keys": np.array(list(aggregator.county_counts), dtype=str),
+        "county_counts": np.array(list(aggregator.county_counts.values()), dtype=np.int64),
+        # RunningStats as rows of (count, sum, mean, M2, min, max) in the same order as the keys.
+        "price_stats": aggregator.price_stats.to_array(),
+        "year_stats": np.array([aggregator.year_stats[key].to_array() for key in aggregator.year_counts]).reshape(-1, 6),
+        "month_stats": np.array([aggregator.month_stats[key].to_array() for key in aggregator.month_counts]).reshape(-1, 6),
+        "county_stats": np.array([aggregator.county_stats[key].to_array() for key in aggregator.county_counts]).reshape(-1, 6),
+        "rows": np.array(aggregator.rows, dtype=np.int64),
+    }
+    arrays.update(aggregator.price_sketch.to_arrays())
+    arrays.update(aggregator.quantile_sketch.to_arrays())
+    # Quantile sketches of each year / county -> numbered in the order of the keys.
+    for name in ("year", "county"):
+        for position, key in enumerate(getattr(aggregator, f"{name}_counts")):
+            arrays.update(getattr(aggregator, f"{name}_quantile_sketches")[key].to_arrays(f"{name}_quantile_sketch_{position}"))
+    arrays.update(_sale_arrays("highest_sale", aggregator.highest_sale))
+    arrays.update(_sale_arrays("lowest_sale", aggregator.lowest_sale))
+    return arrays
+
+def aggregator_from_arrays(arrays):
+    """Function to create a SalesAggregator from the arrays written by aggregator_to_arrays().
+
+    Args:
+        arrays ([np.lib.npyio.NpzFile]): [Loaded arrays.]
+
+    Returns:
+        aggregator[SalesAggregator]: [Aggregator with the saved counts.]
+    """
+    aggregator = SalesAggregator()
+    aggregator.rows = int(arrays["rows"])
+    aggregator.year_counts = dict(zip(arrays["year_keys"].tolist(), arrays["year_counts"].tolist()))
+    aggregator.month_counts = dict(zip(arrays["month_keys"].tolist(), arrays["month_counts"].tolist()))
+    aggregator.county_counts = dict(zip(arrays["county_keys"].tolist(), arrays["county_counts"].tolist()))
+    aggregator.price_sketch = SpaceSaving.from_arrays(arrays)
+    aggregator.quantile_sketch = QuantileSketch.from_arrays(arrays)
+    aggregator.price_stats = RunningStats.from_array(arrays["price_stats"])
+    for name in ("year", "month", "county"):
+        stats = {key: RunningStats.from_array(values) for key, values in zip(arrays[f"{name}_keys"].tolist(), arrays[f"{name}_stats"])}
+        setattr(aggregator, f"{name}_stats", stats)
+    for name in ("year", "county"):
+        sketches = {key: QuantileSketch.from_arrays(arrays, f"{name}_quantile_sketch_{position}")
+                    for position, key in enumerate(getattr(aggregator, f"{name}_counts"))}
+        setattr(aggregator, f"{name}_quantile_sketches", sketches)
+    aggregator.highest_sale = _sale_from_arrays("highest_sale", arrays)
+    aggregator.lowest_sale = _sale_from_arrays("lowest_sale", arrays)
+    return aggregator
+
+def _save_state(csv_path:str, categories:dict, aggregator:SalesAggregator, cube:SalesCube):
+    # Counts, cube and category values -> one small .npz file.
+    data_path = cache_paths(csv_path)[0]
+    arrays = {f"categories_{name}": np.array(categories[name], dtype=str) for name in CATEGORY_COLUMNS}
+    arrays.update(aggregator_to_arrays(aggregator))
+    arrays.update(cube.to_arrays())
+
+    # np.savez adds .npz to a name without it -> keep the extension on the temporary file.
+    temporary_path = data_path + ".tmp.npz"
+    np.savez(temporary_path, **arrays)
+    os.replace(temporary_path, data_path)
+
+def _save_meta(csv_path:str, fingerprint:dict, total_rows:int, rows:int):
+    _write_json(cache_paths(csv_path)[1], {"Version": CACHE_VERSION, "Fingerprint": fingerprint, "Offset": fingerprint["Size"],
+                                           "Total Rows": total_rows, "Rows": rows})
+
+def save_register_cache(csv_path:str, total_rows:int, rows:int, sales:SalesTable, aggregator:SalesAggregator, cube:SalesCube):
+    """Function to write the parsed table, counts and cube to the cache files next to the csv file.
+
+    Args:
+        csv_path (str): [Path to the csv file that was parsed.]
+        total_rows (int): [Rows in the csv file.]
+        rows (int): [Rows that were processed (rows_to_process).]
+        sales (SalesTable): [Parsed table.]
+        aggregator (SalesAggregator): [Counts of the parsed rows.]
+        cube (SalesCube): [Cube of the parsed rows.]
+    """
+    write_table_columns(csv_path, sales)
+    _save_state(csv_path, sales.categories, aggregator, cube)
+    _save_meta(csv_path, file_fingerprint(csv_path, os.path.getsize(csv_path)), total_rows, rows)
+
+def _load_state(csv_path:str, rows:int):
+    # Category values, counts and cube of the cache (not the table columns). The .npz file must have been written for the
+    # same number of rows.
+    with np.load(cache_paths(csv_path)[0], allow_pickle=False) as arrays:
+        if int(arrays["rows"]) != rows:
+            raise ValueError("Cache arrays do not match the cache details")
+        categories = {name: arrays[f"categories_{name}"].tolist() for name in CATEGORY_COLUMNS}
+        return categories, aggregator_from_arrays(arrays), SalesCube.from_arrays(arrays)
+
+def load_register_cache(csv_path:str, rows:int, meta:dict = None):
+    """Function to load the parsed table, counts and cube from the cache files.
+
+    Args:
+        csv_path (str): [Path to the csv file.]
+        rows (int): [Rows to process. The cache is only used when it was built from the same number of rows.]
+        meta (dict, optional): [Result of read_cache_meta() if already read]. Defaults to None -> read here.
+
+    Returns:
+        sales[SalesTable], aggregator[SalesAggregator], cube[SalesCube]: [Cached table, counts and cube, or None when the cache cannot be used.]
+    """
+    meta = meta or read_cache_meta(csv_path)
+    if meta is None or meta.get("Rows") != rows:
+        return None
+
+    try:
+        categories, aggregator, cube = _load_state(csv_path, rows)
+        return read_table_columns(csv_path, rows, categories), aggregator, cube
+    except (OSError, KeyError, ValueError):
+        return None
+
+def append_register_cache(csv_path:str, meta:dict):
+    """Function to parse only the rows added after the checkpoint and add them to the cache.
+
+    The new columns are written after the saved rows of the column files (codes re-coded to the saved category values), the
+    counts and cube of the new rows are merged into the saved ones and only the small .npz file and the fingerprint are
+    rewritten. The saved rows are not read or rebuilt -> the column files are only memory mapped once the new rows are written.
+
+    Args:
+        csv_path (str): [Path to the csv file.]
+        meta (dict): [Result of read_checkpoint().]
+
+    Returns:
+        sales[SalesTable], aggregator[SalesAggregator], cube[SalesCube], appended[int]: [Table, counts and cube of every row and
+        the number of rows added, or None when the cached arrays cannot be read.]
+    """
+    rows = meta["Rows"]
+    try:
+        categories, aggregator, cube = _load_state(csv_path, rows)
+    except (OSError, KeyError, ValueError):
+        return None
+
+    with MappedRegister(csv_path) as register:
+        new_sales, new_aggregator = register.read_register(meta["Offset"])
+        size = register.size
+
+    # New values of the dictionary encoded columns go to the end of the saved values, in the order first seen.
+    codes = dict()
+    for name in CATEGORY_COLUMNS:
+        lookup = {value: code for code, value in enumerate(categories[name])}
+        mapping = np.array([lookup.setdefault(value, len(lookup)) for value in new_sales.categories[name]], dtype=np.uint16)
+        codes[name] = mapping[new_sales.codes[name]] if len(mapping) else np.zeros(0, dtype=np.uint16)
+        categories[name] = list(lookup)
+
+    write_table_columns(csv_path, SalesTable(new_sales.dates, new_sales.prices, codes, categories), rows)
+    aggregator.merge(new_aggregator)
+    cube.merge(SalesCube.from_table(new_sales))
+    _save_state(csv_path, categories, aggregator, cube)
+    total_rows = rows + len(new_sales)
+    _save_meta(csv_path, file_fingerprint(csv_path, size, meta["Fingerprint"]), total_rows, total_rows)
+
+    return read_table_columns(csv_path, total_rows, categories), aggregator, cube, len(new_sales)
@@ -0,0 +1,161 @@
+# Precomputed data cube of the parsed Property Price Register.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Precompute count, sum, sum of squares, min and max of the prices for every (year, month, county, description) cell, so
+    that totals by any mix of those dimensions are a sum over cells instead of a pass over the rows.
+
+    The cube is built once from the SalesTable (numpy bincount over a single cell number per row) and saved with the parse
+    cache (see ppr_cache). Examples:
+        sales per year           -> cube.rollup("year")["Count"]
+        sales per county         -> cube.rollup("county")["Count"]
+        sales per county by type -> cube.rollup("county", "description")["Count"]
+
+    This extends what calculate_yearly_house_sales(), calculate_county_sales() and calculate_most_month_of_sale() do for one
+    dimension at a time. Cubes of separate runs (eg. rows appended to the register) are combined with merge().
+"""
+import numpy as np
+from ppr_table import SalesTable, ordinals_to_year_month
+
+# Dimensions of the cube in axis order.
+CUBE_DIMENSIONS = ("year", "month", "county", "description")
+# Measures kept for every cell.
+CUBE_MEASURES = ("Count", "Sum", "Sum Squares", "Min", "Max")
+
+class SalesCube:
+    """Count / sum / sum of squares / min / max of the prices for every (year, month, county, description) cell.
+
+    Attributes:
+        labels (dict): [Dimension -> list of the values along that axis (years, months 1 - 12, counties, descriptions).]
+        measures (dict): [Measure -> numpy array with one axis per dimension. Empty cells have Min inf and Max -inf.]
+    """
+
+    def __init__(self, labels:dict, measures:dict):
+        self.labels = labels
+        self.measures = measures
+
+    @classmethod
+    def from_table(cls, sales:SalesTable):
+        """Function to build the cube from the columns of a parsed table.
+
+        Args:
+            sales (SalesTable): [Parsed table.]
+
+        Returns:
+            cube[SalesCube]: [Cube of every cell.]
+        """
+        years, months = ordinals_to_year_month(sales.dates)
+        first_year = int(years.min()) if len(years) else 0
+        last_year = int(years.max()) if len(years) else -1
+        labels = {"year": list(range(first_year, last_year + 1)), "month": list(range(1, 13)),
+                  "county": list(sales.categories["county"]), "description": list(sales.categories["description"])}
+        shape = tuple(len(labels[dimension]) for dimension in CUBE_DIMENSIONS)
+
+        # One cell number per row -> every measure is a single bincount / ufunc.at pass.
+        cells = np.ravel_multi_index((years - first_year, months - 1, sales.codes["county"], sales.codes["description"]), shape)
+        size = int(np.prod(shape))
+        minimum = np.full(size, np.inf)
+        maximum = np.full(size, -np.inf)
+        np.minimum.at(minimum, cells, sales.prices)
+        np.maximum.at(maximum, cells, sales.prices)
+
+        measures = {"Count": np.bincount(cells, minlength=size).reshape(shape),
+                    "Sum": np.bincount(cells, weights=sales.prices, minlength=size).reshape(shape),
+                    "Sum Squares": np.bincount(cells, weights=sales.prices * sales.prices, minlength=size).reshape(shape),
+                    "Min": minimum.reshape(shape), "Max": maximum.reshape(shape)}
+        return cls(labels, measures)
+
+    def _axes(self, dimensions:tuple):
+        unknown = set(dimensions) - set(CUBE_DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Unknown cube dimensions: {sorted(unknown)}")
+        return tuple(axis for axis, dimension in enumerate(CUBE_DIMENSIONS) if dimension not in dimensions)
+
+    def rollup(self, *dimensions:str):
+        """Function to total the cells over every dimension that is not named.
+
+        Args:
+            dimensions (str): [Dimensions to keep eg. "year" or "year", "county". None totals the whole cube.]
+
+        Raises:
+            ValueError: [Raised for an unknown dimension.]
+
+        Returns:
+            totals[dictionary]: [Measure -> array with one axis per named dimension (in CUBE_DIMENSIONS order).]
+        """
+        axes = self._axes(dimensions)
+        return {"Count": self.measures["Count"].sum(axis=axes), "Sum": self.measures["Sum"].sum(axis=axes),
+                "Sum Squares": self.measures["Sum Squares"].sum(axis=axes),
+                "Min": self.measures["Min"].min(axis=axes), "Max": self.measures["Max"].max(axis=axes)}
+
+    def counts(self, dimension:str):
+        """Function to count the sales of every value of one dimension.
+
+        Args:
+            dimension (str): [Dimension from CUBE_DIMENSIONS.]
+
+        Returns:
+            counts[dictionary]: [Value -> sales. Values without sales are left out.]
+        """
+        totals = self.rollup(dimension)["Count"].tolist()
+        return {label: count for label, count in zip(self.labels[dimension], totals) if count}
+
+    def merge(self, other):
+        """Function to add the cells of another cube (eg. the cube of newly appended rows) to this one.
+
+        The year axis grows to cover the years of both cubes and counties / descriptions that are new are added to the end of
+        their axes. Cells are matched by label, so the two cubes do not need the same category codes.
+
+        Args:
+            other (SalesCube): [Cube of different rows.]
+
+        Returns:
+            self[SalesCube]: [This cube, updated.]
+        """
+        years = self.labels["year"] + other.labels["year"]
+        labels = {"year": list(range(min(years), max(years) + 1)) if years else [], "month": list(range(1, 13))}
+        for dimension in ("county", "description"):
+            labels[dimension] = self.labels[dimension] + [label for label in other.labels[dimension] if label not in self.labels[dimension]]
+        shape = tuple(len(labels[dimension]) for dimension in CUBE_DIMENSIONS)
+
+        measures = {"Count": np.zeros(shape, dtype=np.int64), "Sum": np.zeros(shape), "Sum Squares": np.zeros(shape),
+                    "Min": np.full(shape, np.inf), "Max": np.full(shape, -np.inf)}
+        for cube in (self, other):
+            # Position of every label of the cube along the merged axes.
+            positions = {dimension: {label: position for position, label in enumerate(labels[dimension])} for dimension in CUBE_DIMENSIONS}
+            cells = np.ix_(*[[positions[dimension][label] for label in cube.labels[dimension]] for dimension in CUBE_DIMENSIONS])
+            for measure in ("Count", "Sum", "Sum Squares"):
+                measures[measure][cells] += cube.measures[measure]
+            measures["Min"][cells] = np.minimum(measures["Min"][cells], cube.measures["Min"])
+            measures["Max"][cells] = np.maximum(measures["Max"][cells], cube.measures["Max"])
+
+        self.labels, self.measures = labels, measures
+        return self
+
+    def to_arrays(self):
+        """Function to convert the cube to a dictionary of numpy arrays for np.savez() (see ppr_cache).
+
+        Returns:
+            arrays[dictionary]: [Array name -> numpy array.]
+        """
+        arrays = {"cube_years": np.array(self.labels["year"], dtype=np.int32),
+                  "cube_counties": np.array(self.labels["county"], dtype=str),
+                  "cube_descriptions": np.array(self.labels["description"], dtype=str)}
+        for measure in CUBE_MEASURES:
+            arrays["cube_" + measure.lower().replace(" ", "_")] = self.measures[measure]
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Function to create a cube from the arrays written by to_arrays().
+
+        Args:
+            arrays ([np.lib.npyio.NpzFile]): [Loaded arrays.]
+
+        Returns:
+            cube[SalesCube]: [Cube rebuilt from the arrays.]
+        """
+        labels = {"year": arrays["cube_years"].tolist(), "month": list(range(1, 13)),
+                  "county": arrays["cube_counties"].tolist(), "description": arrays["cube_descriptions"].tolist()}
+        measures = {measure: arrays["cube_" + measure.lower().replace(" ", "_")] for measure in CUBE_MEASURES}
+        return cls(labels, measures)
@@ -0,0 +1,294 @@
+# Machine readable export of the Property Price Register results.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Write the results of the analysis as files other programs can load straight away, so reporting jobs do not need to run
+    the analysis again or parse Python list text.
+
+    Result tables (result_tables()):
+        summary  -> Rows Processed, Total Sales, Max / Min / Mean Sale, Mode Sale and its frequency, Standard Deviation, Median.
+        years    -> Year, Sales, Median Price.
+        counties -> County, Sales, Median Price.
+        months   -> Month (mm/yyyy) in date order, Sales, Total Value, Mean / Median Price, their 3 / 6 / 12 month moving averages
+                    and year over year % change (see ppr_timeseries).
+        months_counties -> County and the months columns for every county.
+        prices   -> Price, Frequency (the price frequency table used for the mode). With --top-prices space-saving only the
+                    prices kept by the Space-Saving sketch, with their estimated frequency.
+        histogram, histogram_counties, histogram_years -> Scale, (County / Year), Bin Low, Bin High, Sales, Cumulative % of
+                    the fixed and log price histograms (see ppr_histogram).
+
+    Formats (export_results()):
+        csv      -> one csv file per table (csv module, header row).
+        jsonl    -> one JSON Lines file per table (one JSON object per row).
+        columnar -> one Parquet file per table when pyarrow is installed, otherwise one .npz file of numpy column arrays.
+
+    Rows are written in blocks through large file buffers (writerows / writelines) rather than one write call per value.
+
+    Cleaned register (export_clean_register()):
+        A copy of the register with the price as a number, the county trimmed and the date of sale in ISO format (yyyy-mm-dd),
+        optionally filtered on county / description / full market price / vat exclusive / year. The rows are streamed from the
+        csv file and written in blocks, so memory does not grow with the size of the register. The output is compressed by
+        file extension -> .gz (gzip), .bz2 (bz2), .xz (lzma), .zst (zstd, Python 3.14+) or plain csv for anything else.
+"""
+import bz2
+import csv
+import gzip
+import json
+import lzma
+import os
+import numpy as np
+from ppr_filter import filter_predicate
+from ppr_ingest import stream_register_rows
+
+try:
+    from compression import zstd
+except ImportError:
+    zstd = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Formats written by export_results().
+EXPORT_FORMATS = ("csv", "jsonl", "columnar")
+# Bytes buffered before each write to disk.
+WRITE_BUFFER_BYTES = 1 << 20
+# Rows handed to writerows / writelines at a time.
+WRITE_BLOCK_ROWS = 10000
+# Columns of the cleaned register.
+CLEAN_COLUMNS = ["Date of Sale", "Address", "Postal Code", "County", "Price €", "Not Full Market Price", "VAT Exclusive",
+                 "Description of Property"]
+# File extension -> compression module with an open() function.
+COMPRESSORS = {".gz": gzip, ".bz2": bz2, ".xz": lzma, ".zst": zstd}
+# Columns of the summary table. Also the header of PPR_OUT.csv.
+SUMMARY_COLUMNS = ["Rows Processed", "Total Sales €", "Max Sale €", "Min Sales €", "Mean Sales €", "Mode Sales €", "Mode Frequency",
+                   "Standard Dev Of Price €", "Median Sales €"]
+
+def summary_row(rows_to_process:int, results:dict):
+    """Function to create the summary row of the results (one value per SUMMARY_COLUMNS).
+
+    Args:
+        rows_to_process (int): [Rows processed.]
+        results (dict): [Dictionary created by analyse_register() in the main program.]
+
+    Returns:
+        row[list]: [Summary values.]
+    """
+    price_stats = results["Price Stats"]
+    mode, frequency = results["Top Prices"][0]
+    return [rows_to_process, price_stats["Sum"], price_stats["Max"], price_stats["Min"], price_stats["Sum"] / price_stats["Count"], mode,
+            frequency, price_stats["Std Dev"], results["Quartiles"][0.5]]
+
+def result_tables(rows_to_process:int, results:dict):
+    """Function to arrange the results as tables of columns and rows.
+
+    Args:
+        rows_to_process (int): [Rows processed.]
+        results (dict): [Dictionary created by analyse_register() in the main program.]
+
+    Returns:
+        tables[dictionary]: [Table name -> (list of column names, list of rows).]
+    """
+    year_medians, county_medians = results["Year Medians"], results["County Medians"]
+    histograms = results["Price Histograms"].values()
+    bin_columns = ["Bin Low €", "Bin High €", "Sales", "Cumulative %"]
+    series, county_series = results["Monthly Series"], results["County Monthly Series"]
+    return {
+        "summary": (SUMMARY_COLUMNS, [summary_row(rows_to_process, results)]),
+        "years": (["Year", "Sales", "Median Price €"], [[year, sales, year_medians.get(year)] for year, sales in results["Year Dict"].items()]),
+        "counties": (["County", "Sales", "Median Price €"], [[county, sales, county_medians.get(county)] for county, sales in results["County Dict"].items()]),
+        "months": (series.table_columns(), series.table_rows()),
+        "months_counties": (["County"] + series.table_columns(), [[county] + row for county, s in county_series.items() for row in s.table_rows()]),
+        "prices": (["Price €", "Frequency"], [[price, frequency] for price, frequency in results["Price Frequency"].items()]),
+        "histogram": (["Scale"] + bin_columns, [[h.scale] + row for h in histograms for row in h.table_rows()]),
+        "histogram_counties": (["Scale", "County"] + bin_columns, [[h.scale, county] + row for h in histograms
+                                                                  for county, counts in h.county_counts.items() for row in h.table_rows(counts)]),
+        "histogram_years": (["Scale", "Year"] + bin_columns, [[h.scale, year] + row for h in histograms
+                                                             for year, counts in h.year_counts.items() for row in h.table_rows(counts)]),
+    }
+
+def _blocks(rows):
+    # Split the rows into blocks of WRITE_BLOCK_ROWS.
+    for start in range(0, len(rows), WRITE_BLOCK_ROWS):
+        yield rows[start:start + WRITE_BLOCK_ROWS]
+
+def _column_array(values:list):
+    # numpy array of a column -> a number column with missing values (None) becomes float64 with NaN instead of an object array.
+    if None in values and all(value is None or isinstance(value, (int, float)) for value in values):
+        return np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+    return np.array(values)
+
+def write_csv_table(path:str, columns:list, rows:list):
+    """Function to write a table as a csv file with a header row.
+
+    Args:
+        path (str): [File to write.]
+        columns (list): [Column names.]
+        rows (list): [Rows of values.]
+    """
+    with open(path, "w", encoding="utf-8", newline="", buffering=WRITE_BUFFER_BYTES) as csv_out:
+        writer = csv.writer(csv_out)
+        writer.writerow(columns)
+        for block in _blocks(rows):
+            writer.writerows(block)
+
+def write_jsonl_table(path:str, columns:list, rows:list):
+    """Function to write a table as a JSON Lines file -> one object per row with the column names as keys.
+
+    Args:
+        path (str): [File to write.]
+        columns (list): [Column names.]
+        rows (list): [Rows of values.]
+    """
+    with open(path, "w", encoding="utf-8", buffering=WRITE_BUFFER_BYTES) as jsonl_out:
+        for block in _blocks(rows):
+            jsonl_out.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in block)
+
+def write_columnar_table(path:str, columns:list, rows:list):
+    """Function to write a table column by column -> Parquet when pyarrow is installed, otherwise numpy .npz.
+
+    Args:
+        path (str): [File to write without extension.]
+        columns (list): [Column names.]
+        rows (list): [Rows of values.]
+
+    Returns:
+        path[str]: [File written (.parquet or .npz).]
+    """
+    values = {column: [row[i] for row in rows] for i, column in enumerate(columns)}
+    if pyarrow is not None:
+        pyarrow.parquet.write_table(pyarrow.table(values), path + ".parquet")
+        return path + ".parquet"
+
+    # Text columns are stored as unicode arrays, numbers as float64 / int64. Missing numbers (None) are stored as NaN.
+    np.savez(path + ".npz", **{column: _column_array(column_values) for column, column_values in values.items()})
+    return path + ".npz"
+
+def export_results(rows_to_process:int, results:dict, output_dir:str, prefix:str = "", formats:tuple = EXPORT_FORMATS):
+    """Function to write every result table in the chosen formats.
+
+    Args:
+        rows_to_process (int): [Rows processed.]
+        results (dict): [Dictionary created by analyse_register() in the main program.]
+        output_dir (str): [Directory to write the files in. Created if needed.]
+        prefix (str, optional): [Added to the start of each file name eg. name of the register file]. Defaults to "".
+        formats (tuple, optional): [Formats from EXPORT_FORMATS]. Defaults to every format.
+
+    Raises:
+        ValueError: [Raised for an unknown format.]
+
+    Returns:
+        paths[list]: [Files written.]
+    """
+    unknown = set(formats) - set(EXPORT_FORMATS)
+    if unknown:
+        raise ValueError(f"Unknown export formats: {sorted(unknown)}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for name, (columns, rows) in result_tables(rows_to_process, results).items():
+        path = os.path.join(output_dir, prefix + name)
+        if "csv" in formats:
+            write_csv_table(path + ".csv", columns, rows)
+            paths.append(path + ".csv")
+        if "jsonl" in formats:
+            write_jsonl_table(path + ".jsonl", columns, rows)
+            paths.append(path + ".jsonl")
+        if "columnar" in formats:
+            paths.append(write_columnar_table(path, columns, rows))
+
+    return paths
+
+def append_summary_csv(path:str, rows_to_process:int, results:dict):
+    """Function to add the summary row of a run to a csv file (eg. PPR_OUT.csv). The header is written when the file is new.
+
+    A file in the older layout (Python list text) is renamed to name.old.csv first so the csv file only holds csv rows.
+
+    Args:
+        path (str): [Csv file to add to.]
+        rows_to_process (int): [Rows processed.]
+        results (dict): [Dictionary created by analyse_register() in the main program.]
+    """
+    header = ",".join(SUMMARY_COLUMNS)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8", errors="replace") as csv_in:
+            first_line = csv_in.readline().rstrip("\r\n")
+        if first_line and first_line != header:
+            os.replace(path, os.path.splitext(path)[0] + ".old.csv")
+
+    new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, "a", encoding="utf-8", newline="") as csv_out:
+        writer = csv.writer(csv_out)
+        if new_file:
+            writer.writerow(SUMMARY_COLUMNS)
+        writer.writerow(summary_row(rows_to_process, results))
+
+def open_export_file(path:str):
+    """Function to open a text file for writing, compressed according to the file extension (see COMPRESSORS).
+
+    Args:
+        path (str): [File to write eg. PPR_CLEAN.csv.gz.]
+
+    Raises:
+        ValueError: [Raised for .zst when the zstd module is not available.]
+
+    Returns:
+        file[TextIO]: [Open text file.]
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in COMPRESSORS:
+        return open(path, "w", encoding="utf-8", newline="", buffering=WRITE_BUFFER_BYTES)
+
+    compressor = COMPRESSORS[extension]
+    if compressor is None:
+        raise ValueError(f"Compression {extension} needs Python 3.14 or later (compression.zstd).")
+    return compressor.open(path, "wt", encoding="utf-8", newline="")
+
+def clean_register_row(row:tuple):
+    """Function to convert a row from stream_register_rows() to the cleaned layout (CLEAN_COLUMNS).
+
+    Args:
+        row (tuple): [Date Of Sale, Address, Postal Code, County, Full Market Price, VAT Exclusive, Description and Price.]
+
+    Returns:
+        row[list]: [Cleaned values -> ISO date and the price as a number.]
+    """
+    d, a, p, c, f, v, descr, price = row
+    return [f"{d[6:10]}-{d[3:5]}-{d[0:2]}", a, p, c, round(price, 2), f, v, descr]
+
+def export_clean_register(csv_path:str, out_path:str, filters:dict = None, rows_to_process:int = 0):
+    """Function to write a cleaned (and optionally filtered) copy of the register.
+
+    Args:
+        csv_path (str): [Register csv file to read.]
+        out_path (str): [File to write. Compressed by extension -> see open_export_file().]
+        filters (dict, optional): [Column name -> accepted values, as for BitmapIndex.select()]. Defaults to None -> every row.
+        rows_to_process (int, optional): [Maximum rows to read from the register. 0 reads every row]. Defaults to 0.
+
+    Returns:
+        rows_written[int]: [Rows written to the cleaned file.]
+    """
+    predicate = filter_predicate(filters or dict())
+    rows_written = 0
+    with open(csv_path, encoding="utf-8") as csv_in, open_export_file(out_path) as clean_out:
+        csv_in.readline()  # Header line
+        writer = csv.writer(clean_out)
+        writer.writerow(CLEAN_COLUMNS)
+
+        # Matching rows are collected in a block of WRITE_BLOCK_ROWS and written with one writerows() call.
+        block = []
+        for row in stream_register_rows(csv_in, rows_to_process):
+            # Filter values in FILTER_COLUMNS order -> county, description, fullmarketprice, vatexcl, year.
+            if predicate((row[3], row[6], row[4], row[5], row[0][6:10])):
+                block.append(clean_register_row(row))
+                if len(block) == WRITE_BLOCK_ROWS:
+                    writer.writerows(block)
+                    rows_written += len(block)
+                    block = []
+
+        writer.writerows(block)
+        rows_written += len(block)
+
+    return rows_written
@@ -0,0 +1,198 @@
+# Bitmap filter engine for the parsed Property Price Register.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Calculate the price statistics of any subset of the sales eg. the median price of new dwellings in Dublin in 2019.
+
+    BitmapIndex keeps one bitmap per value of county, description, fullmarketprice, vatexcl and year. Bit r of a bitmap is
+    set when row r has that value. The bitmaps are packed 8 rows per byte (numpy packbits), so a bitmap of the full register
+    is n / 8 bytes and combining them is a bitwise operation on bytes:
+        several values of one column  -> bitwise OR  eg. Dublin or Cork
+        filters on different columns  -> bitwise AND eg. (Dublin or Cork) and New Dwelling and 2019
+
+    The rows of the final bitmap are then passed to filtered_statistics() which gives count, sum, max, min, mean, median,
+    mode and standard deviation of the subset, the same statistics the main menu gives for the whole register.
+
+    filter_predicate() applies the same filters to rows one at a time, for code that streams the register without a table.
+    Text typed as a filter (menu or --filter) is matched to the register values with match_filter_values().
+"""
+import numpy as np
+from ppr_stats import price_mode, price_quantiles, price_statistics
+from ppr_table import CATEGORY_COLUMNS, SalesTable
+
+# Columns that can be filtered on -> the dictionary encoded columns of the table and the year of sale.
+FILTER_COLUMNS = CATEGORY_COLUMNS + ("year",)
+
+class BitmapIndex:
+    """Packed bitmap of the rows holding each value of the filter columns.
+
+    Attributes:
+        rows (int): [Rows in the indexed table.]
+        bitmaps (dict): [Column name -> dictionary of value -> packed uint8 bitmap.]
+    """
+
+    def __init__(self, sales:SalesTable):
+        self.rows = len(sales)
+        self.bitmaps = dict()
+        for name in CATEGORY_COLUMNS:
+            codes = sales.codes[name]
+            self.bitmaps[name] = {value: np.packbits(codes == code) for code, value in enumerate(sales.categories[name])}
+
+        years = sales.years()
+        self.bitmaps["year"] = {int(year): np.packbits(years == year) for year in np.unique(years)}
+
+    def values(self, column:str):
+        """Function to return the values of a column that have a bitmap (eg. every county)."""
+        return list(self.bitmaps[column])
+
+    def match_values(self, column:str, text:str):
+        """Function to find the values of a column matching text typed by the user -> see match_filter_values().
+
+        Args:
+            column (str): [Column name from FILTER_COLUMNS.]
+            text (str): [Text typed by the user.]
+
+        Returns:
+            values[list]: [Matching values. Empty when nothing matches.]
+        """
+        return match_filter_values(self.bitmaps[column], text)
+
+    def resolve_filters(self, filters:dict):
+        """Function to replace the typed text of filters (eg. --filter description=new) by the matching values of the register.
+
+        Text is matched with match_values(), the same rule as the filters typed in the menu. Years are used as they are.
+
+        Args:
+            filters (dict): [Column name -> list of typed values. None is kept -> the column is not filtered.]
+
+        Raises:
+            ValueError: [Raised for a column that cannot be filtered on.]
+
+        Returns:
+            filters[dictionary]: [Column name -> list of register values. An empty list when nothing matches -> no rows.]
+        """
+        resolved = dict()
+        for column, accepted in filters.items():
+            if column not in self.bitmaps:
+                raise ValueError(f"Cannot filter on column: {column}")
+            if accepted is None or column == "year":
+                resolved[column] = accepted
+                continue
+            # Several typed values can match the same register value -> keep each value once.
+            matched = [value for text in accepted for value in self.match_values(column, str(text))]
+            resolved[column] = list(dict.fromkeys(matched))
+        return resolved
+
+    def select(self, filters:dict):
+        """Function to combine the bitmaps of the filters into one bitmap.
+
+        Args:
+            filters (dict): [Column name -> list of accepted values. Columns not in the dictionary (or with None) are not filtered.]
+
+        Raises:
+            ValueError: [Raised for a column that cannot be filtered on.]
+
+        Returns:
+            bitmap[np.ndarray]: [Packed bitmap of the rows matching every filter.]
+        """
+        selected = np.full((self.rows + 7) // 8, 0xFF, dtype=np.uint8)
+        for column, accepted in filters.items():
+            if column not in self.bitmaps:
+                raise ValueError(f"Cannot filter on column: {column}")
+            if accepted is None:
+                continue
+
+            # OR the values of one column together, then AND with the other columns.
+            column_bitmap = np.zeros_like(selected)
+            for value in accepted:
+                if value in self.bitmaps[column]:
+                    np.bitwise_or(column_bitmap, self.bitmaps[column][value], out=column_bitmap)
+            np.bitwise_and(selected, column_bitmap, out=selected)
+
+        return selected
+
+    def count(self, bitmap):
+        """Function to count the rows set in a bitmap."""
+        return int(np.unpackbits(bitmap, count=self.rows).sum())
+
+    def row_numbers(self, bitmap):
+        """Function to return the row numbers set in a bitmap, in table order."""
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.rows))
+
+def match_filter_values(values, text:str):
+    """Function to find the values matching text typed as a filter. The one matching rule of the menu and batch filters.
+
+    An exact match (ignoring case) is used when there is one. Otherwise every value containing the text is used,
+    eg. "new" -> "New Dwelling house /Apartment".
+
+    Args:
+        values (iterable): [Values of the column eg. every county of the register.]
+        text (str): [Typed text.]
+
+    Returns:
+        values[list]: [Matching values, in the order given. Empty when nothing matches.]
+    """
+    text = text.strip().lower()
+    exact = [value for value in values if str(value).lower() == text]
+    return exact or [value for value in values if text in str(value).lower()]
+
+def parse_year_range(text:str):
+    """Function to read a year (yyyy) or a range of years (yyyy-yyyy) typed as a year filter.
+
+    Args:
+        text (str): [Typed text eg. 2019 or 2014-2016.]
+
+    Raises:
+        ValueError: [Raised when the text is not a year or a range of years.]
+
+    Returns:
+        years[list]: [Every year of the range (both ends included) eg. 2014-2016 -> [2014, 2015, 2016].]
+    """
+    first_year, _, last_year = text.strip().partition("-")
+    return list(range(int(first_year), int(last_year or first_year) + 1))
+
+def filtered_statistics(sales:SalesTable, rows):
+    """Function to calculate the menu statistics for a subset of the rows.
+
+    Args:
+        sales (SalesTable): [Parsed table.]
+        rows (np.ndarray): [Row numbers of the subset eg. BitmapIndex.row_numbers().]
+
+    Returns:
+        price_stats[dictionary]: [Dictionary with the keys Count, Sum, Max, Min, Mean, Median, Mode, Mode Frequency and Std Dev.]
+    """
+    prices = sales.prices[rows]
+    price_stats = price_statistics(prices)
+    mode, frequency = price_mode(prices)
+
+    return {"Count": price_stats["Count"], "Sum": price_stats["Sum"], "Max": price_stats["Max"], "Min": price_stats["Min"],
+            "Mean": price_stats["Mean"], "Median": price_quantiles(prices, (0.5,))[0.5], "Mode": mode, "Mode Frequency": frequency,
+            "Std Dev": price_stats["Std Dev"]}
+
+def filter_predicate(filters:dict):
+    """Function to create a row test for the same filters as BitmapIndex.select(), for rows that are not in a table.
+
+    Used when the register is streamed one row at a time (eg. the cleaned register export) and no bitmaps are built.
+    The accepted values are values of the register -> typed text is matched first with BitmapIndex.resolve_filters().
+    Values are compared ignoring case. Several values of one column are OR'd, different columns are AND'd.
+
+    Args:
+        filters (dict): [Column name -> list of accepted values. Columns not in the dictionary (or with None) are not filtered.]
+
+    Raises:
+        ValueError: [Raised for a column that cannot be filtered on.]
+
+    Returns:
+        predicate[function]: [Function taking the row values in FILTER_COLUMNS order and returning True when the row matches.]
+    """
+    checks = []
+    for column, accepted in filters.items():
+        if column not in FILTER_COLUMNS:
+            raise ValueError(f"Cannot filter on column: {column}")
+        if accepted is not None:
+            checks.append((FILTER_COLUMNS.index(column), {str(value).lower() for value in accepted}))
+
+    def predicate(values):
+        return all(str(values[position]).lower() in accepted for position, accepted in checks)
+
+    return predicate
@@ -0,0 +1,177 @@
+# Price histograms of the Property Price Register.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Count the sales into price bins for the whole register, for each county and for each year, for the histogram / CDF plot
+    and the exported histogram tables.
+
+    Bins (price_bin_edges()):
+        fixed -> bins of equal width from the lowest price to the FIXED_UPPER_QUANTILE price. The register has a few very
+                 large sales, so the top bin also holds every price above its upper edge.
+        log   -> bins of equal width in log(price) from the lowest to the highest positive price.
+
+    The edges only need the minimum, maximum and (fixed) one quantile found by selection -> the price column is never sorted.
+    The bin of every price is then calculated arithmetically (one vectorised pass, no search of the edges) and the counts of
+    every group come from one np.bincount of group * bins + bin -> see grouped_bin_counts().
+
+    Usage:
+        histogram = PriceHistogram.from_table(sales, bins=50, scale="log")
+        histogram.counts_for("Dublin"), histogram.cdf(histogram.counts_for(2019))
+"""
+import numpy as np
+from ppr_stats import price_quantiles
+
+# Bins of each histogram.
+HISTOGRAM_BINS = 50
+# Bin scales -> see price_bin_edges().
+HISTOGRAM_SCALES = ("fixed", "log")
+# Quantile of the prices used as the upper edge of fixed width bins.
+FIXED_UPPER_QUANTILE = 0.99
+
+def price_bin_edges(prices, bins:int = HISTOGRAM_BINS, scale:str = "log"):
+    """Function to calculate the bin edges of a price histogram without sorting the prices.
+
+    Args:
+        prices (np.ndarray): [float64 price column.]
+        bins (int, optional): [Number of bins]. Defaults to HISTOGRAM_BINS.
+        scale (str, optional): [Bin scale from HISTOGRAM_SCALES]. Defaults to "log".
+
+    Raises:
+        ValueError: [Raised for an unknown scale.]
+
+    Returns:
+        edges[np.ndarray]: [bins + 1 increasing edges.]
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if scale == "fixed":
+        low = float(prices.min()) if len(prices) else 0.0
+        high = price_quantiles(prices, (FIXED_UPPER_QUANTILE,))[FIXED_UPPER_QUANTILE] if len(prices) else 1.0
+        return np.linspace(low, high if high > low else low + 1.0, bins + 1)
+    if scale == "log":
+        # Log bins need positive edges -> prices of 0 or less are counted in the first bin.
+        positive = prices[prices > 0]
+        low = float(positive.min()) if len(positive) else 1.0
+        high = float(positive.max()) if len(positive) else 10.0
+        return np.geomspace(low, high if high > low else low * 1.01, bins + 1)
+    raise ValueError(f"Unknown histogram scale: {scale}")
+
+def bin_prices(prices, edges, scale:str = "log"):
+    """Function to calculate the bin of every price. Prices below / above the edges go in the first / last bin.
+
+    Args:
+        prices (np.ndarray): [float64 price column.]
+        edges (np.ndarray): [Edges created by price_bin_edges() with the same scale.]
+        scale (str, optional): [Bin scale from HISTOGRAM_SCALES]. Defaults to "log".
+
+    Returns:
+        bins[np.ndarray]: [int64 bin of every price, 0 - len(edges) - 2.]
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    bins = len(edges) - 1
+    if scale == "log":
+        # Equal steps in log(price) -> bin = log(price / low) / log(step).
+        position = np.log(np.maximum(prices, edges[0]) / edges[0]) * (bins / np.log(edges[-1] / edges[0]))
+    else:
+        position = (prices - edges[0]) * (bins / (edges[-1] - edges[0]))
+    return np.clip(position, 0, bins - 1).astype(np.int64)
+
+def grouped_bin_counts(bins, groups, n_groups:int, n_bins:int):
+    """Function to count the rows of every group in every bin with one np.bincount.
+
+    Args:
+        bins (np.ndarray): [Bin of every row from bin_prices().]
+        groups (np.ndarray): [Group of every row, 0 - n_groups - 1.]
+        n_groups (int): [Number of groups.]
+        n_bins (int): [Number of bins.]
+
+    Returns:
+        counts[np.ndarray]: [int64 array of shape (n_groups, n_bins).]
+    """
+    keys = np.asarray(groups, dtype=np.int64) * n_bins + bins
+    return np.bincount(keys, minlength=n_groups * n_bins).reshape(n_groups, n_bins)
+
+def cumulative_fraction(counts):
+    """Function to turn the counts of a histogram into its cumulative distribution (CDF) at the upper edge of each bin.
+
+    Args:
+        counts (np.ndarray): [Sales in each bin.]
+
+    Returns:
+        cdf[np.ndarray]: [Fraction of the sales at or below each bin, 0 - 1. All 0 when there are no sales.]
+    """
+    totals = np.cumsum(counts, dtype=np.float64)
+    return totals / totals[-1] if len(totals) and totals[-1] > 0 else np.zeros(len(totals))
+
+class PriceHistogram:
+    """Price histogram of the register, of each county and of each year.
+
+    Attributes:
+        scale (str): [Bin scale from HISTOGRAM_SCALES.]
+        edges (np.ndarray): [bins + 1 bin edges.]
+        counts (np.ndarray): [Sales in each bin.]
+        county_counts (dict): [County -> sales in each bin, counties in table order.]
+        year_counts (dict): [Year -> sales in each bin, years in increasing order.]
+    """
+
+    def __init__(self, scale:str, edges, counts, county_counts:dict, year_counts:dict):
+        self.scale = scale
+        self.edges = edges
+        self.counts = counts
+        self.county_counts = county_counts
+        self.year_counts = year_counts
+
+    @classmethod
+    def from_table(cls, sales, bins:int = HISTOGRAM_BINS, scale:str = "log"):
+        """Function to build the histograms of a sales table.
+
+        Args:
+            sales (SalesTable): [Columnar table of the rows processed.]
+            bins (int, optional): [Number of bins]. Defaults to HISTOGRAM_BINS.
+            scale (str, optional): [Bin scale from HISTOGRAM_SCALES]. Defaults to "log".
+
+        Returns:
+            histogram[PriceHistogram]: [Histograms of the table.]
+        """
+        edges = price_bin_edges(sales.prices, bins, scale)
+        price_bins = bin_prices(sales.prices, edges, scale)
+
+        county_names = sales.categories["county"]
+        counties = grouped_bin_counts(price_bins, sales.codes["county"], len(county_names), bins)
+
+        years = sales.years()
+        first_year = int(years.min()) if len(years) else 0
+        year_rows = grouped_bin_counts(price_bins, years - first_year, int(years.max()) - first_year + 1 if len(years) else 0, bins)
+
+        county_counts = {county: counties[code] for code, county in enumerate(county_names) if counties[code].any()}
+        year_counts = {first_year + offset: counts for offset, counts in enumerate(year_rows) if counts.any()}
+        # Every row is in exactly one county -> the county counts add up to the counts of the whole register.
+        return cls(scale, edges, counties.sum(axis=0), county_counts, year_counts)
+
+    def counts_for(self, group=None):
+        """Function to return the counts of the whole register, a county or a year.
+
+        Args:
+            group (str / int, optional): [County name, year or None / "ALL" for the whole register]. Defaults to None.
+
+        Raises:
+            KeyError: [Raised when the county / year has no sales.]
+
+        Returns:
+            counts[np.ndarray]: [Sales in each bin.]
+        """
+        if group is None or str(group).lower() == "all":
+            return self.counts
+        if isinstance(group, str) and not group.isdigit():
+            return self.county_counts[group]
+        return self.year_counts[int(group)]
+
+    def cdf(self, counts=None):
+        """Function to return the cumulative distribution of the counts (whole register when None) -> see cumulative_fraction()."""
+        return cumulative_fraction(self.counts if counts is None else counts)
+
+    def table_rows(self, counts=None):
+        """Function to list the bins as rows of Bin Low, Bin High, Sales and Cumulative % (whole register when counts is None)."""
+        counts = self.counts if counts is None else counts
+        cdf = self.cdf(counts)
+        return [[round(float(self.edges[i]), 2), round(float(self.edges[i + 1]), 2), int(counts[i]), round(float(cdf[i]) * 100, 4)]
+                for i in range(len(counts))]
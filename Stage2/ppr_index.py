@@ -0,0 +1,166 @@
+# Date index of the parsed Property Price Register.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Answer date range questions (eg. all sales in Q2 2019, monthly counts for 2014 - 2016) without scanning the whole table.
+
+    DateIndex sorts the rows of a SalesTable by date of sale once (stable, so rows on the same day keep their file order) and
+    keeps the offset where every month starts in the sorted order. A year, quarter, month or any date range is then a
+    contiguous slice of the sorted columns:
+        month / quarter / year -> offsets looked up directly.
+        any date range         -> binary search (numpy searchsorted) on the sorted dates, O(log n).
+
+    Counts are the length of the slice. Prices of a slice are a view of the sorted price column, so the median, quartiles and
+    standard deviation of a slice (slice_statistics()) are calculated from that slice only (see ppr_stats). The medians of a
+    year (option 5) and of a month (ppr_timeseries) use the same slices.
+"""
+from datetime import date
+import numpy as np
+from ppr_stats import price_quantiles, price_statistics
+from ppr_table import SalesTable, ordinals_to_year_month
+
+class DateIndex:
+    """Rows of a SalesTable in date order with the offset of every month.
+
+    Attributes:
+        order (np.ndarray): [Row numbers of the table in date order.]
+        dates (np.ndarray): [Sorted int32 day ordinals.]
+        prices (np.ndarray): [float64 prices in date order.]
+        first_month (int): [Month key (year * 12 + month - 1) of the earliest sale.]
+        month_offsets (np.ndarray): [Start of each month from first_month in the sorted rows. The last value is the row count.]
+    """
+
+    def __init__(self, sales:SalesTable):
+        self.order = np.argsort(sales.dates, kind="stable")
+        self.dates = sales.dates[self.order]
+        self.prices = sales.prices[self.order]
+
+        if len(self.dates):
+            years, months = ordinals_to_year_month(self.dates[[0, -1]])
+            self.first_month = int(years[0]) * 12 + int(months[0]) - 1
+            last_month = int(years[1]) * 12 + int(months[1]) - 1
+        else:
+            self.first_month, last_month = 0, -1
+
+        # Sorted dates mean sorted month keys -> the first row of each month is found by binary search on the month starts.
+        month_starts = [self._month_start(key) for key in range(self.first_month, last_month + 2)]
+        self.month_offsets = np.searchsorted(self.dates, month_starts) if month_starts else np.zeros(1, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def years(self):
+        """Function to return the years from the earliest to the latest sale (range, empty when there are no sales)."""
+        return range(self.first_month // 12, (self.first_month + len(self.month_offsets) - 2) // 12 + 1)
+
+    @staticmethod
+    def _month_start(key:int):
+        # Day ordinal of the first day of a month key.
+        return date(key // 12, key % 12 + 1, 1).toordinal()
+
+    def _month_offset(self, key:int):
+        # Offset of a month key in the sorted rows -> months before / after the data give the start / end.
+        position = min(max(key - self.first_month, 0), len(self.month_offsets) - 1)
+        return int(self.month_offsets[position])
+
+    def month_slice(self, year:int, month:int):
+        """Function to return the slice of the sorted rows sold in a month.
+
+        Args:
+            year (int): [Year eg. 2019.]
+            month (int): [Month 1 - 12.]
+
+        Returns:
+            rows[slice]: [Slice of the sorted columns (dates, prices, order).]
+        """
+        return self.period_slice(year, month, year, month)
+
+    def year_slice(self, year:int):
+        """Function to return the slice of the sorted rows sold in a year.
+
+        Args:
+            year (int): [Year eg. 2019.]
+
+        Returns:
+            rows[slice]: [Slice of the sorted columns (dates, prices, order).]
+        """
+        return self.period_slice(year, 1, year, 12)
+
+    def quarter_slice(self, year:int, quarter:int):
+        """Function to return the slice of the sorted rows sold in a quarter.
+
+        Args:
+            year (int): [Year eg. 2019.]
+            quarter (int): [Quarter 1 - 4.]
+
+        Returns:
+            rows[slice]: [Slice of the sorted columns (dates, prices, order).]
+        """
+        return self.period_slice(year, quarter * 3 - 2, year, quarter * 3)
+
+    def period_slice(self, start_year:int, start_month:int, end_year:int, end_month:int):
+        """Function to return the slice of the sorted rows sold from the start month to the end month (both included).
+
+        Args:
+            start_year (int): [Year of the first month.]
+            start_month (int): [First month 1 - 12.]
+            end_year (int): [Year of the last month.]
+            end_month (int): [Last month 1 - 12.]
+
+        Returns:
+            rows[slice]: [Slice of the sorted columns (dates, prices, order).]
+        """
+        start = self._month_offset(start_year * 12 + start_month - 1)
+        end = self._month_offset(end_year * 12 + end_month)
+        return slice(start, max(start, end))
+
+    def date_slice(self, first:date, last:date):
+        """Function to return the slice of the sorted rows sold between two dates (both included).
+
+        Args:
+            first (date): [First date of sale.]
+            last (date): [Last date of sale.]
+
+        Returns:
+            rows[slice]: [Slice of the sorted columns (dates, prices, order).]
+        """
+        start = int(np.searchsorted(self.dates, first.toordinal(), side="left"))
+        end = int(np.searchsorted(self.dates, last.toordinal(), side="right"))
+        return slice(start, max(start, end))
+
+    def monthly_counts(self, start_year:int, end_year:int = None):
+        """Function to count the sales of every month in a range of years, in date order.
+
+        Args:
+            start_year (int): [First year.]
+            end_year (int, optional): [Last year (included)]. Defaults to None -> start_year only.
+
+        Returns:
+            month_counts[dictionary]: [Month / Year (mm/yyyy) -> sales. Months without sales are left out.]
+        """
+        end_year = start_year if end_year is None else end_year
+        month_counts = dict()
+        for key in range(start_year * 12, end_year * 12 + 12):
+            count = self._month_offset(key + 1) - self._month_offset(key)
+            if count:
+                month_counts[f"{key % 12 + 1:02d}/{key // 12}"] = count
+        return month_counts
+
+    def rows(self, rows:slice):
+        """Function to return the table row numbers of a slice, eg. to look up the county of each sale in the slice."""
+        return self.order[rows]
+
+    def slice_statistics(self, rows:slice):
+        """Function to calculate the price statistics of a slice of the sorted rows.
+
+        Args:
+            rows (slice): [Slice returned by one of the *_slice() functions.]
+
+        Returns:
+            price_stats[dictionary]: [ppr_stats.price_statistics() keys with Median, Lower Quartile and Upper Quartile added.]
+        """
+        prices = self.prices[rows]
+        price_stats = price_statistics(prices)
+        quartiles = price_quantiles(prices)
+        price_stats.update({"Median": quartiles[0.5], "Lower Quartile": quartiles[0.25], "Upper Quartile": quartiles[0.75]})
+        return price_stats
@@ -0,0 +1,544 @@
+# Ingest helpers for the Property Price Register -> PPR_ALL.csv.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Read the property price register one line at a time instead of loading the whole file with readlines().
+
+    The main program pulls parsed rows from stream_register_rows() and hands each one to its aggregators as it goes,
+    so the memory used depends on what is being kept and not on the size of the csv file.
+
+    MappedRegister memory maps the file and scans it as bytes with numpy to find the line and field boundaries. Only the
+    fields an analysis asks for are converted (eg. only date and price for options 1 - 7), without decoding whole lines.
+
+    parse_register_parallel() splits the file into newline aligned byte ranges and parses them in a pool of worker processes.
+    Each worker returns a partial SalesTable and SalesAggregator which are joined in file order, so the result is the same as
+    the serial path.
+
+    Columns (after the Property Size Description column has been removed):
+        Date of Sale (dd/mm/yyyy),Address,Postal Code,County,Price (�),Not Full Market Price,VAT Exclusive,
+        Description of Property
+"""
+from concurrent.futures import ProcessPoolExecutor
+import mmap
+import os
+import re
+import numpy as np
+from ppr_aggregate import SalesAggregator, aggregate_table
+from ppr_table import CATEGORY_COLUMNS, EPOCH_ORDINAL, SalesTable, concat_tables, dos_to_ordinal, ordinals_to_year_month
+
+# Smallest byte range handed to a worker process -> below this the cost of starting workers outweighs the parsing.
+MIN_RANGE_BYTES = 4 << 20
+
+# Characters found in front of a price -> euro sign and the diamond questionmark left by a mis-encoded euro sign.
+PRICE_PREFIXES = "€\ufffd"
+PRICE_PREFIX_BYTES = tuple(prefix.encode("utf-8") for prefix in PRICE_PREFIXES)
+# Anything that is not part of a number -> removed from unusual prices only.
+NON_PRICE_CHARACTERS = re.compile(r"[^\d.]")
+
+# Byte values used when scanning the memory mapped file.
+NEWLINE, CARRIAGE_RETURN, QUOTE = ord("\n"), ord("\r"), ord('"')
+# Bytes scanned per numpy comparison -> keeps the temporary boolean arrays small for large files.
+SCAN_BLOCK_BYTES = 16 << 20
+# Fields that can be read with MappedRegister.read_columns().
+MAPPED_FIELDS = ("dos", "price", "address", "postcode") + CATEGORY_COLUMNS
+
+
+def parse_price(prc:str):
+    """Function to convert a price string from the register to a float without looping over its characters.
+
+    The euro sign (or the mis-encoded diamond questionmark) is stripped from the front and the thousands separators removed
+    with str.replace(). Anything else that is not a digit or decimal point is removed with a precompiled regular expression,
+    which is only needed for unusual prices.
+
+    Args:
+        prc (str): [price string value from the import and split of the line from csv file eg. €343,000.00]
+
+    Raises:
+        ValueError: [Raised when no number is left after removing the invalid characters.]
+
+    Returns:
+        price[float]: [prc transformed from string to float value.]
+    """
+    cleaned = prc.lstrip(PRICE_PREFIXES).replace(",", "")
+    if not cleaned.replace(".", "", 1).isdigit():
+        cleaned = NON_PRICE_CHARACTERS.sub("", prc)
+
+    return float(cleaned)
+
+def parse_price_bytes(raw_prices:bytes, separator:bytes = b"\n"):
+    """Function to convert a block of price bytes separated by separator into a float64 array in one step.
+
+    The euro sign / diamond questionmark and the thousands separators are removed from the whole block with bytes.replace() and
+    bytes.translate() (no per price Python code) and numpy converts the pieces to floats.
+
+    Args:
+        raw_prices (bytes): [utf-8 encoded prices eg. b"\xe2\x82\xac343,000.00\n\xe2\x82\xac5,001.00"]
+        separator (bytes, optional): [Byte(s) between prices]. Defaults to a newline.
+
+    Raises:
+        ValueError: [Raised when a price cannot be converted.]
+
+    Returns:
+        prices[np.ndarray]: [float64 array of the prices.]
+    """
+    for prefix in PRICE_PREFIX_BYTES:
+        raw_prices = raw_prices.replace(prefix, b"")
+    prices = np.array(raw_prices.translate(None, b",").split(separator), dtype=np.float64)
+
+    if not np.isfinite(prices).all():
+        raise ValueError("Price block contains values that are not numbers.")
+    return prices
+
+def parse_price_column(raw_prices:list):
+    """Function to convert a whole column of raw price strings into a float64 array at once (batch mode of parse_price()).
+
+    Args:
+        raw_prices (list): [Price strings as split from the csv file.]
+
+    Returns:
+        prices[np.ndarray]: [float64 array of the prices. Same values as validate_price() on each string.]
+    """
+    if not raw_prices:
+        return np.zeros(0, dtype=np.float64)
+
+    try:
+        return parse_price_bytes("\n".join(raw_prices).encode("utf-8"))
+    except ValueError:
+        # Empty or unusual prices in the column -> convert one at a time.
+        return np.array([validate_price(prc) for prc in raw_prices], dtype=np.float64)
+
+def validate_price(prc:str):
+    """Function to validate the price string split from the data file line.
+
+    Args:
+        prc (str): [price string value from the import and split of the line from csv file.]
+        The string will be checked to validate the characters will be valid for casting to float value (see parse_price()).
+
+    Raises:
+        ValueError: [Raised when the price cannot be converted to a float value.]
+
+    Returns:
+        prc [float]: [prc transformed from string to float value.]
+    """
+    if not prc:
+        # Should not happen. Price should be filled. If not, then we can raise an error or assign value of 0
+        print("Problem converting price. Price is null. Assigning 0 value.")
+        return 0.0
+
+    return parse_price(prc)
+
+def parse_register_line(line:str):
+    """Function to split a single line of the register into its values.
+
+    Args:
+        line (str): [One line read from the csv file.]
+
+    Returns:
+        Tuple of Date Of Sale, Address, Postal Code, County, Full Market Price, VAT Exclusive, Description and Price (float).
+    """
+    # Split into an array based on "
+    valuesquotes = line.strip().split('"') # strip \n and split on ""
+
+    # Date -> Strip the commas from the date value
+    d = valuesquotes[0].strip(',') # Remove commas from date value -> needed for analysis.
+
+    # Address -> Processing complete after split()
+    a = valuesquotes[1]
+
+    # Postcode and County Values:
+    # Needs splitting -> Contains 4 values , , , , -> only need value 2 and 3
+    # County also contains an additional space before the word eg , Kildare,. Need to remove this (and any other padding).
+    _, p, c, _ = valuesquotes[2].split(',')
+    p, c = p.strip(), c.strip()
+
+    # Price -> Strip commas (keep decimals) -> Validate Price incase of special characters
+    price = validate_price(valuesquotes[3])
+
+    # Full_Market_Price, Vat_Excl and Description:
+    # We only require the last 3 values of the final split for our data analysis. _ acts as a placeholder.
+    _, f, v, descr = valuesquotes[4].split(',')
+
+    return d, a, p, c, f.strip(), v.strip(), descr.strip(), price
+
+def stream_register_rows(csv_in, rows_to_process:int = 0):
+    """Generator to yield parsed rows from an open register file one line at a time.
+
+    The header line must already have been read from csv_in. Reading stops as soon as rows_to_process rows have been
+    yielded, so the rest of the file is never touched. Blank lines are skipped.
+
+    Args:
+        csv_in ([file]): [Open text file positioned after the header line.]
+        rows_to_process (int, optional): [Maximum rows to yield. 0 yields every row in the file]. Defaults to 0.
+
+    Raises:
+        ValueError: [Raised when a line does not contain the expected columns. The line number is included in the message.]
+
+    Yields:
+        Tuple returned by parse_register_line() for each row.
+    """
+    index = 0
+    for line_number, line in enumerate(csv_in, start=2):
+        if not line.strip():
+            continue
+
+        try:
+            row = parse_register_line(line)
+        except (ValueError, IndexError):
+            raise ValueError(f"Line {line_number} could not be split into register columns: {line.strip()}")
+
+        yield row
+
+        index += 1
+        if index == rows_to_process:
+            break
+
+def count_register_rows(path:str, chunk_size:int = 1 << 20):
+    """Function to count the data rows in the register without keeping the lines in memory.
+
+    The file is read in binary chunks and the lines ending at each newline measured with numpy. Blank lines (nothing or only
+    a carriage return before the newline) are not counted, the same as stream_register_rows() and MappedRegister skip them.
+    The header line is not included.
+
+    Args:
+        path (str): [Path to the csv file.]
+        chunk_size (int, optional): [Bytes to read per chunk]. Defaults to 1 MiB.
+
+    Returns:
+        rows[int]: [Number of data rows in the file.]
+    """
+    rows = 0
+    # Bytes of the line still open at the end of the previous chunk, and the last byte read.
+    line_length, last_byte = 0, NEWLINE
+    with open(path, "rb") as raw_in:
+        raw_in.readline()
+        while True:
+            chunk = raw_in.read(chunk_size)
+            if not chunk:
+                break
+            data = np.frombuffer(chunk, dtype=np.uint8)
+            newlines = np.flatnonzero(data == NEWLINE)
+            if len(newlines):
+                lengths = np.diff(newlines, prepend=-1) - 1
+                lengths[0] += line_length
+                before = data[np.maximum(newlines - 1, 0)]
+                if newlines[0] == 0:
+                    before[0] = last_byte
+                blank = (lengths == 0) | ((lengths == 1) & (before == CARRIAGE_RETURN))
+                rows += len(newlines) - int(blank.sum())
+                line_length = len(data) - int(newlines[-1]) - 1
+            else:
+                line_length += len(data)
+            last_byte = data[-1]
+
+    # A final line without a trailing newline still counts as a row.
+    if line_length > 1 or (line_length == 1 and last_byte != CARRIAGE_RETURN):
+        rows += 1
+
+    return rows
+
+def split_register_ranges(path:str, parts:int):
+    """Function to split the register into byte ranges that start and end on a line boundary.
+
+    The header line is not included in any range.
+
+    Args:
+        path (str): [Path to the csv file.]
+        parts (int): [Number of ranges wanted. Fewer are returned for small files.]
+
+    Returns:
+        ranges[list]: [List of (start, end) byte offsets in file order.]
+    """
+    with open(path, "rb") as raw_in:
+        raw_in.readline()
+        start = raw_in.tell()
+        size = os.fstat(raw_in.fileno()).st_size
+        if size <= start:
+            return []
+
+        parts = max(1, min(parts, (size - start) // MIN_RANGE_BYTES))
+        step = (size - start) // parts
+        ranges = []
+        for part in range(1, parts):
+            # Move each nominal boundary forward to the start of the next line.
+            raw_in.seek(start + step * part)
+            raw_in.readline()
+            end = raw_in.tell()
+            if end >= size:
+                break
+            if ranges and end <= ranges[-1][1]:
+                continue
+            ranges.append((ranges[-1][1] if ranges else start, end))
+        ranges.append((ranges[-1][1] if ranges else start, size))
+
+    return ranges
+
+def parse_register_range(path:str, start:int, end:int):
+    """Function to parse one byte range of the register. Used by the worker processes of parse_register_parallel().
+
+    The range is read with the memory mapped reader, which gives the same table and counts as the line by line parser.
+
+    Args:
+        path (str): [Path to the csv file.]
+        start (int): [Byte offset of the first line in the range.]
+        end (int): [Byte offset just after the last line in the range.]
+
+    Raises:
+        ValueError: [Raised when a line in the range cannot be split.]
+
+    Returns:
+        Partial SalesTable and SalesAggregator of the rows in the range.
+    """
+    with MappedRegister(path) as register:
+        return register.read_register(start, end)
+
+def parse_register_parallel(path:str, workers:int):
+    """Function to parse the whole register with a pool of worker processes.
+
+    The file is split into newline aligned byte ranges (split_register_ranges()), each range is parsed by a worker and the
+    partial tables and aggregators are joined back together in file order.
+
+    Args:
+        path (str): [Path to the csv file.]
+        workers (int): [Number of worker processes. 1 parses in this process.]
+
+    Returns:
+        SalesTable and SalesAggregator of every row in the file.
+    """
+    ranges = split_register_ranges(path, workers)
+
+    if workers <= 1 or len(ranges) <= 1:
+        partials = [parse_register_range(path, start, end) for start, end in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+            partials = list(executor.map(parse_register_range, [path] * len(ranges), [start for start, _ in ranges], [end for _, end in ranges]))
+
+    aggregator = SalesAggregator()
+    for _, partial in partials:
+        aggregator.merge(partial)
+
+    return concat_tables([table for table, _ in partials]), aggregator
+
+class MappedRegister:
+    """Memory mapped, zero copy reader of the register csv file.
+
+    The file is mapped into memory and viewed as a numpy byte array. Line boundaries (newlines) and field boundaries (the four
+    quote characters around the address and the price) are found with vectorised comparisons over the bytes. Dates and prices
+    are converted straight from the bytes. Text fields are only decoded when they are asked for, and repeated values
+    (county, description, ...) are decoded once.
+
+    Use as a context manager:
+        with MappedRegister("PPR_ALL.csv") as register:
+            columns = register.read_columns(("dos", "price"))
+    """
+
+    def __init__(self, path:str):
+        self.path = path
+        self._file = open(path, "rb")
+        self.size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self._buffer = np.frombuffer(self._map, dtype=np.uint8) if self.size else np.zeros(0, dtype=np.uint8)
+
+        # Data starts after the header line.
+        header_end = self._map.find(b"\n") if self.size else -1
+        self.data_start = header_end + 1 if header_end >= 0 else self.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Function to release the memory map and close the file."""
+        # The numpy view must be released before the map can be closed.
+        self._buffer = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def _find(self, byte:int, start:int, end:int):
+        # Positions of a byte value between start and end, scanned block by block.
+        found = [np.flatnonzero(self._buffer[block:min(block + SCAN_BLOCK_BYTES, end)] == byte) + block for block in range(start, end, SCAN_BLOCK_BYTES)]
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def line_bounds(self, start:int = None, end:int = None, rows:int = 0):
+        """Function to find the start and end byte offset of every data line.
+
+        Blank lines are skipped and a carriage return before the newline is not part of the line.
+
+        Args:
+            start (int, optional): [Byte offset to start from. Must be the start of a line]. Defaults to None -> after the header.
+            end (int, optional): [Byte offset to stop at. Must be the end of a line]. Defaults to None -> end of file.
+            rows (int, optional): [Maximum lines to return. 0 returns every line]. Defaults to 0.
+
+        Returns:
+            starts[np.ndarray], ends[np.ndarray]: [Start offset and end offset (exclusive) of each line.]
+        """
+        start = self.data_start if start is None else max(start, self.data_start)
+        end = self.size if end is None else min(end, self.size)
+        if start >= end:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        newlines = self._find(NEWLINE, start, end)
+        starts = np.concatenate(([start], newlines + 1))
+        ends = np.concatenate((newlines, [end]))
+
+        has_carriage_return = ends > starts
+        has_carriage_return[has_carriage_return] = self._buffer[ends[has_carriage_return] - 1] == CARRIAGE_RETURN
+        ends = ends - has_carriage_return
+
+        keep = ends > starts
+        starts, ends = starts[keep], ends[keep]
+        if rows:
+            starts, ends = starts[:rows], ends[:rows]
+        return starts, ends
+
+    def count_rows(self, start:int = None):
+        """Function to count the data rows in the file (blank lines are not counted).
+
+        Args:
+            start (int, optional): [Byte offset to count from (start of a line)]. Defaults to None -> after the header.
+
+        Returns:
+            rows[int]: [Number of data rows.]
+        """
+        return len(self.line_bounds(start)[0])
+
+    def _line_text(self, start:int, end:int):
+        return self._map[start:end].decode("utf-8", errors="replace")
+
+    def _quote_positions(self, starts, ends):
+        # Every line has four quotes -> two around the address and two around the price.
+        if len(starts) == 0:
+            return np.zeros((0, 4), dtype=np.int64)
+        quotes = self._find(QUOTE, int(starts[0]), int(ends[-1]))
+        first = np.searchsorted(quotes, starts)
+        bad = np.flatnonzero(np.searchsorted(quotes, ends) - first != 4)
+        if len(bad):
+            row = bad[0]
+            raise ValueError(f"Line at byte offset {starts[row]} could not be split into register columns: {self._line_text(starts[row], ends[row])}")
+        return quotes[first[:, None] + np.arange(4)]
+
+    def _read_dates(self, starts, quotes):
+        # dd/mm/yyyy, -> digits at fixed positions from the start of the line.
+        digits = self._buffer[starts[:, None] + np.array([0, 1, 3, 4, 6, 7, 8, 9])].astype(np.int64) - ord("0")
+        day = digits[:, 0] * 10 + digits[:, 1]
+        month = digits[:, 2] * 10 + digits[:, 3]
+        year = digits[:, 4] * 1000 + digits[:, 5] * 100 + digits[:, 6] * 10 + digits[:, 7]
+
+        fixed_format = (quotes[:, 0] - starts == 11) & ((digits >= 0) & (digits <= 9)).all(axis=1) & (month >= 1) & (month <= 12) & (day >= 1)
+        months_since_epoch = np.where(fixed_format, (year - 1970) * 12 + month - 1, 0)
+        ordinals = months_since_epoch.astype("datetime64[M]").astype("datetime64[D]").astype(np.int64) + day - 1 + EPOCH_ORDINAL
+
+        # A day past the end of its month rolls into the next month -> check the month is unchanged.
+        check_years, check_months = ordinals_to_year_month(np.where(fixed_format, ordinals, EPOCH_ORDINAL))
+        fixed_format &= (check_years == year) & (check_months == month)
+
+        # Anything else is handled one line at a time, exactly as the line by line parser does.
+        for row in np.flatnonzero(~fixed_format).tolist():
+            ordinals[row] = dos_to_ordinal(self._line_text(starts[row], quotes[row, 0]).strip(","))
+
+        return ordinals.astype(np.int32)
+
+    def _gather(self, segment_starts, segment_ends):
+        # Copy the bytes of every segment into one bytes object, each segment followed by a " (which a segment never holds).
+        lengths = segment_ends - segment_starts + 1
+        offsets = np.repeat(segment_starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+        gathered = self._buffer[np.minimum(np.arange(int(lengths.sum())) + offsets, self.size - 1)]
+        gathered[np.cumsum(lengths) - 1] = QUOTE
+        return gathered.tobytes()[:-1]
+
+    def _read_prices(self, quotes):
+        # The price is between the third and fourth quote of every line.
+        try:
+            return parse_price_bytes(self._gather(quotes[:, 2] + 1, quotes[:, 3]), b'"')
+        except ValueError:
+            # Empty or unusual prices -> convert one at a time.
+            return np.array([validate_price(self._line_text(q[2] + 1, q[3])) for q in quotes.tolist()], dtype=np.float64)
+
+    def _read_segments(self, segment_starts, segment_ends, names:tuple, wanted:tuple, starts, ends):
+        # Split the comma separated part of each line into the named values. Identical segments are split and decoded once.
+        raw_segments = self._gather(segment_starts, segment_ends).split(b'"')
+        segment_ids = {raw: segment for segment, raw in enumerate(dict.fromkeys(raw_segments))}
+        row_segments = np.fromiter(map(segment_ids.__getitem__, raw_segments), dtype=np.int64, count=len(raw_segments))
+
+        lookups = {name: dict() for name in wanted}
+        segment_codes = {name: np.zeros(len(segment_ids), dtype=np.uint16) for name in wanted}
+        for segment, raw in enumerate(segment_ids):
+            parts = raw.decode("utf-8", errors="replace").split(",")
+            if len(parts) != len(names):
+                row = int(np.argmax(row_segments == segment))
+                raise ValueError(f"Line at byte offset {starts[row]} could not be split into register columns: {self._line_text(starts[row], ends[row])}")
+            # Same clean up as parse_register_line() -> spaces around every value and the line end after description are stripped.
+            for name, part in zip(names, parts):
+                if name in wanted:
+                    segment_codes[name][segment] = lookups[name].setdefault(part.strip(), len(lookups[name]))
+
+        # Segment ids are in first-seen order, so the values of each column are too.
+        return {name: (segment_codes[name][row_segments].astype(np.uint8 if len(lookups[name]) < 256 else np.uint16), list(lookups[name]))
+                for name in wanted}
+
+    def read_columns(self, fields:tuple = ("dos", "price"), start:int = None, end:int = None, rows:int = 0):
+        """Function to read only the named fields of every line.
+
+        Args:
+            fields (tuple, optional): [Fields from MAPPED_FIELDS]. Defaults to ("dos", "price").
+            start (int, optional): [Byte offset to start from (start of a line)]. Defaults to None -> after the header.
+            end (int, optional): [Byte offset to stop at (end of a line)]. Defaults to None -> end of file.
+            rows (int, optional): [Maximum rows to read. 0 reads every row]. Defaults to 0.
+
+        Raises:
+            ValueError: [Raised for an unknown field or a line that cannot be split.]
+
+        Returns:
+            columns[dictionary]: [Field -> values. dos is an int32 array of day ordinals, price a float64 array, address a list of
+            strings and the other fields a tuple of (code array, list of unique values).]
+        """
+        unknown = set(fields) - set(MAPPED_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown register fields: {sorted(unknown)}")
+
+        starts, ends = self.line_bounds(start, end, rows)
+        quotes = self._quote_positions(starts, ends)
+        columns = dict()
+
+        if "dos" in fields:
+            columns["dos"] = self._read_dates(starts, quotes) if len(starts) else np.zeros(0, dtype=np.int32)
+        if "price" in fields:
+            columns["price"] = self._read_prices(quotes) if len(starts) else np.zeros(0, dtype=np.float64)
+        if "address" in fields:
+            columns["address"] = [self._line_text(q[0] + 1, q[1]) for q in quotes.tolist()]
+
+        # ,postcode,county, sits between the address and the price. ,x,full market price,vat exclusive,description follows the price.
+        wanted = tuple(name for name in ("postcode", "county") if name in fields)
+        if wanted:
+            columns.update(self._read_segments(quotes[:, 1] + 1, quotes[:, 2], ("", "postcode", "county", ""), wanted, starts, ends))
+        wanted = tuple(name for name in ("fullmarketprice", "vatexcl", "description") if name in fields)
+        if wanted:
+            columns.update(self._read_segments(quotes[:, 3] + 1, ends, ("", "fullmarketprice", "vatexcl", "description"), wanted, starts, ends))
+
+        return columns
+
+    def read_register(self, start:int = None, end:int = None, rows:int = 0):
+        """Function to read the full SalesTable and SalesAggregator of a range of lines.
+
+        Args:
+            start (int, optional): [Byte offset to start from (start of a line)]. Defaults to None -> after the header.
+            end (int, optional): [Byte offset to stop at (end of a line)]. Defaults to None -> end of file.
+            rows (int, optional): [Maximum rows to read. 0 reads every row]. Defaults to 0.
+
+        Returns:
+            Same SalesTable and SalesAggregator as the line by line parser gives for those lines.
+        """
+        columns = self.read_columns(("dos", "price") + CATEGORY_COLUMNS, start, end, rows)
+        sales = SalesTable(columns["dos"], columns["price"], {name: columns[name][0] for name in CATEGORY_COLUMNS},
+                           {name: columns[name][1] for name in CATEGORY_COLUMNS})
+
+        # Only the addresses of the highest / lowest sale are decoded.
+        starts, ends = self.line_bounds(start, end, rows)
+        def address_of(row):
+            quotes = self._quote_positions(starts[row:row + 1], ends[row:row + 1])[0]
+            return self._line_text(quotes[0] + 1, quotes[1])
+
+        return sales, aggregate_table(sales, address_of)
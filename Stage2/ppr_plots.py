@@ -0,0 +1,416 @@
+# Plot drawing and headless batch rendering for the Property Price Register program.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Draw the plots of the program (sales over years, sales over counties, sales per month, pie chart of years, price histogram
+    / CDF) and save many of them at once without any plot windows.
+
+    The draw_* functions fill in a figure and axes. The interactive menu passes a pyplot figure (so it can be shown), batch
+    rendering passes a plain matplotlib Figure attached to the non-interactive Agg canvas.
+
+    Batch rendering:
+        plot_jobs() turns the chosen plots into a list of jobs holding only the plain dictionaries each plot needs, so the jobs
+        can be sent to worker processes. render_plots() renders the jobs in a process pool. Each figure is cleared and dropped as
+        soon as it is saved, so memory stays flat however many plots are rendered.
+
+    The years scatter plot, counties bar chart and month bar charts are drawn from the monthly series of ppr_timeseries, and
+    the month bar charts add the 3 month moving average of the sales as a line.
+
+    Large inputs:
+        The data is reduced before it reaches matplotlib so the number of drawn artists (bars, markers, line points) is capped
+        however many rows the register has:
+            price_density()  -> price against date of every sale as a 2-D histogram (one image artist, fixed number of cells).
+            daily_sales()    -> sales per day, downsampled with Largest Triangle Three Buckets (lttb()) to MAX_LINE_POINTS.
+            cap_bars()       -> at most MAX_BARS bars, the smallest values are added together as "Other".
+            bin_bars()       -> at most MAX_BARS bars in order, neighbouring bars are added together (eg. months -> quarters).
+            histogram        -> counts of HISTOGRAM_BINS price bins built by ppr_histogram.PriceHistogram (one step line).
+
+    Usage:
+        render_plots(plot_jobs(results, ["years", "months"], "plots"), workers=4)
+"""
+from concurrent.futures import ProcessPoolExecutor
+import math
+import os
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+from ppr_histogram import cumulative_fraction
+from ppr_timeseries import county_totals
+from ppr_table import EPOCH_ORDINAL
+
+# Plots that can be rendered in batch. "months" is one plot per year.
+PLOT_NAMES = ("years", "counties", "months", "pie", "prices", "daily", "histogram")
+# Most bars drawn in one bar chart.
+MAX_BARS = 40
+# Most points drawn in one line plot.
+MAX_LINE_POINTS = 1000
+# Cells of the price / date 2-D histogram.
+DATE_BINS, PRICE_BINS = 240, 120
+
+def cap_bars(counts:dict, max_bars:int = MAX_BARS):
+    """Function to keep the largest bars and add the rest together as one "Other" bar.
+
+    Args:
+        counts (dict): [Label -> value.]
+        max_bars (int, optional): [Most bars to keep]. Defaults to MAX_BARS.
+
+    Returns:
+        counts[dictionary]: [At most max_bars labels in the original order, with "Other" last when values were added together.]
+    """
+    if len(counts) <= max_bars:
+        return counts
+
+    keep = set(sorted(counts, key=counts.get, reverse=True)[:max_bars - 1])
+    capped = {label: value for label, value in counts.items() if label in keep}
+    capped["Other"] = sum(value for label, value in counts.items() if label not in keep)
+    return capped
+
+def bin_bars(counts:dict, max_bars:int = MAX_BARS):
+    """Function to add neighbouring bars together until there are at most max_bars, keeping their order.
+
+    Args:
+        counts (dict): [Label -> value in plot order eg. mm/yyyy -> sales.]
+        max_bars (int, optional): [Most bars to keep]. Defaults to MAX_BARS.
+
+    Returns:
+        counts[dictionary]: [Labels "first - last" of each group -> total of the group.]
+    """
+    if len(counts) <= max_bars:
+        return counts
+
+    labels, values = list(counts), list(counts.values())
+    size = math.ceil(len(labels) / max_bars)
+    binned = dict()
+    for start in range(0, len(labels), size):
+        group = labels[start:start + size]
+        binned[f"{group[0]} - {group[-1]}" if len(group) > 1 else group[0]] = sum(values[start:start + size])
+    return binned
+
+def lttb(x, y, threshold:int = MAX_LINE_POINTS):
+    """Function to downsample a line with the Largest Triangle Three Buckets algorithm (Steinarsson, 2013).
+
+    The first and last points are kept. The points between are split into threshold - 2 buckets and the point of each bucket
+    making the largest triangle with the point kept before it and the mean of the next bucket is kept -> peaks and dips survive.
+
+    Args:
+        x ([np.ndarray]): [x values in increasing order.]
+        y ([np.ndarray]): [y values.]
+        threshold (int, optional): [Points to keep]. Defaults to MAX_LINE_POINTS.
+
+    Returns:
+        x[np.ndarray], y[np.ndarray]: [Kept points.]
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if threshold >= len(x) or threshold < 3:
+        return x, y
+
+    edges = np.linspace(1, len(x) - 1, threshold - 1).astype(np.int64)
+    kept = [0]
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        # Mean of the next bucket (the last point for the final bucket).
+        next_start, next_end = end, edges[bucket + 2] if bucket + 2 < len(edges) else len(x)
+        mean_x, mean_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+
+        a = kept[-1]
+        areas = np.abs((x[a] - mean_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (mean_y - y[a]))
+        kept.append(start + int(np.argmax(areas)))
+    kept.append(len(x) - 1)
+
+    return x[kept], y[kept]
+
+def _decimal_years(ordinals):
+    # Day ordinals -> years with a fraction (eg. 2019.5) for a numeric date axis.
+    return 1970 + (np.asarray(ordinals, dtype=np.float64) - EPOCH_ORDINAL) / 365.2425
+
+def price_density(dates, prices, date_bins:int = DATE_BINS, price_bins:int = PRICE_BINS):
+    """Function to count the sales in a grid of date x price cells (2-D histogram). Prices use log spaced cells.
+
+    Args:
+        dates ([np.ndarray]): [Day ordinal of every sale.]
+        prices ([np.ndarray]): [Price of every sale.]
+        date_bins (int, optional): [Cells along the date axis]. Defaults to DATE_BINS.
+        price_bins (int, optional): [Cells along the price axis]. Defaults to PRICE_BINS.
+
+    Returns:
+        counts[np.ndarray], date_edges[np.ndarray], price_edges[np.ndarray]: [Sales per cell and the cell edges. None when there are no positive prices.]
+    """
+    positive = np.asarray(prices) > 0
+    if not positive.any():
+        return None
+
+    years, prices = _decimal_years(np.asarray(dates)[positive]), np.asarray(prices, dtype=np.float64)[positive]
+    low, high = float(prices.min()), float(prices.max())
+    price_edges = np.geomspace(low, high if high > low else low * 1.01, price_bins + 1)
+    date_edges = np.linspace(float(years.min()), max(float(years.max()), float(years.min()) + 1 / 365), date_bins + 1)
+    counts, _, _ = np.histogram2d(years, prices, bins=(date_edges, price_edges))
+    return counts, date_edges, price_edges
+
+def daily_sales(dates, threshold:int = MAX_LINE_POINTS):
+    """Function to count the sales of every day and downsample the series for plotting.
+
+    Args:
+        dates ([np.ndarray]): [Day ordinal of every sale.]
+        threshold (int, optional): [Points to keep]. Defaults to MAX_LINE_POINTS.
+
+    Returns:
+        x[np.ndarray], y[np.ndarray]: [Date (decimal years) and sales of the kept days.]
+    """
+    dates = np.asarray(dates, dtype=np.int64)
+    if len(dates) == 0:
+        return np.zeros(0), np.zeros(0)
+    first = int(dates.min())
+    counts = np.bincount(dates - first)
+    return lttb(_decimal_years(np.arange(len(counts)) + first), counts, threshold)
+
+def draw_years_scatter(fig, ax, year_dict:dict):
+    """Function to draw the scatter plot of Total Sales over Years.
+
+    Args:
+        fig ([matplotlib.figure.Figure]): [Figure to draw on.]
+        ax ([matplotlib.axes.Axes]): [Axes to draw on.]
+        year_dict (dict): [Dictionary of year -> sales.]
+    """
+    fig.suptitle("Scatter Plot")
+    ax.set_title("Total Sales over Years")
+    ax.set_xlabel("Years")
+    ax.set_ylabel("Sales")
+
+    ax.scatter(list(year_dict.keys()), list(year_dict.values()), marker=".")
+
+def draw_counties_bar(fig, ax, county_dict:dict):
+    """Function to draw the bar chart of Total Sales over Counties.
+
+    Args:
+        fig ([matplotlib.figure.Figure]): [Figure to draw on.]
+        ax ([matplotlib.axes.Axes]): [Axes to draw on.]
+        county_dict (dict): [Dictionary of county -> sales.]
+    """
+    fig.suptitle("Bar Chart")
+    ax.set_title("Total Sales over Counties")
+    county_dict = cap_bars(county_dict)
+
+    # Bar Chart
+    y_pos = [ i for i in range(len(county_dict))]
+
+    ax.set_yticks(y_pos)
+    ax.set_yticklabels(county_dict.keys())
+
+    ax.set_ylabel("Counties")
+    ax.set_xlabel("Total Sales")
+
+    ax.barh(y_pos, list(county_dict.values()), align="center")
+
+def draw_month_bar(fig, ax, figure_name:str, to_output:dict, moving_average:dict = None):
+    """Function to draw the bar chart of Total Sales Per Month.
+
+    Args:
+        fig ([matplotlib.figure.Figure]): [Figure to draw on.]
+        ax ([matplotlib.axes.Axes]): [Axes to draw on.]
+        figure_name (str): [Title of the chart eg. TotalSalesPerMonthIn2019.]
+        to_output (dict): [Dictionary of month (mm/yyyy) -> sales.]
+        moving_average (dict, optional): [Dictionary of month (mm/yyyy) -> moving average of the sales, drawn as a line over the
+        bars (see ppr_timeseries.MonthlySeries.monthly_rolling)]. Defaults to None.
+    """
+    fig.suptitle("Bar Chart")
+    ax.set_title(figure_name)
+    # The moving average is only drawn when every month has its own bar.
+    if moving_average is not None and len(to_output) > MAX_BARS:
+        moving_average = None
+    # A range of years -> neighbouring months are added together to cap the number of bars.
+    to_output = bin_bars(to_output)
+
+    # Bar Chart
+    y_pos = [ i for i in range(len(to_output))]
+
+    ax.set_yticks(y_pos)
+    ax.set_yticklabels(to_output.keys())
+    ax.set_ylabel("Date")
+    ax.set_xlabel("Total Sales")
+    ax.barh(y_pos, list(to_output.values()), align="center")
+    if moving_average:
+        ax.plot([moving_average.get(month, np.nan) for month in to_output], y_pos, color="tab:red", marker=".", label="Moving average (3 months)")
+        ax.legend()
+
+def draw_years_pie(fig, ax, year_dict:dict):
+    """Function to draw the pie chart of Sales Over All Years, with the percentage of each year to 2 decimal places.
+
+    Args:
+        fig ([matplotlib.figure.Figure]): [Figure to draw on.]
+        ax ([matplotlib.axes.Axes]): [Axes to draw on.]
+        year_dict (dict): [Dictionary of year -> sales.]
+    """
+    ax.set_title("Sales Over All Years")
+
+    ax.pie(list(year_dict.values()), labels = list(year_dict.keys()), autopct="%.2f%%")
+
+def draw_price_density(fig, ax, density):
+    """Function to draw the price of every sale against its date as a 2-D histogram (colour = number of sales).
+
+    Args:
+        fig ([matplotlib.figure.Figure]): [Figure to draw on.]
+        ax ([matplotlib.axes.Axes]): [Axes to draw on.]
+        density (tuple): [Result of price_density().]
+    """
+    fig.suptitle("Price Density")
+    ax.set_title("Price of Sales over Years")
+    ax.set_xlabel("Years")
+    ax.set_ylabel("Price €")
+    if density is None:
+        return
+
+    counts, date_edges, price_edges = density
+    # Empty cells are left blank -> masked before the log colour scale.
+    mesh = ax.pcolormesh(date_edges, price_edges, np.ma.masked_equal(counts.T, 0), norm=LogNorm(), shading="flat")
+    ax.set_yscale("log")
+    fig.colorbar(mesh, ax=ax, label="Sales")
+
+def draw_daily_sales(fig, ax, daily):
+    """Function to draw the sales per day as a line (downsampled by daily_sales()).
+
+    Args:
+        fig ([matplotlib.figure.Figure]): [Figure to draw on.]
+        ax ([matplotlib.axes.Axes]): [Axes to draw on.]
+        daily (tuple): [Result of daily_sales().]
+    """
+    fig.suptitle("Line Plot")
+    ax.set_title("Sales per Day")
+    ax.set_xlabel("Years")
+    ax.set_ylabel("Sales")
+    ax.plot(*daily, linewidth=0.8)
+
+def draw_price_histogram(fig, ax, title:str, edges, counts, scale:str):
+    """Function to draw a price histogram with its cumulative distribution (CDF) on a second y axis.
+
+    Args:
+        fig ([matplotlib.figure.Figure]): [Figure to draw on.]
+        ax ([matplotlib.axes.Axes]): [Axes to draw on.]
+        title (str): [Title of the plot eg. Dublin.]
+        edges ([np.ndarray]): [Bin edges -> see ppr_histogram.price_bin_edges().]
+        counts ([np.ndarray]): [Sales in each bin.]
+        scale (str): [Bin scale "fixed" or "log". Log bins are drawn on a log price axis so they have equal widths.]
+    """
+    fig.suptitle("Histogram / CDF")
+    ax.set_title(f"Price of Sales - {title} ({scale} bins)")
+    ax.set_xlabel("Price €")
+    ax.set_ylabel("Sales")
+    ax.stairs(counts, edges, fill=True, alpha=0.6)
+    if scale == "log":
+        ax.set_xscale("log")
+
+    # CDF at the upper edge of each bin, starting from 0 at the lowest edge.
+    cdf_ax = ax.twinx()
+    cdf_ax.plot(edges, np.concatenate(([0.0], cumulative_fraction(counts))), color="tab:red", linewidth=1)
+    cdf_ax.set_ylim(0, 1.02)
+    cdf_ax.set_ylabel("Cumulative fraction of sales")
+
+def month_plot_jobs(series, years, output_dir:str, prefix:str = ""):
+    """Function to create one Total Sales Per Month job for each year that has sales.
+
+    Args:
+        series (MonthlySeries): [Monthly series of the table -> see ppr_timeseries.]
+        years ([list]): [Years to plot.]
+        output_dir (str): [Directory to save the plots in.]
+        prefix (str, optional): [Added to the start of each file name]. Defaults to "".
+
+    Returns:
+        jobs[list]: [Plot jobs for render_plots().]
+    """
+    jobs = []
+    for year in years:
+        to_output = series.monthly_counts(year)
+        if len(to_output) > 0:
+            data = (f"TotalSalesPerMonthIn{year}", to_output, series.monthly_rolling(year))
+            jobs.append(("months", os.path.join(output_dir, f"{prefix}TotalSalesPerMonthIn{year}.png"), data))
+    return jobs
+
+def plot_jobs(results:dict, plots:list, output_dir:str, prefix:str = ""):
+    """Function to turn the chosen plots into jobs for render_plots().
+
+    Args:
+        results (dict): [Dictionary created by analyse_register() in the main program.]
+        plots (list): [Plot names from PLOT_NAMES. "months" gives one plot per year.]
+        output_dir (str): [Directory to save the plots in.]
+        prefix (str, optional): [Added to the start of each file name eg. name of the register file]. Defaults to "".
+
+    Raises:
+        ValueError: [Raised for an unknown plot name.]
+
+    Returns:
+        jobs[list]: [List of (plot name, file path, data) tuples.]
+    """
+    jobs = []
+    for plot in plots:
+        if plot == "years":
+            jobs.append(("years", os.path.join(output_dir, prefix + "ScatterSalesAndYears.png"), results["Monthly Series"].yearly_counts()))
+        elif plot == "counties":
+            jobs.append(("counties", os.path.join(output_dir, prefix + "BarChartSalesAndCounties.png"), county_totals(results["County Monthly Series"])))
+        elif plot == "months":
+            jobs += month_plot_jobs(results["Monthly Series"], results["Yearly Range"], output_dir, prefix)
+        elif plot == "pie":
+            jobs.append(("pie", os.path.join(output_dir, prefix + "SalesOverYearsPieChart.png"), results["Year Dict"]))
+        elif plot == "prices":
+            sales = results["Sales"]
+            jobs.append(("prices", os.path.join(output_dir, prefix + "PriceDensityOverYears.png"), price_density(sales.dates, sales.prices)))
+        elif plot == "daily":
+            jobs.append(("daily", os.path.join(output_dir, prefix + "SalesPerDay.png"), daily_sales(results["Sales"].dates)))
+        elif plot == "histogram":
+            # One plot of the whole register for each bin scale.
+            for scale, histogram in results["Price Histograms"].items():
+                path = os.path.join(output_dir, f"{prefix}PriceHistogram{scale.title()}.png")
+                jobs.append(("histogram", path, ("All Sales", histogram.edges, histogram.counts, scale)))
+        else:
+            raise ValueError(f"Unknown plot: {plot}")
+    return jobs
+
+def render_plot(job:tuple):
+    """Function to render a single plot job to its file with the Agg canvas.
+
+    Args:
+        job (tuple): [(plot name, file path, data) created by plot_jobs().]
+
+    Returns:
+        path[str]: [Path of the saved plot.]
+    """
+    plot, path, data = job
+
+    # A Figure that is not created through pyplot is never kept by pyplot -> it is freed once this function returns.
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.subplots()
+    if plot == "years":
+        draw_years_scatter(fig, ax, data)
+    elif plot == "counties":
+        draw_counties_bar(fig, ax, data)
+    elif plot == "months":
+        draw_month_bar(fig, ax, *data)
+    elif plot == "prices":
+        draw_price_density(fig, ax, data)
+    elif plot == "daily":
+        draw_daily_sales(fig, ax, data)
+    elif plot == "histogram":
+        draw_price_histogram(fig, ax, *data)
+    else:
+        draw_years_pie(fig, ax, data)
+
+    fig.savefig(path, bbox_inches="tight")
+    fig.clear()
+    return path
+
+def render_plots(jobs:list, workers:int = 1):
+    """Function to render plot jobs in worker processes.
+
+    Args:
+        jobs (list): [Plot jobs created by plot_jobs().]
+        workers (int, optional): [Worker processes. 1 renders in this process]. Defaults to 1.
+
+    Returns:
+        paths[list]: [Paths of the saved plots in job order.]
+    """
+    if workers <= 1 or len(jobs) <= 1:
+        return [render_plot(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        return list(executor.map(render_plot, jobs))
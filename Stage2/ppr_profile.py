@@ -0,0 +1,190 @@
+# Timing, memory and progress instrumentation for the Property Price Register program.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Measure each stage of the program (ingest, parse, frequency, aggregates, std dev, plots..) while it runs.
+
+    Profiler.span() is wrapped around a stage:
+        with PROFILER.span("parse", rows) as span:
+            ...
+    and records the wall time, CPU time, rows per second and memory of the stage. Memory is taken from the peak resident set
+    size of the process (resource module, not on Windows):
+        Process Peak RSS MB -> the peak since the process started, at the end of the stage (the same for every later stage
+                               that does not raise it).
+        RSS Growth MB       -> how much the stage raised that peak, ie. memory the stage needed above anything used before.
+    When tracemalloc tracing is on, Peak Traced MB is the peak of memory allocated by Python during the stage. Spans can be
+    nested -> a stage inside another does not hide its peak from the outer stage.
+
+    ProgressReporter prints the % complete of a long loop at most once per interval (eg. every 2 seconds). The clock is only
+    read every CHECK_ROWS rows, so the cost per row is one integer comparison.
+
+    The command line options of the main program (--profile, --profile-report, --tracemalloc, --cprofile) print the stage
+    report and / or save it as JSON, and save cProfile stats when the program ends -> see install_profiling().
+"""
+from contextlib import contextmanager
+import atexit
+import cProfile
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Rows between clock readings of ProgressReporter.
+CHECK_ROWS = 4096
+# Seconds between progress messages.
+PROGRESS_INTERVAL = 2.0
+
+def peak_rss_mb():
+    """Function to return the peak resident set size of the process in MB. None where the resource module is not available."""
+    if resource is None:
+        return None
+    # ru_maxrss is in bytes on macOS and in kB on Linux.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+class Profiler:
+    """Record of the timed stages of the program.
+
+    Attributes:
+        spans (list): [One dictionary per finished span with the keys Stage, Wall Seconds, CPU Seconds, Rows, Rows Per Second,
+        Process Peak RSS MB, RSS Growth MB and Peak Traced MB.]
+    """
+
+    def __init__(self):
+        self.spans = []
+        # Highest traced memory seen so far by each open span, innermost last.
+        self._traced_peaks = []
+
+    @contextmanager
+    def span(self, stage:str, rows:int = 0):
+        """Context manager to time a stage. The rows can also be set on the yielded dictionary when only known at the end.
+
+        Args:
+            stage (str): [Name of the stage eg. parse.]
+            rows (int, optional): [Rows handled by the stage -> used for rows per second]. Defaults to 0.
+
+        Yields:
+            record[dictionary]: [Record of the span. Filled in when the stage ends.]
+        """
+        record = {"Stage": stage, "Rows": rows}
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            # Keep the peak the enclosing span has reached so far before resetting the peak for this span.
+            if self._traced_peaks:
+                self._traced_peaks[-1] = max(self._traced_peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._traced_peaks.append(0)
+        rss_started = peak_rss_mb()
+        wall_started, cpu_started = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            wall = time.perf_counter() - wall_started
+            record["Wall Seconds"] = wall
+            record["CPU Seconds"] = time.process_time() - cpu_started
+            record["Rows Per Second"] = record["Rows"] / wall if record["Rows"] and wall > 0 else None
+            rss = peak_rss_mb()
+            record["Process Peak RSS MB"] = rss
+            record["RSS Growth MB"] = rss - rss_started if rss is not None else None
+            record["Peak Traced MB"] = None
+            if tracing:
+                peak = max(self._traced_peaks.pop(), tracemalloc.get_traced_memory()[1])
+                if self._traced_peaks:
+                    self._traced_peaks[-1] = max(self._traced_peaks[-1], peak)
+                record["Peak Traced MB"] = peak / (1 << 20)
+            self.spans.append(record)
+
+    def add(self, spans:list, prefix:str = ""):
+        """Function to add spans recorded elsewhere eg. in a batch worker process. prefix is added to each stage name."""
+        self.spans += [dict(span, Stage=prefix + span["Stage"]) for span in spans]
+
+    def clear(self):
+        """Function to remove the recorded spans."""
+        self.spans = []
+
+    def report(self):
+        """Function to print the recorded spans as a table."""
+        width = max([len(span["Stage"]) for span in self.spans] + [5]) + 2
+        print(f"{'Stage':<{width}}|   Wall s   |   CPU s   |        Rows/s   |   Process Peak RSS MB   |   RSS Growth MB   |   Peak Traced MB")
+        for span in self.spans:
+            rows_per_second = f"{span['Rows Per Second']:>15,.0f}" if span["Rows Per Second"] else f"{'-':>15}"
+            rss = f"{span['Process Peak RSS MB']:>21.1f}" if span["Process Peak RSS MB"] is not None else f"{'-':>21}"
+            growth = f"{span['RSS Growth MB']:>15.1f}" if span["RSS Growth MB"] is not None else f"{'-':>15}"
+            traced = f"{span['Peak Traced MB']:>14.1f}" if span["Peak Traced MB"] is not None else f"{'-':>14}"
+            print(f"{span['Stage']:<{width}}|  {span['Wall Seconds']:>8.3f}  |  {span['CPU Seconds']:>7.3f}  | {rows_per_second} |  {rss}  |  {growth}  |  {traced}")
+
+    def write(self, path:str):
+        """Function to save the recorded spans as a JSON file."""
+        with open(path, "w", encoding="utf-8") as json_out:
+            json.dump({"Spans": self.spans}, json_out, indent=2)
+
+# Profiler used by the main program and its modules.
+PROFILER = Profiler()
+
+class ProgressReporter:
+    """Progress messages of a loop, printed at most once per interval.
+
+    Attributes:
+        total (int): [Rows in the loop.]
+        interval (float): [Seconds between messages.]
+        label (str): [Start of each message.]
+    """
+
+    def __init__(self, total:int, interval:float = PROGRESS_INTERVAL, label:str = "Processing Status"):
+        self.total = total
+        self.interval = interval
+        self.label = label
+        self._next_check = CHECK_ROWS
+        self._next_print = time.monotonic() + interval
+
+    def update(self, index:int):
+        """Function to report the rows done so far. Only reads the clock every CHECK_ROWS rows."""
+        if index < self._next_check:
+            return
+        self._next_check = index + CHECK_ROWS
+        now = time.monotonic()
+        if now >= self._next_print:
+            self._next_print = now + self.interval
+            print(f"{self.label}: {index * 100 // max(self.total, 1)}% complete..")
+
+    def finish(self):
+        """Function to print the final message of the loop."""
+        print(f"{self.label}: 100% complete..")
+
+def install_profiling(report:bool = False, report_path:str = None, trace_memory:bool = False, cprofile_path:str = None):
+    """Function to switch on the optional profiling of the main program. The reports are written when the program ends.
+
+    Args:
+        report (bool, optional): [Print the stage report at exit]. Defaults to False.
+        report_path (str, optional): [JSON file to save the stage report to at exit]. Defaults to None.
+        trace_memory (bool, optional): [Trace Python memory allocation (tracemalloc) -> Peak Traced MB. Slows the program]. Defaults to False.
+        cprofile_path (str, optional): [File to save cProfile stats to at exit (pstats format)]. Defaults to None.
+    """
+    if trace_memory:
+        tracemalloc.start()
+
+    profile = None
+    if cprofile_path:
+        profile = cProfile.Profile()
+        profile.enable()
+
+    def write_reports():
+        if profile is not None:
+            profile.disable()
+            profile.dump_stats(cprofile_path)
+            print(f"Program status: cProfile stats saved to {cprofile_path}. Top functions by cumulative time:")
+            pstats.Stats(profile).sort_stats("cumulative").print_stats(15)
+        if report:
+            print()
+            PROFILER.report()
+        if report_path:
+            PROFILER.write(report_path)
+            print(f"Program status: Stage report saved to {report_path}")
+
+    atexit.register(write_reports)
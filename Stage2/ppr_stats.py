@@ -0,0 +1,598 @@
+# Statistics engine for the price column of the Property Price Register.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Calculate the price statistics shown in the main menu (options 1 - 4 and 7) from the numpy price array.
+
+    The price array is walked once in fixed size chunks. Each chunk gives its sum, min, max and sum of squared deviations
+    from the chunk mean, and the chunks are combined with the parallel variance formula (Chan et al.). No temporary list
+    or array the size of the whole price column is ever created.
+
+    RunningStats holds the same values (count, sum, mean, M2, min, max) as an accumulator. Prices are added one at a time
+    (Welford) or a chunk at a time, and accumulators of separate chunks / runs are combined exactly with merge() (Chan), so
+    the standard deviation is known without keeping or re-reading the prices. The SalesAggregator keeps one per year,
+    month and county as well as one for every price. statistics_from_running() gives the menu statistics of an accumulator.
+
+    The month and year standard deviations of the main program measure the deviation of each price from
+    (sum / total months) and (sum / total years). These are found from the same pass using:
+        sum((x - c) ** 2) = M2 + n * (mean - c) ** 2
+
+    Median / quartiles / percentiles (option 5) are found by selection (numpy partition) instead of sorting, overall and per
+    group (county / year). price_mode() gives the most frequent price of any subset of the prices.
+    QuantileSketch gives approximate quantiles in bounded memory for price streams. The SalesAggregator feeds one for every
+    price and one per year and county while the rows are read -> the median sketch mode of batch runs (--median sketch)
+    reads its quartiles and medians from them without the price column.
+
+    The most common price points (mode and the table of option 6) come from one pass over the prices without a dictionary of
+    every distinct price:
+        top_prices()      -> exact. Prices are counted with numpy and the N most common taken with a heap.
+        SpaceSaving       -> approximate, bounded memory (Space-Saving heavy hitters). Keeps at most capacity prices, so any
+                             price sold more than count / capacity times is always kept. Fed a chunk at a time while the
+                             rows are read (ppr_aggregate) and sketches of separate runs can be merged.
+"""
+import heapq
+import math
+import numpy as np
+
+# Rows per chunk when walking the price array -> large enough for numpy to be efficient, small enough to stay in cache.
+CHUNK_SIZE = 1 << 16
+
+class RunningStats:
+    """Mergeable accumulator of the count, sum, mean, M2 (sum of squared deviations from the mean), min and max of prices.
+
+    Attributes:
+        count (int): [Number of prices added.]
+        total (float): [Sum of the prices.]
+        mean (float): [Mean of the prices.]
+        m2 (float): [Sum of squared deviations from the mean.]
+        minimum (float): [Lowest price. inf when empty.]
+        maximum (float): [Highest price. -inf when empty.]
+    """
+
+    def __init__(self, count:int = 0, total:float = 0.0, mean:float = 0.0, m2:float = 0.0, minimum:float = math.inf, maximum:float = -math.inf):
+        self.count = count
+        self.total = total
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def add(self, price:float):
+        """Function to add a single price (Welford update)."""
+        self.count += 1
+        self.total += price
+        delta = price - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (price - self.mean)
+        if price < self.minimum:
+            self.minimum = price
+        if price > self.maximum:
+            self.maximum = price
+
+    def add_many(self, prices, chunk_size:int = CHUNK_SIZE):
+        """Function to add an array of prices, one chunk at a time with numpy.
+
+        Args:
+            prices (np.ndarray): [float64 prices.]
+            chunk_size (int, optional): [Prices handled per step]. Defaults to CHUNK_SIZE.
+
+        Returns:
+            self[RunningStats]: [This accumulator, updated.]
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        for start in range(0, len(prices), chunk_size):
+            chunk = prices[start:start + chunk_size]
+            chunk_sum = float(chunk.sum())
+            deviations = chunk - chunk_sum / len(chunk)
+            self.merge(RunningStats(len(chunk), chunk_sum, chunk_sum / len(chunk), float(np.dot(deviations, deviations)),
+                                    float(chunk.min()), float(chunk.max())))
+        return self
+
+    def merge(self, other):
+        """Function to combine the accumulator of another set of prices into this one (parallel variance formula).
+
+        Args:
+            other (RunningStats): [Accumulator of a different chunk / run of prices.]
+
+        Returns:
+            self[RunningStats]: [This accumulator, updated.]
+        """
+        if other.count == 0:
+            return self
+
+        combined = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / combined
+        self.mean += delta * other.count / combined
+        self.count = combined
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    def variance(self):
+        """Function to return the sample variance. 0 with fewer than 2 prices."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def std_dev(self):
+        """Function to return the sample standard deviation. 0 with fewer than 2 prices."""
+        return math.sqrt(self.variance())
+
+    def deviation_sum(self, centre:float):
+        """Function to return the sum of squared deviations of the prices from any value -> M2 + n * (mean - centre) ** 2."""
+        return self.m2 + self.count * (self.mean - centre) ** 2
+
+    def to_array(self):
+        """Function to return the accumulator as a float64 array (count, sum, mean, M2, min, max) eg. for the cache."""
+        return np.array([self.count, self.total, self.mean, self.m2, self.minimum, self.maximum], dtype=np.float64)
+
+    @classmethod
+    def from_array(cls, values):
+        """Function to create an accumulator from an array written by to_array()."""
+        count, total, mean, m2, minimum, maximum = np.asarray(values, dtype=np.float64).tolist()
+        return cls(int(count), total, mean, m2, minimum, maximum)
+
+    @classmethod
+    def grouped(cls, groups, prices):
+        """Function to build one accumulator per group of an array of prices in one vectorised pass.
+
+        Args:
+            groups (np.ndarray): [Group of each price eg. year or county code.]
+            prices (np.ndarray): [float64 prices.]
+
+        Returns:
+            group_stats[dictionary]: [Group -> RunningStats, in ascending group order.]
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        unique_groups, inverse = np.unique(groups, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(unique_groups))
+        sums = np.bincount(inverse, weights=prices, minlength=len(unique_groups))
+        means = sums / counts
+        deviations = prices - means[inverse]
+        m2 = np.bincount(inverse, weights=deviations * deviations, minlength=len(unique_groups))
+        minimums = np.full(len(unique_groups), math.inf)
+        maximums = np.full(len(unique_groups), -math.inf)
+        np.minimum.at(minimums, inverse, prices)
+        np.maximum.at(maximums, inverse, prices)
+
+        return {group: cls(count, total, mean, group_m2, minimum, maximum) for group, count, total, mean, group_m2, minimum, maximum
+                in zip(unique_groups.tolist(), counts.tolist(), sums.tolist(), means.tolist(), m2.tolist(), minimums.tolist(), maximums.tolist())}
+
+def statistics_from_running(stats:RunningStats, total_months:int = 0, total_years:int = 0):
+    """Function to calculate the menu price statistics from an accumulator, without the prices.
+
+    Args:
+        stats (RunningStats): [Accumulator of the prices.]
+        total_months (int, optional): [Total months between first and last date of sale. Used for the monthly deviation]. Defaults to 0.
+        total_years (int, optional): [Total years between first and last date of sale. Used for the yearly deviation]. Defaults to 0.
+
+    Returns:
+        price_stats[dictionary]: [Dictionary with the keys Sum, Count, Max, Min, Mean, Variance, Std Dev, Month Std Dev and Year Std Dev.
+        Standard deviations that cannot be calculated (too few values / months / years) are 0.]
+    """
+    count, total = stats.count, stats.total
+    price_stats = {"Sum": total, "Count": count, "Max": stats.maximum if count else 0.0, "Min": stats.minimum if count else 0.0,
+    "Mean": total / count if count else 0.0, "Variance": stats.variance(), "Std Dev": stats.std_dev(), "Month Std Dev": 0.0, "Year Std Dev": 0.0}
+
+    # Deviation from the mean per month / per year -> only possible with more than one month / year.
+    if count > 0 and total_months > 1:
+        price_stats["Month Std Dev"] = math.sqrt(stats.deviation_sum(total / total_months) / (total_months - 1))
+    if count > 0 and total_years > 1:
+        price_stats["Year Std Dev"] = math.sqrt(stats.deviation_sum(total / total_years) / (total_years - 1))
+
+    return price_stats
+
+def price_statistics(prices, total_months:int = 0, total_years:int = 0, chunk_size:int = CHUNK_SIZE):
+    """Function to calculate the sum, count, min, max, mean, variance and standard deviations of the prices.
+
+    Args:
+        prices (np.ndarray): [float64 price column.]
+        total_months (int, optional): [Total months between first and last date of sale. Used for the monthly deviation]. Defaults to 0.
+        total_years (int, optional): [Total years between first and last date of sale. Used for the yearly deviation]. Defaults to 0.
+        chunk_size (int, optional): [Prices handled per step]. Defaults to CHUNK_SIZE.
+
+    Returns:
+        price_stats[dictionary]: [Same dictionary as statistics_from_running().]
+    """
+    return statistics_from_running(RunningStats().add_many(prices, chunk_size), total_months, total_years)
+
+def price_quantiles(prices, quantiles=(0.25, 0.5, 0.75)):
+    """Function to calculate exact quantiles (median, quartiles, percentiles) of the prices.
+
+    The prices are not sorted. numpy partition (introselect) moves only the required order statistics into place, which is linear
+    in the number of prices. Quantiles falling between two prices are interpolated the same way as numpy.percentile (linear).
+
+    Args:
+        prices (np.ndarray): [float64 price column.]
+        quantiles (tuple, optional): [Quantiles between 0 and 1 eg. 0.5 for the median]. Defaults to the quartiles (0.25, 0.5, 0.75).
+
+    Raises:
+        ValueError: [Raised when a quantile is outside 0 - 1.]
+
+    Returns:
+        quantile_values[dictionary]: [Dictionary of quantile -> price. Prices are 0 when no prices are passed.]
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    count = len(prices)
+    if any(q < 0 or q > 1 for q in quantiles):
+        raise ValueError(f"Quantiles must be between 0 and 1: {quantiles}")
+    if count == 0:
+        return {q: 0.0 for q in quantiles}
+
+    positions = {q: q * (count - 1) for q in quantiles}
+    kth = sorted({math.floor(p) for p in positions.values()} | {math.ceil(p) for p in positions.values()})
+    partitioned = np.partition(prices, kth)
+
+    quantile_values = dict()
+    for q, position in positions.items():
+        lower, upper = math.floor(position), math.ceil(position)
+        quantile_values[q] = float(partitioned[lower] + (partitioned[upper] - partitioned[lower]) * (position - lower))
+
+    return quantile_values
+
+def grouped_quantiles(prices, groups, quantiles=(0.5,)):
+    """Function to calculate exact quantiles of the prices for each group eg. each county code or each year.
+
+    Rows are brought together by group with a stable argsort of the small integer group values (a radix sort in numpy, linear time)
+    and each group is then handled by price_quantiles().
+
+    Args:
+        prices (np.ndarray): [float64 price column.]
+        groups (np.ndarray): [Integer group of every row eg. SalesTable.codes["county"] or SalesTable.years().]
+        quantiles (tuple, optional): [Quantiles between 0 and 1]. Defaults to the median (0.5,).
+
+    Returns:
+        group_quantiles[dictionary]: [Dictionary of group -> dictionary of quantile -> price.]
+    """
+    return {group: price_quantiles(group_prices, quantiles) for group, group_prices in _group_slices(prices, groups)}
+
+def _group_slices(prices, groups):
+    # Yields (group, prices of the group) in increasing group order.
+    groups = np.asarray(groups)
+    if len(groups) == 0:
+        return
+
+    # 16 bit keys are radix sorted by numpy -> shift the groups down to start at 0 where they fit.
+    lowest = int(groups.min())
+    keys = groups.astype(np.int64) - lowest
+    if int(keys.max()) < (1 << 16):
+        keys = keys.astype(np.uint16)
+
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    grouped_prices = np.asarray(prices, dtype=np.float64)[order]
+    boundaries = np.flatnonzero(np.diff(sorted_keys)) + 1
+    starts = [0] + boundaries.tolist()
+    ends = boundaries.tolist() + [len(keys)]
+    for start, end in zip(starts, ends):
+        yield int(sorted_keys[start]) + lowest, grouped_prices[start:end]
+
+def price_frequency(prices):
+    """Function to count how often every price occurs.
+
+    Args:
+        prices (np.ndarray): [float64 price column.]
+
+    Returns:
+        price_counts[dictionary]: [Price -> frequency, prices in the order they are first seen.]
+    """
+    unique_prices, first_index, counts = np.unique(np.asarray(prices, dtype=np.float64), return_index=True, return_counts=True)
+    order = np.argsort(first_index, kind="stable")
+    return dict(zip(unique_prices[order].tolist(), counts[order].tolist()))
+
+def price_mode(prices):
+    """Function to find the most frequent price.
+
+    When prices share the highest frequency the one seen first is returned, the same as taking max() of a frequency dictionary
+    filled in row order.
+
+    Args:
+        prices (np.ndarray): [float64 price column.]
+
+    Returns:
+        mode[float], frequency[int]: [Most frequent price and how often it occurs. 0.0, 0 when no prices are passed.]
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(prices) == 0:
+        return 0.0, 0
+
+    unique_prices, first_index, counts = np.unique(prices, return_index=True, return_counts=True)
+    most = np.flatnonzero(counts == counts.max())
+    mode = most[np.argmin(first_index[most])]
+    return float(unique_prices[mode]), int(counts[mode])
+
+def top_prices(prices, n:int = 10):
+    """Function to find the n most common prices exactly.
+
+    Prices sharing a frequency are ordered by the row they are first seen in, so top_prices(prices, 1) gives price_mode().
+
+    Args:
+        prices (np.ndarray): [float64 price column.]
+        n (int, optional): [Number of prices to return]. Defaults to 10.
+
+    Returns:
+        top[list]: [List of (price, frequency) tuples, most common first.]
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(prices) == 0:
+        return []
+
+    unique_prices, first_index, counts = np.unique(prices, return_index=True, return_counts=True)
+    # Heap of the n largest (count, earliest row) -> O(u log n) instead of sorting every distinct price.
+    best = heapq.nlargest(n, range(len(unique_prices)), key=lambda i: (counts[i], -first_index[i]))
+    return [(float(unique_prices[i]), int(counts[i])) for i in best]
+
+class SpaceSaving:
+    """Approximate most common prices of a stream in bounded memory (Space-Saving heavy hitters, Metwally et al.).
+
+    At most capacity prices are counted. Prices are added a chunk at a time: each chunk is counted exactly with numpy and
+    merged into the table with the mergeable Space-Saving rule (Agarwal et al. / Cafaro et al.). A price missing from a full
+    table may have been sold up to that table's smallest count times, so it is given that count (recorded as its error), and
+    only the capacity largest counts are kept. Every count is an over-estimate by at most its error and at most
+    count / capacity, so any price sold more than count / capacity times is always kept. While there are no more than
+    capacity different prices the counts are exact.
+
+    Attributes:
+        capacity (int): [Maximum prices counted. Larger is more accurate and uses more memory.]
+        count (int): [Number of prices added.]
+        prices (np.ndarray): [float64 prices counted, most common first.]
+        counts (np.ndarray): [int64 estimated frequency of each price.]
+        errors (np.ndarray): [int64 maximum over-estimate of each count.]
+        first_seen (np.ndarray): [int64 row each price was first added at -> ties are ordered by it.]
+    """
+
+    def __init__(self, capacity:int = 1000):
+        self.capacity = capacity
+        self.count = 0
+        self.prices = np.zeros(0, dtype=np.float64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.errors = np.zeros(0, dtype=np.int64)
+        self.first_seen = np.zeros(0, dtype=np.int64)
+
+    def _floor(self):
+        # Most times a price missing from the table can have been added -> the smallest count once the table is full.
+        return int(self.counts[-1]) if len(self.counts) >= self.capacity else 0
+
+    def _keep(self, prices, counts, errors, first_seen):
+        # Keep the capacity largest counts, most common first and ties in the order first seen.
+        order = np.lexsort((first_seen, -counts))[:self.capacity]
+        self.prices, self.counts, self.errors, self.first_seen = prices[order], counts[order], errors[order], first_seen[order]
+
+    def update(self, price:float, count:int = 1):
+        """Function to add a price (count times) to the sketch."""
+        self.update_many(np.full(count, price, dtype=np.float64))
+
+    def update_many(self, prices, chunk_size:int = CHUNK_SIZE):
+        """Function to add an array of prices (in row order) to the sketch, one chunk at a time with numpy.
+
+        Args:
+            prices (np.ndarray): [float64 prices.]
+            chunk_size (int, optional): [Prices counted per step]. Defaults to CHUNK_SIZE.
+
+        Returns:
+            self[SpaceSaving]: [This sketch, updated.]
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        for start in range(0, len(prices), chunk_size):
+            chunk = SpaceSaving(self.capacity)
+            unique_prices, first_index, counts = np.unique(prices[start:start + chunk_size], return_index=True, return_counts=True)
+            chunk.count = min(chunk_size, len(prices) - start)
+            # Exact counts of the chunk -> the dropped prices were sold no more often than the smallest count kept.
+            chunk._keep(unique_prices, counts.astype(np.int64), np.zeros(len(counts), dtype=np.int64), first_index.astype(np.int64))
+            self.merge(chunk)
+        return self
+
+    def merge(self, other):
+        """Function to combine another sketch into this one (eg. built over a different chunk of the prices).
+
+        Args:
+            other (SpaceSaving): [Sketch of the prices that follow the prices of this sketch.]
+
+        Returns:
+            self[SpaceSaving]: [This sketch, updated.]
+        """
+        if other.count == 0:
+            return self
+
+        floors = self._floor(), other._floor()
+        prices, positions = np.unique(np.concatenate((self.prices, other.prices)), return_inverse=True)
+        mine, theirs = positions[:len(self.prices)], positions[len(self.prices):]
+
+        # Count of a price = its count in each sketch, or that sketch's floor where it is missing.
+        counts = np.full(len(prices), sum(floors), dtype=np.int64)
+        errors = np.full(len(prices), sum(floors), dtype=np.int64)
+        counts[mine] += self.counts - floors[0]
+        counts[theirs] += other.counts - floors[1]
+        errors[mine] += self.errors - floors[0]
+        errors[theirs] += other.errors - floors[1]
+        first_seen = np.full(len(prices), self.count + other.count, dtype=np.int64)
+        first_seen[theirs] = other.first_seen + self.count
+        first_seen[mine] = self.first_seen
+
+        self.count += other.count
+        self._keep(prices, counts, errors, first_seen)
+        return self
+
+    def top(self, n:int = 10):
+        """Function to return the n most common prices found so far.
+
+        Args:
+            n (int, optional): [Number of prices to return]. Defaults to 10.
+
+        Returns:
+            top[list]: [List of (price, estimated frequency, maximum over-estimate) tuples, most common first.]
+        """
+        return list(zip(self.prices[:n].tolist(), self.counts[:n].tolist(), self.errors[:n].tolist()))
+
+    def to_arrays(self):
+        """Function to convert the sketch to a dictionary of numpy arrays for np.savez() (see ppr_cache).
+
+        Returns:
+            arrays[dictionary]: [Array name -> numpy array.]
+        """
+        return {"sketch_details": np.array([self.capacity, self.count], dtype=np.int64), "sketch_prices": self.prices,
+                "sketch_counts": self.counts, "sketch_errors": self.errors, "sketch_first_seen": self.first_seen}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Function to create a sketch from the arrays written by to_arrays().
+
+        Args:
+            arrays ([np.lib.npyio.NpzFile]): [Loaded arrays.]
+
+        Returns:
+            sketch[SpaceSaving]: [Sketch rebuilt from the arrays.]
+        """
+        capacity, count = arrays["sketch_details"].tolist()
+        sketch = cls(capacity)
+        sketch.count = count
+        sketch.prices, sketch.counts = arrays["sketch_prices"], arrays["sketch_counts"]
+        sketch.errors, sketch.first_seen = arrays["sketch_errors"], arrays["sketch_first_seen"]
+        return sketch
+
+class QuantileSketch:
+    """Streaming approximate quantiles (KLL sketch) for price streams too large to hold in memory.
+
+    Prices are added with update() / update_many() one row or chunk at a time. Memory is bounded by roughly 3 * k values
+    no matter how many prices are added, and the rank error of quantile() is around 1.7 / k of the count.
+    Sketches built over separate chunks (parallel / incremental runs) can be combined with merge().
+
+    Attributes:
+        k (int): [Accuracy parameter. Larger is more accurate and uses more memory.]
+        count (int): [Number of prices added.]
+    """
+
+    def __init__(self, k:int = 200, seed:int = 0):
+        self.k = k
+        self.count = 0
+        # float64 arrays of the prices kept at each level. A price at level l stands for 2 ** l prices.
+        self._compactors = [np.zeros(0)]
+        # Compaction keeps the odd or even items at random -> seeded so runs are repeatable.
+        self._random = np.random.default_rng(seed)
+
+    def _capacity(self, level:int):
+        depth = len(self._compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    def _max_size(self):
+        return sum(self._capacity(level) for level in range(len(self._compactors)))
+
+    def _compress(self):
+        while sum(len(c) for c in self._compactors) >= self._max_size():
+            for level, compactor in enumerate(self._compactors):
+                if len(compactor) >= self._capacity(level):
+                    if level + 1 == len(self._compactors):
+                        self._compactors.append(np.zeros(0))
+                    compactor = np.sort(compactor)
+                    # An odd item out stays at this level. It is picked at random -> always keeping the largest (or
+                    # smallest) would push the lower levels up (or down).
+                    keep = compactor[:0]
+                    if len(compactor) % 2:
+                        position = int(self._random.integers(len(compactor)))
+                        keep = compactor[position:position + 1]
+                        compactor = np.delete(compactor, position)
+                    offset = int(self._random.integers(0, 2))
+                    self._compactors[level + 1] = np.concatenate((self._compactors[level + 1], compactor[offset::2]))
+                    self._compactors[level] = keep
+                    break
+
+    def update(self, price:float):
+        """Function to add a single price to the sketch."""
+        self.update_many([price])
+
+    def update_many(self, prices):
+        """Function to add a chunk of prices (any iterable or numpy array) to the sketch.
+
+        Each CHUNK_SIZE block goes onto level 0 in one step and is then compacted with numpy, so there is no Python call per price.
+
+        Returns:
+            self[QuantileSketch]: [This sketch, updated.]
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        for start in range(0, len(prices), CHUNK_SIZE):
+            chunk = prices[start:start + CHUNK_SIZE]
+            self._compactors[0] = np.concatenate((self._compactors[0], chunk))
+            self.count += len(chunk)
+            if len(self._compactors[0]) >= self._capacity(0):
+                self._compress()
+        return self
+
+    def merge(self, other):
+        """Function to combine another sketch into this one. Both sketches should use the same k.
+
+        Args:
+            other (QuantileSketch): [Sketch built over a different chunk of the prices.]
+
+        Returns:
+            self[QuantileSketch]: [This sketch, updated.]
+        """
+        while len(self._compactors) < len(other._compactors):
+            self._compactors.append(np.zeros(0))
+        for level, compactor in enumerate(other._compactors):
+            self._compactors[level] = np.concatenate((self._compactors[level], compactor))
+        self.count += other.count
+        self._compress()
+        return self
+
+    def quantile(self, q:float):
+        """Function to return the approximate price at quantile q (0 - 1). Returns 0 for an empty sketch."""
+        values = np.concatenate(self._compactors)
+        if not len(values):
+            return 0.0
+
+        weights = np.concatenate([np.full(len(compactor), 1 << level, dtype=np.int64) for level, compactor in enumerate(self._compactors)])
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(weights[order])
+        position = int(np.searchsorted(cumulative, q * cumulative[-1], side="left"))
+        return float(values[order[min(position, len(values) - 1)]])
+
+    def quantiles(self, quantiles=(0.25, 0.5, 0.75)):
+        """Function to return several approximate quantiles -> dictionary of quantile -> price (same keys as price_quantiles())."""
+        return {q: self.quantile(q) for q in quantiles}
+
+    def to_arrays(self, prefix:str = "quantile_sketch"):
+        """Function to convert the sketch to a dictionary of numpy arrays for np.savez() (see ppr_cache).
+
+        Args:
+            prefix (str, optional): [Start of the array names, so several sketches fit in one file]. Defaults to "quantile_sketch".
+
+        Returns:
+            arrays[dictionary]: [Array name -> numpy array.]
+        """
+        return {f"{prefix}_details": np.array([self.k, self.count], dtype=np.int64),
+                f"{prefix}_levels": np.array([len(compactor) for compactor in self._compactors], dtype=np.int64),
+                f"{prefix}_values": np.concatenate(self._compactors)}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix:str = "quantile_sketch"):
+        """Function to create a sketch from the arrays written by to_arrays() with the same prefix.
+
+        Args:
+            arrays ([np.lib.npyio.NpzFile]): [Loaded arrays.]
+            prefix (str, optional): [Start of the array names]. Defaults to "quantile_sketch".
+
+        Returns:
+            sketch[QuantileSketch]: [Sketch rebuilt from the arrays.]
+        """
+        k, count = arrays[f"{prefix}_details"].tolist()
+        sketch = cls(k)
+        sketch.count = count
+        ends = np.cumsum(arrays[f"{prefix}_levels"]).tolist()
+        values = arrays[f"{prefix}_values"]
+        sketch._compactors = [values[start:end] for start, end in zip([0] + ends[:-1], ends)] or [np.zeros(0)]
+        return sketch
+
+    @classmethod
+    def grouped(cls, groups, prices, k:int = 200):
+        """Function to build one sketch per group of an array of prices.
+
+        Args:
+            groups (np.ndarray): [Group of each price eg. year or county.]
+            prices (np.ndarray): [float64 prices.]
+            k (int, optional): [Accuracy parameter of the sketches]. Defaults to 200.
+
+        Returns:
+            group_sketches[dictionary]: [Group -> QuantileSketch, in ascending group order.]
+        """
+        unique_groups, inverse = np.unique(groups, return_inverse=True)
+        return {unique_groups[code].item(): cls(k).update_many(group_prices) for code, group_prices in _group_slices(prices, inverse)}
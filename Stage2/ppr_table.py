@@ -0,0 +1,207 @@
+# Columnar in-memory table for the parsed Property Price Register.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Hold the parsed register as typed columns instead of one Python list of str / float objects per field.
+
+    Columns:
+        dates   -> int32 array of day ordinals (datetime.date.toordinal()).
+        prices  -> float64 array of sale prices.
+        county, description, fullmarketprice, vatexcl -> small integer codes into a list of the unique values
+        (dictionary encoding). The same handful of values repeat for every row so only the code is stored per row.
+
+    Rows are added with SalesTableBuilder.append() during the streaming ingest and the finished SalesTable is
+    created with build(). The calculate_* functions in the main program then work on the contiguous arrays.
+"""
+from array import array
+from datetime import date
+import numpy as np
+
+# Dictionary encoded columns of the register -> code arrays are stored per row, values once per table.
+CATEGORY_COLUMNS = ("county", "description", "fullmarketprice", "vatexcl")
+
+# Day ordinal of 01/01/1970 -> used to convert ordinals to numpy datetime64 values.
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+def dos_to_ordinal(dos:str):
+    """Function to convert a date of sale string (dd/mm/yyyy) to a day ordinal.
+
+    Args:
+        dos (str): [Date of sale as read from the csv file.]
+
+    Returns:
+        ordinal[int]: [Day ordinal of the date.]
+    """
+    return date(int(dos[6:10]), int(dos[3:5]), int(dos[0:2])).toordinal()
+
+def ordinal_to_dos(ordinal:int):
+    """Function to convert a day ordinal back to the date of sale string format (dd/mm/yyyy).
+
+    Args:
+        ordinal (int): [Day ordinal.]
+
+    Returns:
+        dos[str]: [Date in the format dd/mm/yyyy.]
+    """
+    return date.fromordinal(int(ordinal)).strftime("%d/%m/%Y")
+
+def ordinals_to_year_month(ordinals):
+    """Function to convert an array of day ordinals to year and month arrays in one vectorised pass.
+
+    Args:
+        ordinals ([np.ndarray]): [Array of day ordinals.]
+
+    Returns:
+        years[np.ndarray], months[np.ndarray]: [Year (eg. 2020) and month (1 - 12) of each ordinal.]
+    """
+    month_index = (np.asarray(ordinals, dtype=np.int64) - EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    return (month_index // 12 + 1970).astype(np.int32), (month_index % 12 + 1).astype(np.int32)
+
+class SalesTable:
+    """Columnar, typed table of the parsed register.
+
+    Attributes:
+        dates (np.ndarray): [int32 day ordinals for each row.]
+        prices (np.ndarray): [float64 price for each row.]
+        codes (dict): [Column name -> uint8 / uint16 code array for each dictionary encoded column.]
+        categories (dict): [Column name -> list of the unique values. A code is an index into this list.]
+    """
+
+    def __init__(self, dates, prices, codes:dict, categories:dict):
+        self.dates = dates
+        self.prices = prices
+        self.codes = codes
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.prices)
+
+    def years(self):
+        """Function to return the year of sale of every row as an int32 array."""
+        return ordinals_to_year_month(self.dates)[0]
+
+    def month_keys(self):
+        """Function to return a chronologically ordered month number (year * 12 + month - 1) for every row."""
+        years, months = ordinals_to_year_month(self.dates)
+        return years * 12 + months - 1
+
+    def dos(self, row:int):
+        """Function to return the date of sale string (dd/mm/yyyy) of a single row."""
+        return ordinal_to_dos(self.dates[row])
+
+    def value(self, column:str, row:int):
+        """Function to return the decoded string value of a dictionary encoded column for a single row."""
+        return self.categories[column][self.codes[column][row]]
+
+    def decode(self, column:str):
+        """Function to decode a dictionary encoded column back to a list of strings.
+
+        Args:
+            column (str): [One of CATEGORY_COLUMNS.]
+
+        Returns:
+            values[list]: [String value of the column for every row.]
+        """
+        values = self.categories[column]
+        return [values[code] for code in self.codes[column].tolist()]
+
+    def take(self, rows):
+        """Function to create a new table from a subset of the rows. Categories are shared with this table.
+
+        Args:
+            rows ([np.ndarray]): [Row positions or boolean mask to keep.]
+
+        Returns:
+            table[SalesTable]: [Table containing only the selected rows.]
+        """
+        return SalesTable(self.dates[rows], self.prices[rows], {name: codes[rows] for name, codes in self.codes.items()}, self.categories)
+
+class SalesTableBuilder:
+    """Append only builder used by the streaming ingest. Call build() once all rows are added."""
+
+    def __init__(self):
+        self._dates = array("i")
+        self._prices = array("d")
+        self._codes = {name: array("H") for name in CATEGORY_COLUMNS}
+        self._lookup = {name: dict() for name in CATEGORY_COLUMNS}
+        # Dates repeat for every sale on the same day -> convert each unique date string once.
+        self._ordinals = dict()
+
+    def __len__(self):
+        return len(self._prices)
+
+    def _encode(self, column:str, value:str):
+        lookup = self._lookup[column]
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(lookup)
+        return code
+
+    def append(self, d:str, c:str, f:str, v:str, descr:str, price:float):
+        """Function to add a parsed row to the table.
+
+        Args:
+            d (str): [Date of sale (dd/mm/yyyy).]
+            c (str): [County.]
+            f (str): [Not Full Market Price flag.]
+            v (str): [VAT Exclusive flag.]
+            descr (str): [Description of property.]
+            price (float): [Price of the sale.]
+        """
+        ordinal = self._ordinals.get(d)
+        if ordinal is None:
+            ordinal = self._ordinals[d] = dos_to_ordinal(d)
+
+        self._dates.append(ordinal)
+        self._prices.append(price)
+        self._codes["county"].append(self._encode("county", c))
+        self._codes["description"].append(self._encode("description", descr))
+        self._codes["fullmarketprice"].append(self._encode("fullmarketprice", f))
+        self._codes["vatexcl"].append(self._encode("vatexcl", v))
+
+    def build(self):
+        """Function to create the SalesTable from the appended rows.
+
+        Code arrays are narrowed to uint8 when a column has less than 256 unique values.
+
+        Returns:
+            table[SalesTable]: [Columnar table of all appended rows.]
+        """
+        codes = dict()
+        categories = dict()
+        for name in CATEGORY_COLUMNS:
+            categories[name] = list(self._lookup[name])
+            dtype = np.uint8 if len(categories[name]) < 256 else np.uint16
+            codes[name] = np.frombuffer(self._codes[name], dtype=np.uint16).astype(dtype)
+
+        # The date and price buffers are shared with the arrays rather than copied -> the builder must not be appended to again.
+        return SalesTable(np.frombuffer(self._dates, dtype=np.int32), np.frombuffer(self._prices, dtype=np.float64), codes, categories)
+
+def concat_tables(tables:list):
+    """Function to join tables end to end (eg. the partial tables of a parallel ingest) keeping the row order.
+
+    The dictionary encoded columns of each table are re-coded into one shared list of values, kept in the order the values
+    are first seen.
+
+    Args:
+        tables (list): [SalesTable objects in row order.]
+
+    Returns:
+        table[SalesTable]: [Single table with the rows of every table.]
+    """
+    codes = dict()
+    categories = dict()
+    for name in CATEGORY_COLUMNS:
+        lookup = dict()
+        recoded = []
+        for table in tables:
+            mapping = np.array([lookup.setdefault(value, len(lookup)) for value in table.categories[name]], dtype=np.uint16)
+            recoded.append(mapping[table.codes[name]] if len(mapping) else np.zeros(0, dtype=np.uint16))
+        categories[name] = list(lookup)
+        dtype = np.uint8 if len(lookup) < 256 else np.uint16
+        codes[name] = np.concatenate(recoded).astype(dtype) if recoded else np.zeros(0, dtype=dtype)
+
+    dates = np.concatenate([table.dates for table in tables]) if tables else np.zeros(0, dtype=np.int32)
+    prices = np.concatenate([table.prices for table in tables]) if tables else np.zeros(0, dtype=np.float64)
+
+    return SalesTable(dates, prices, codes, categories)
@@ -0,0 +1,240 @@
+# Monthly time series of the Property Price Register.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Arrange the sales as chronologically ordered monthly series (sales, total value, mean and median price) for the whole
+    register and for each county, with moving averages and year over year change.
+
+    A series holds one value for every month from the first to the last month of sale, so months without sales are kept
+    (0 sales, no mean / median) and position i is always first_month + i. This replaces the mm/yyyy keyed month dictionary,
+    which is in file order and does not sort by date.
+
+    Building (monthly_series()):
+        The date index (ppr_index.DateIndex) already has the rows in date order and the offset of every month, so the monthly
+        sales are the differences of the offsets. Totals come from one np.bincount with the prices as weights and the medians
+        from selection on the month slices of the index (DateIndex.month_slice(), no sort of the prices). Counties use the
+        key county * months + month in the same bincount and grouped_quantiles().
+
+    Rolling windows and year over year change:
+        rolling_sum() slides a window over a series in O(n) -> each step adds the month entering the window and removes the month
+        leaving it (difference of running sums). The moving average of the mean price is total value / sales over the window,
+        so busy months count for more. year_over_year() compares each month to the same month 12 months earlier.
+
+    Usage:
+        series, county_series = monthly_series(sales, DateIndex(sales))
+        series.rolling(12)["Mean Price"], county_series["Dublin"].year_over_year()["Sales"]
+"""
+import numpy as np
+from ppr_stats import grouped_quantiles, price_quantiles
+
+# Windows of the moving averages in months.
+ROLLING_WINDOWS = (3, 6, 12)
+# Months between the values compared by year_over_year().
+YEAR_MONTHS = 12
+# Series in the rolling / year over year results.
+SERIES_NAMES = ("Sales", "Mean Price", "Median Price")
+
+def rolling_sum(values, window:int):
+    """Function to sum a sliding window over a series in one pass.
+
+    Args:
+        values (np.ndarray): [Series in month order.]
+        window (int): [Months in the window.]
+
+    Returns:
+        sums[np.ndarray]: [float64 sum of the window ending at each month. NaN until the window is full.]
+    """
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.full(len(values), np.nan)
+    if window < 1 or window > len(values):
+        return sums
+
+    # Running sum -> the window ending at month i is running[i + 1] - running[i + 1 - window].
+    running = np.concatenate(([0.0], np.cumsum(values)))
+    sums[window - 1:] = running[window:] - running[:-window]
+    return sums
+
+def rolling_mean(values, window:int, weights=None):
+    """Function to calculate the moving average of a series. Months without a value (NaN) are left out of their windows.
+
+    Args:
+        values (np.ndarray): [Series in month order eg. monthly median prices.]
+        window (int): [Months in the window.]
+        weights (np.ndarray, optional): [Weight of each month eg. sales -> weighted average]. Defaults to None -> every month
+        with a value counts once.
+
+    Returns:
+        averages[np.ndarray]: [Average of the window ending at each month. NaN until the window is full or when it has no values.]
+    """
+    values = np.asarray(values, dtype=np.float64)
+    known = ~np.isnan(values)
+    weights = known.astype(np.float64) if weights is None else np.where(known, weights, 0.0)
+    totals = rolling_sum(np.where(known, values, 0.0) * weights, window)
+    counts = rolling_sum(weights, window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(counts > 0, totals / counts, np.nan)
+
+def year_over_year(values):
+    """Function to calculate the % change of every month against the same month a year earlier.
+
+    Args:
+        values (np.ndarray): [Series in month order.]
+
+    Returns:
+        changes[np.ndarray]: [% change. NaN for the first year and where the earlier month is 0 or has no value.]
+    """
+    values = np.asarray(values, dtype=np.float64)
+    changes = np.full(len(values), np.nan)
+    if len(values) > YEAR_MONTHS:
+        earlier, later = values[:-YEAR_MONTHS], values[YEAR_MONTHS:]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            changes[YEAR_MONTHS:] = np.where(earlier != 0, (later - earlier) / earlier * 100, np.nan)
+    return changes
+
+class MonthlySeries:
+    """Monthly series of the sales, from the first to the last month of sale.
+
+    Attributes:
+        first_month (int): [Month key (year * 12 + month - 1) of position 0.]
+        counts (np.ndarray): [Sales of each month.]
+        totals (np.ndarray): [Total value € of each month.]
+        means (np.ndarray): [Mean price of each month. NaN for months without sales.]
+        medians (np.ndarray): [Median price of each month. NaN for months without sales.]
+    """
+
+    def __init__(self, first_month:int, counts, totals, medians):
+        self.first_month = first_month
+        self.counts = counts
+        self.totals = totals
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.means = np.where(counts > 0, totals / counts, np.nan)
+        self.medians = medians
+
+    def __len__(self):
+        return len(self.counts)
+
+    def labels(self):
+        """Function to return the Month / Year (mm/yyyy) of every position."""
+        return [f"{key % 12 + 1:02d}/{key // 12}" for key in range(self.first_month, self.first_month + len(self))]
+
+    def _positions(self, start_year:int, end_year:int):
+        # Positions of the months of a range of years, limited to the series.
+        start = min(max(start_year * 12 - self.first_month, 0), len(self))
+        end = min(max(end_year * 12 + 12 - self.first_month, start), len(self))
+        return slice(start, end)
+
+    def monthly_counts(self, start_year:int, end_year:int = None):
+        """Function to return the sales of every month in a range of years, in date order.
+
+        Args:
+            start_year (int): [First year.]
+            end_year (int, optional): [Last year (included)]. Defaults to None -> start_year only.
+
+        Returns:
+            month_counts[dictionary]: [Month / Year (mm/yyyy) -> sales. Months without sales are left out.]
+        """
+        positions = self._positions(start_year, start_year if end_year is None else end_year)
+        labels = self.labels()[positions]
+        return {label: int(count) for label, count in zip(labels, self.counts[positions]) if count}
+
+    def monthly_rolling(self, start_year:int, end_year:int = None, window:int = ROLLING_WINDOWS[0]):
+        """Function to return the moving average of the sales for the months of monthly_counts(), in the same order.
+
+        Args:
+            start_year (int): [First year.]
+            end_year (int, optional): [Last year (included)]. Defaults to None -> start_year only.
+            window (int, optional): [Months in the window]. Defaults to the shortest of ROLLING_WINDOWS.
+
+        Returns:
+            month_averages[dictionary]: [Month / Year (mm/yyyy) -> average sales of the window ending that month (NaN until full).]
+        """
+        positions = self._positions(start_year, start_year if end_year is None else end_year)
+        labels, averages = self.labels()[positions], rolling_sum(self.counts, window)[positions] / window
+        return {label: float(average) for label, average, count in zip(labels, averages, self.counts[positions]) if count}
+
+    def yearly_counts(self):
+        """Function to return the sales of every year from the first to the last year of sale, in date order -> year -> sales."""
+        years = np.arange(self.first_month, self.first_month + len(self)) // 12
+        first_year = self.first_month // 12
+        counts = np.bincount(years - first_year, weights=self.counts) if len(self) else np.zeros(0)
+        return {first_year + offset: int(count) for offset, count in enumerate(counts)}
+
+    def rolling(self, window:int):
+        """Function to calculate the moving averages of the series over a window.
+
+        Args:
+            window (int): [Months in the window eg. 3, 6 or 12.]
+
+        Returns:
+            averages[dictionary]: [SERIES_NAMES -> average of the window ending at each month. Mean Price is weighted by sales.]
+        """
+        return {"Sales": rolling_sum(self.counts, window) / window,
+                "Mean Price": rolling_mean(self.means, window, self.counts),
+                "Median Price": rolling_mean(self.medians, window)}
+
+    def year_over_year(self):
+        """Function to calculate the year over year % change of the series -> SERIES_NAMES -> change at each month."""
+        return {"Sales": year_over_year(self.counts), "Mean Price": year_over_year(self.means), "Median Price": year_over_year(self.medians)}
+
+    def table_columns(self):
+        """Function to return the column names of table_rows()."""
+        columns = ["Month", "Sales", "Total Value €", "Mean Price €", "Median Price €"]
+        columns += [f"{name} {window}M Avg" for window in ROLLING_WINDOWS for name in SERIES_NAMES]
+        columns += [f"{name} YoY %" for name in SERIES_NAMES]
+        return columns
+
+    def table_rows(self):
+        """Function to list the series as rows (one per month) in table_columns() order. Missing values are None."""
+        columns = [self.counts, self.totals, self.means, self.medians]
+        for window in ROLLING_WINDOWS:
+            columns += list(self.rolling(window).values())
+        columns += list(self.year_over_year().values())
+
+        rows = []
+        for label, values in zip(self.labels(), zip(*[column.tolist() for column in columns])):
+            rows.append([label, int(values[0])] + [None if np.isnan(value) else round(value, 2) for value in values[1:]])
+        return rows
+
+def monthly_series(sales, date_index):
+    """Function to build the monthly series of the register and of each county.
+
+    Args:
+        sales (SalesTable): [Columnar table of the rows processed.]
+        date_index (DateIndex): [Date index of the table -> see ppr_index.]
+
+    Returns:
+        series[MonthlySeries]: [Series of the whole register.]
+        county_series[dictionary]: [County -> series, counties with sales in table order.]
+    """
+    counts = np.diff(date_index.month_offsets).astype(np.int64)
+    months = len(counts)
+    # Month position of every row in date order.
+    positions = np.repeat(np.arange(months, dtype=np.int64), counts)
+    prices = date_index.prices
+
+    totals = np.bincount(positions, weights=prices, minlength=months)
+    # The prices of a month are a slice of the date index -> selection on each slice, no grouping.
+    medians = np.full(months, np.nan)
+    for position, key in enumerate(range(date_index.first_month, date_index.first_month + months)):
+        month_prices = prices[date_index.month_slice(key // 12, key % 12 + 1)]
+        if len(month_prices):
+            medians[position] = price_quantiles(month_prices)[0.5]
+    series = MonthlySeries(date_index.first_month, counts, totals, medians)
+
+    # Counties -> the same counts with the key county * months + month position.
+    county_names = sales.categories["county"]
+    keys = sales.codes["county"][date_index.order].astype(np.int64) * months + positions
+    county_counts = np.bincount(keys, minlength=len(county_names) * months).reshape(len(county_names), months)
+    county_totals = np.bincount(keys, weights=prices, minlength=len(county_names) * months).reshape(len(county_names), months)
+    county_medians = np.full(len(county_names) * months, np.nan)
+    for key, quantiles in grouped_quantiles(prices, keys).items():
+        county_medians[key] = quantiles[0.5]
+    county_medians = county_medians.reshape(len(county_names), months)
+
+    county_series = {county: MonthlySeries(date_index.first_month, county_counts[code], county_totals[code], county_medians[code])
+                     for code, county in enumerate(county_names) if county_counts[code].any()}
+    return series, county_series
+
+def county_totals(county_series:dict):
+    """Function to return the total sales of every county -> county -> sales, in the order of county_series."""
+    return {county: int(series.counts.sum()) for county, series in county_series.items()}
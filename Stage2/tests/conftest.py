@@ -0,0 +1,54 @@
+# Shared fixtures of the Property Price Register tests.
+# Created by Andy Blankley
+
+"""Purpose of this Module:
+    Put the Stage2 modules on the import path and write small synthetic registers in the format of the PPR csv file
+    (both price prefixes, optional postal code, a few very common prices) for the tests.
+"""
+import datetime
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+HEADER = "Date of Sale (dd/mm/yyyy),Address,Postal Code,County,Price (�),Not Full Market Price,VAT Exclusive,Description of Property\n"
+COUNTIES = ("Dublin", "Cork", "Galway", "Kildare", "Meath", "Wicklow", "Limerick", "Louth", "Clare", "Mayo")
+DESCRIPTIONS = ("Second-Hand Dwelling house /Apartment", "New Dwelling house /Apartment")
+COMMON_PRICES = (150000, 200000, 250000, 315000)
+# Rows of the default register -> enough for several date ranges and more different prices than the sketch capacity.
+REGISTER_ROWS = 3000
+
+def register_lines(rows:int, seed:int = 1):
+    # Lines of a synthetic register (no header), dates in order over about 4 years.
+    generator = random.Random(seed)
+    day = datetime.date(2013, 1, 1).toordinal()
+    lines = []
+    for row in range(rows):
+        day += generator.random() < 0.5
+        county = generator.choice(COUNTIES)
+        postcode = f"Dublin {generator.randint(1, 24)}" if county == "Dublin" and generator.random() < 0.5 else ""
+        price = generator.choice(COMMON_PRICES) if generator.random() < 0.3 else round(generator.lognormvariate(12.3, 0.5), 2)
+        lines.append(f'{datetime.date.fromordinal(day):%d/%m/%Y},"{generator.randint(1, 200)} Main St, Town{row % 50}",{postcode},'
+                     f'{county},"{generator.choice("€�")}{price:,.2f}",{generator.choice(("No", "Yes"))},'
+                     f'{generator.choice(("No", "Yes"))},{generator.choice(DESCRIPTIONS)}\n')
+    return lines
+
+def write_register(path, lines:list):
+    # Write the header and lines as the register csv file.
+    with open(path, "w", encoding="utf-8", newline="\n") as csv_out:
+        csv_out.write(HEADER)
+        csv_out.writelines(lines)
+    return str(path)
+
+@pytest.fixture
+def lines():
+    """Lines of the default synthetic register."""
+    return register_lines(REGISTER_ROWS)
+
+@pytest.fixture
+def register(tmp_path, lines):
+    """Path of the default synthetic register csv."""
+    return write_register(tmp_path / "PPR_ALL.csv", lines)
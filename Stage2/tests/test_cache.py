@@ -0,0 +1,95 @@
+# Tests of the parse cache and the incremental append of rows in ppr_cache.
+# Created by Andy Blankley
+
+import numpy as np
+import pytest
+from ppr_cache import append_register_cache, load_register_cache, read_cache_meta, read_checkpoint, save_register_cache
+from ppr_cube import SalesCube
+from ppr_ingest import parse_register_parallel
+from ppr_table import CATEGORY_COLUMNS
+
+def _parse_and_cache(path:str):
+    # Parse the whole file and cache it, as load_register() does on a first run.
+    sales, aggregator = parse_register_parallel(path, 1)
+    cube = SalesCube.from_table(sales)
+    save_register_cache(path, len(sales), len(sales), sales, aggregator, cube)
+    return sales, aggregator, cube
+
+def _append_lines(path:str, lines:list):
+    with open(path, "a", encoding="utf-8", newline="\n") as csv_out:
+        csv_out.writelines(lines)
+
+def _assert_same_register(appended, parsed):
+    sales, aggregator, cube = appended
+    full_sales, full_aggregator, full_cube = parsed
+
+    assert np.array_equal(sales.dates, full_sales.dates)
+    assert np.array_equal(sales.prices, full_sales.prices)
+    for name in CATEGORY_COLUMNS:
+        assert sales.decode(name) == full_sales.decode(name)
+
+    assert aggregator.rows == full_aggregator.rows
+    assert aggregator.year_counts == full_aggregator.year_counts
+    assert aggregator.month_counts == full_aggregator.month_counts
+    assert aggregator.county_counts == full_aggregator.county_counts
+    assert aggregator.highest_sale == full_aggregator.highest_sale
+    assert aggregator.lowest_sale == full_aggregator.lowest_sale
+    assert aggregator.price_stats.std_dev() == pytest.approx(full_aggregator.price_stats.std_dev())
+    assert [price for price, _, _ in aggregator.price_sketch.top(4)] == [price for price, _, _ in full_aggregator.price_sketch.top(4)]
+
+    for dimension in ("year", "month", "county", "description"):
+        assert cube.counts(dimension) == full_cube.counts(dimension)
+
+def test_cache_round_trip(register, lines):
+    parsed = _parse_and_cache(register)
+    meta = read_cache_meta(register)
+    assert meta is not None and meta["Rows"] == meta["Total Rows"] == len(lines)
+    _assert_same_register(load_register_cache(register, len(lines), meta), parsed)
+    # A cache of the whole file is not used for a shorter run.
+    assert load_register_cache(register, 100, meta) is None
+
+def test_changed_file_is_not_loaded(register):
+    _parse_and_cache(register)
+    # Same size, different content -> the fingerprint hash no longer matches.
+    with open(register, "r+b") as raw_out:
+        raw_out.seek(-20, 2)
+        raw_out.write(b"X")
+    assert read_cache_meta(register) is None
+
+@pytest.mark.parametrize("batches", [1, 3])
+def test_append_matches_full_parse(tmp_path, register, lines, batches):
+    path = str(tmp_path / "growing.csv")
+    with open(register, encoding="utf-8") as csv_in:
+        header = csv_in.readline()
+    with open(path, "w", encoding="utf-8", newline="\n") as csv_out:
+        csv_out.write(header)
+        csv_out.writelines(lines[:1000])
+    _parse_and_cache(path)
+
+    for part in np.array_split(np.arange(1000, len(lines)), batches):
+        _append_lines(path, lines[part[0]:part[-1] + 1])
+        checkpoint = read_checkpoint(path)
+        assert checkpoint is not None and checkpoint["Rows"] == part[0]
+        appended = append_register_cache(path, checkpoint)
+        assert appended is not None and appended[3] == len(part)
+
+    _assert_same_register(appended[:3], _parse_and_cache(register))
+
+    # The appended cache is now a cache of the whole file.
+    meta = read_cache_meta(path)
+    assert meta is not None and meta["Rows"] == len(lines) and read_checkpoint(path) is None
+    _assert_same_register(load_register_cache(path, len(lines), meta), _parse_and_cache(register))
+
+@pytest.mark.parametrize("position", [0, 150000, -30])
+def test_changed_row_is_not_appended(tmp_path, lines, position):
+    path = str(tmp_path / "changed.csv")
+    with open(path, "w", encoding="utf-8", newline="\n") as csv_out:
+        csv_out.writelines(["header\n"] + lines[:2900])
+    _parse_and_cache(path)
+
+    # Edit the first, a middle or the last saved row and add rows -> the saved rows no longer match the file.
+    with open(path, "r+b") as raw_out:
+        raw_out.seek(len("header\n") + position if position >= 0 else position, 0 if position >= 0 else 2)
+        raw_out.write(b"3")
+    _append_lines(path, lines[2900:])
+    assert read_checkpoint(path) is None
@@ -0,0 +1,72 @@
+# Tests of the bitmap filters and row predicate in ppr_filter.
+# Created by Andy Blankley
+
+import numpy as np
+import pytest
+from ppr_filter import FILTER_COLUMNS, BitmapIndex, filter_predicate, match_filter_values, parse_year_range
+from ppr_ingest import parse_register_parallel
+
+FILTERS = [
+    {},
+    {"county": ["Dublin"]},
+    {"county": ["dublin", "Cork"], "year": [2014]},
+    {"description": ["New Dwelling house /Apartment"], "vatexcl": ["Yes"], "year": parse_year_range("2013-2014")},
+    {"county": ["Galway"], "fullmarketprice": ["No"], "year": None},
+    {"county": ["Nowhere"]},
+]
+
+@pytest.fixture
+def sales(register):
+    """Parsed table of the default synthetic register."""
+    return parse_register_parallel(register, 1)[0]
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_predicate_matches_bitmap_select(sales, filters):
+    index = BitmapIndex(sales)
+    # Text values of the bitmaps are matched exactly -> use the stored spelling, as match_values() does for typed text.
+    bitmap_filters = {column: None if accepted is None else [match for value in accepted for match in index.match_values(column, str(value))]
+                      for column, accepted in filters.items()}
+    selected = index.row_numbers(index.select(bitmap_filters))
+
+    predicate = filter_predicate(filters)
+    columns = [sales.decode(column) for column in FILTER_COLUMNS[:-1]] + [sales.years().tolist()]
+    matched = np.array([row for row, values in enumerate(zip(*columns)) if predicate(values)], dtype=np.int64)
+
+    assert np.array_equal(selected, matched)
+    assert index.count(index.select(bitmap_filters)) == len(matched)
+
+def test_match_filter_values_prefers_exact_match():
+    values = ["Dublin", "Dun Laoghaire", "Cork"]
+    assert match_filter_values(values, " dublin ") == ["Dublin"]
+    assert match_filter_values(values, "du") == ["Dublin", "Dun Laoghaire"]
+    assert match_filter_values(values, "Kerry") == []
+
+@pytest.mark.parametrize("typed", [{"description": ["new"]}, {"county": ["DUBLIN", "cor"], "vatexcl": ["yes"]},
+                                   {"fullmarketprice": ["no"], "year": [2014, 2015]}, {"county": ["Nowhere"]}])
+def test_batch_filter_matches_menu_filter(sales, typed):
+    # Batch --filter text is resolved by the same rule as the menu -> the predicate and the bitmaps select the same rows.
+    index = BitmapIndex(sales)
+    menu_filters = {column: accepted if column == "year" else [value for text in accepted for value in index.match_values(column, text)]
+                    for column, accepted in typed.items()}
+    selected = index.row_numbers(index.select(menu_filters))
+
+    predicate = filter_predicate(index.resolve_filters(typed))
+    columns = [sales.decode(column) for column in FILTER_COLUMNS[:-1]] + [sales.years().tolist()]
+    matched = [row for row, values in enumerate(zip(*columns)) if predicate(values)]
+
+    assert np.array_equal(selected, np.array(matched, dtype=np.int64))
+    assert len(matched) > 0 or typed == {"county": ["Nowhere"]}
+
+def test_unknown_column_is_rejected(sales):
+    with pytest.raises(ValueError):
+        BitmapIndex(sales).select({"address": ["Main St"]})
+    with pytest.raises(ValueError):
+        filter_predicate({"address": ["Main St"]})
+    with pytest.raises(ValueError):
+        BitmapIndex(sales).resolve_filters({"address": ["Main St"]})
+
+def test_parse_year_range():
+    assert parse_year_range("2019") == [2019]
+    assert parse_year_range(" 2014-2016 ") == [2014, 2015, 2016]
+    with pytest.raises(ValueError):
+        parse_year_range("20x4")
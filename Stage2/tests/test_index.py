@@ -0,0 +1,53 @@
+# Tests of the date range queries of ppr_index.DateIndex.
+# Created by Andy Blankley
+
+from datetime import date
+
+import numpy as np
+import pytest
+from ppr_index import DateIndex
+from ppr_ingest import parse_register_parallel
+from ppr_table import ordinals_to_year_month
+
+@pytest.fixture
+def sales(register):
+    """Parsed table of the default synthetic register."""
+    return parse_register_parallel(register, 1)[0]
+
+def _rows_between(sales, first:date, last:date):
+    # Table rows sold between two dates (both included), by a scan of the whole date column.
+    return np.flatnonzero((sales.dates >= first.toordinal()) & (sales.dates <= last.toordinal()))
+
+@pytest.mark.parametrize("first, last", [(date(2014, 4, 1), date(2014, 6, 30)), (date(2013, 2, 14), date(2015, 11, 3)),
+                                         (date(2010, 1, 1), date(2012, 12, 31)), (date(2014, 5, 5), date(2014, 5, 5))])
+def test_date_slice_matches_scan(sales, first, last):
+    index = DateIndex(sales)
+    rows = index.date_slice(first, last)
+    # Contiguous slice of the sorted rows, same rows (in file order for each day) as the scan.
+    assert np.array_equal(np.sort(index.rows(rows)), _rows_between(sales, first, last))
+    assert np.all(np.diff(index.dates[rows]) >= 0)
+
+def test_quarter_slice_statistics(sales):
+    index = DateIndex(sales)
+    rows = index.quarter_slice(2014, 2)
+    assert rows == index.date_slice(date(2014, 4, 1), date(2014, 6, 30))
+
+    prices = sales.prices[_rows_between(sales, date(2014, 4, 1), date(2014, 6, 30))]
+    price_stats = index.slice_statistics(rows)
+    assert price_stats["Count"] == len(prices) > 0
+    assert price_stats["Median"] == pytest.approx(np.median(prices))
+    assert price_stats["Lower Quartile"] == pytest.approx(np.percentile(prices, 25))
+    assert price_stats["Std Dev"] == pytest.approx(np.std(prices, ddof=1))
+    assert index.slice_statistics(index.quarter_slice(2030, 1))["Count"] == 0
+
+def test_monthly_counts_match_scan(sales):
+    years, months = ordinals_to_year_month(sales.dates)
+    expected = dict()
+    for year, month in sorted(zip(years.tolist(), months.tolist())):
+        if 2014 <= year <= 2016:
+            key = f"{month:02d}/{year}"
+            expected[key] = expected.get(key, 0) + 1
+
+    month_counts = DateIndex(sales).monthly_counts(2014, 2016)
+    assert month_counts == expected
+    assert list(month_counts) == list(expected)
@@ -0,0 +1,96 @@
+# Tests of the memory mapped and parallel byte range parse in ppr_ingest.
+# Created by Andy Blankley
+
+import numpy as np
+import pytest
+import ppr_ingest
+from AssignmentP3_Stage2 import ingest_register
+from conftest import write_register
+from ppr_ingest import MappedRegister, count_register_rows, parse_register_parallel, split_register_ranges, stream_register_rows
+from ppr_table import CATEGORY_COLUMNS
+
+def _serial_parse(path:str, rows:int):
+    # Line by line parse of the menu program.
+    with open(path, encoding="utf-8") as csv_in:
+        csv_in.readline()
+        return ingest_register(csv_in, rows, rows)
+
+@pytest.fixture
+def small_ranges(monkeypatch):
+    """Allow byte ranges of 4 KB so the small test register is split into several ranges."""
+    monkeypatch.setattr(ppr_ingest, "MIN_RANGE_BYTES", 4096)
+
+def test_ranges_cover_the_file_on_line_boundaries(register, small_ranges):
+    ranges = split_register_ranges(register, 5)
+    with open(register, "rb") as raw_in:
+        content = raw_in.read()
+
+    assert len(ranges) == 5
+    assert ranges[0][0] == content.index(b"\n") + 1 and ranges[-1][1] == len(content)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and content[end - 1:end] == b"\n"
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1 << 20])
+@pytest.mark.parametrize("ending", ["\n", "\n\n", "\r\n\r\n", ""])
+def test_row_count_skips_blank_lines(tmp_path, lines, chunk_size, ending):
+    # Blank lines (also \r\n ones) in the middle and at the end, and a last line with or without a newline.
+    body = lines[:40] + ["\n", "\r\n"] + [line.replace("\n", "\r\n") for line in lines[40:60]] + ["\n"] + lines[60:80]
+    path = write_register(tmp_path / "blank.csv", body[:-1] + [body[-1].rstrip("\n") + ending])
+
+    with open(path, encoding="utf-8") as csv_in:
+        csv_in.readline()
+        streamed = sum(1 for _ in stream_register_rows(csv_in))
+    with MappedRegister(path) as register:
+        mapped = register.count_rows()
+    assert count_register_rows(path, chunk_size) == streamed == mapped == 80
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_parallel_parse_matches_serial_parse(register, lines, small_ranges, workers, capsys):
+    serial_sales, serial_aggregator = _serial_parse(register, len(lines))
+    sales, aggregator = parse_register_parallel(register, workers)
+    capsys.readouterr()
+
+    assert np.array_equal(sales.dates, serial_sales.dates)
+    assert np.array_equal(sales.prices, serial_sales.prices)
+    for name in CATEGORY_COLUMNS:
+        assert sales.decode(name) == serial_sales.decode(name)
+
+    assert aggregator.rows == serial_aggregator.rows == len(lines)
+    assert aggregator.year_counts == serial_aggregator.year_counts
+    assert aggregator.month_counts == serial_aggregator.month_counts
+    assert aggregator.county_counts == serial_aggregator.county_counts
+    assert aggregator.highest_sale == serial_aggregator.highest_sale
+    assert aggregator.lowest_sale == serial_aggregator.lowest_sale
+    assert aggregator.price_stats.mean == pytest.approx(serial_aggregator.price_stats.mean)
+    assert aggregator.price_stats.std_dev() == pytest.approx(serial_aggregator.price_stats.std_dev())
+    for county, stats in serial_aggregator.county_stats.items():
+        assert aggregator.county_stats[county].std_dev() == pytest.approx(stats.std_dev())
+    # The common prices are far above the sketch error -> same top prices in both.
+    assert aggregator.price_sketch.top(4) == serial_aggregator.price_sketch.top(4)
+
+def _pad_line(line:str, row:int):
+    # Spaces around the postcode, county, full market price, vat exclusive and description values, and \r\n on some lines.
+    values = line.rstrip("\n").split('"')
+    for position in (2, 4):
+        values[position] = ",".join(f" {value}  " if value else value for value in values[position].split(","))
+    return '"'.join(values) + ("\r\n" if row % 3 == 0 else "\n")
+
+def test_mapped_parse_matches_serial_parse_with_padded_fields(tmp_path, lines, capsys):
+    path = write_register(tmp_path / "padded.csv", [_pad_line(line, row) for row, line in enumerate(lines)])
+    serial_sales, serial_aggregator = _serial_parse(path, len(lines))
+    with MappedRegister(path) as register:
+        sales, aggregator = register.read_register()
+        postcodes = register.read_columns(("postcode",))["postcode"]
+    capsys.readouterr()
+
+    for name in CATEGORY_COLUMNS:
+        assert sales.decode(name) == serial_sales.decode(name)
+        assert all(value == value.strip() for value in sales.categories[name])
+    assert np.array_equal(sales.prices, serial_sales.prices)
+    assert aggregator.county_counts == serial_aggregator.county_counts
+    assert aggregator.highest_sale == serial_aggregator.highest_sale
+
+    with open(path, encoding="utf-8") as csv_in:
+        csv_in.readline()
+        serial_postcodes = [row[2] for row in stream_register_rows(csv_in)]
+    assert [postcodes[1][code] for code in postcodes[0]] == serial_postcodes
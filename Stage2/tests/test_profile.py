@@ -0,0 +1,39 @@
+# Tests of the stage spans of ppr_profile.
+# Created by Andy Blankley
+
+import tracemalloc
+
+import numpy as np
+import pytest
+from ppr_profile import Profiler, peak_rss_mb
+
+@pytest.fixture
+def tracing():
+    """Trace Python memory allocation for one test."""
+    tracemalloc.start()
+    yield
+    tracemalloc.stop()
+
+def test_nested_span_keeps_outer_traced_peak(tracing):
+    profiler = Profiler()
+    with profiler.span("outer"):
+        large = np.ones(4_000_000)
+        del large
+        with profiler.span("inner"):
+            small = np.ones(100_000)
+            del small
+
+    inner, outer = profiler.spans
+    assert (inner["Stage"], outer["Stage"]) == ("inner", "outer")
+    # 32 MB allocated by the outer span before the inner span reset the tracemalloc peak.
+    assert outer["Peak Traced MB"] >= 30 > inner["Peak Traced MB"]
+
+def test_rss_growth_is_within_the_span():
+    if peak_rss_mb() is None:
+        pytest.skip("resource module not available")
+    profiler = Profiler()
+    with profiler.span("first"):
+        pass
+    record = profiler.spans[0]
+    assert record["RSS Growth MB"] >= 0
+    assert record["Process Peak RSS MB"] >= record["RSS Growth MB"]
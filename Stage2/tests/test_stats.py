@@ -0,0 +1,120 @@
+# Tests of the mergeable accumulators and sketches in ppr_stats.
+# Created by Andy Blankley
+
+from collections import Counter
+
+import numpy as np
+import pytest
+from ppr_stats import QuantileSketch, RunningStats, SpaceSaving
+
+def _skewed_prices(rows:int, seed:int = 0):
+    # A few very common prices among many prices seen once or twice.
+    generator = np.random.default_rng(seed)
+    common = generator.choice([150000.0, 200000.0, 250000.0, 315000.0], size=rows // 4)
+    rare = np.round(generator.lognormal(12.3, 0.5, size=rows - len(common)), 2)
+    prices = np.concatenate((common, rare))
+    generator.shuffle(prices)
+    return prices
+
+def test_space_saving_exact_below_capacity():
+    prices = np.repeat([100.0, 200.0, 300.0, 400.0], [5, 9, 9, 1])
+    sketch = SpaceSaving(10).update_many(prices, chunk_size=7)
+    # Ties in the order first seen, no over-estimate while the sketch is not full.
+    assert sketch.top() == [(200.0, 9, 0), (300.0, 9, 0), (100.0, 5, 0), (400.0, 1, 0)]
+
+@pytest.mark.parametrize("capacity, chunk_size", [(50, 64), (200, 1000), (1000, 1 << 16)])
+def test_space_saving_error_bounds(capacity, chunk_size):
+    prices = _skewed_prices(20000)
+    exact = Counter(prices.tolist())
+    sketch = SpaceSaving(capacity).update_many(prices, chunk_size)
+
+    assert sketch.count == len(prices)
+    assert len(sketch.prices) <= capacity
+    for price, count, error in zip(sketch.prices.tolist(), sketch.counts.tolist(), sketch.errors.tolist()):
+        # Estimate never below the true count and over by no more than its error, which is at most N / capacity.
+        assert count - error <= exact[price] <= count
+        assert error <= len(prices) / capacity
+    # Every price sold more than N / capacity times is kept.
+    assert {price for price, count in exact.items() if count > len(prices) / capacity} <= set(sketch.prices.tolist())
+
+def test_space_saving_merge_of_chunks_matches_one_pass():
+    prices = _skewed_prices(12000, seed=1)
+    single = SpaceSaving(100).update_many(prices)
+    merged = SpaceSaving(100).update_many(prices[:5000]).merge(SpaceSaving(100).update_many(prices[5000:]))
+
+    exact = Counter(prices.tolist())
+    assert merged.count == single.count == len(prices)
+    assert [price for price, _, _ in merged.top(4)] == [price for price, _, _ in single.top(4)]
+    for price, count, error in merged.top(100):
+        assert count - error <= exact[price] <= count
+
+def test_space_saving_arrays_round_trip():
+    sketch = SpaceSaving(30).update_many(_skewed_prices(2000))
+    restored = SpaceSaving.from_arrays(sketch.to_arrays())
+    assert restored.capacity == sketch.capacity and restored.count == sketch.count
+    assert restored.top(30) == sketch.top(30)
+
+def test_running_stats_merge_matches_single_pass():
+    prices = _skewed_prices(10000, seed=2)
+    single = RunningStats().add_many(prices)
+
+    merged = RunningStats()
+    for part in np.array_split(prices, 7):
+        partial = RunningStats()
+        for price in part[:10].tolist():
+            partial.add(price)
+        merged.merge(partial.add_many(part[10:], chunk_size=333))
+
+    assert merged.count == single.count == len(prices)
+    assert merged.total == pytest.approx(single.total)
+    assert merged.mean == pytest.approx(single.mean)
+    assert merged.variance() == pytest.approx(single.variance())
+    assert merged.std_dev() == pytest.approx(np.std(prices, ddof=1))
+    assert (merged.minimum, merged.maximum) == (single.minimum, single.maximum) == (prices.min(), prices.max())
+
+def test_running_stats_grouped_matches_per_group():
+    prices = _skewed_prices(5000, seed=3)
+    groups = np.arange(len(prices)) % 7
+    for group, stats in RunningStats.grouped(groups, prices).items():
+        expected = RunningStats().add_many(prices[groups == group])
+        assert stats.count == expected.count
+        assert stats.mean == pytest.approx(expected.mean)
+        assert stats.m2 == pytest.approx(expected.m2)
+
+def _rank_error(sketch, prices, q:float):
+    # Signed rank error of the sketch quantile as a fraction of the prices.
+    return (np.searchsorted(np.sort(prices), sketch.quantile(q)) - q * len(prices)) / len(prices)
+
+@pytest.mark.parametrize("q", [0.1, 0.25, 0.5, 0.75, 0.9])
+def test_quantile_sketch_rank_error(q):
+    prices = _skewed_prices(50000, seed=4)
+    sketch = QuantileSketch(200).update_many(prices)
+    assert sketch.count == len(prices)
+    assert abs(_rank_error(sketch, prices, q)) < 0.02
+
+def test_quantile_sketch_odd_item_is_not_always_the_largest():
+    # 5 prices fill level 0 of a k = 5 sketch -> 4 are compacted to level 1 and the odd one stays at level 0.
+    kept = set()
+    for seed in range(30):
+        arrays = QuantileSketch(5, seed).update_many([5.0, 1.0, 4.0, 2.0, 3.0]).to_arrays()
+        assert arrays["quantile_sketch_levels"].tolist() == [1, 2]
+        kept.add(float(arrays["quantile_sketch_values"][0]))
+    # Keeping the largest every time would push the lower levels up.
+    assert kept == {1.0, 2.0, 3.0, 4.0, 5.0}
+
+def test_quantile_sketch_merge_and_round_trip():
+    prices = _skewed_prices(30000, seed=6)
+    merged = QuantileSketch().update_many(prices[:10000]).merge(QuantileSketch().update_many(prices[10000:]))
+    assert merged.count == len(prices)
+    assert abs(_rank_error(merged, prices, 0.5)) < 0.02
+
+    restored = QuantileSketch.from_arrays(merged.to_arrays("test"), "test")
+    assert restored.count == merged.count and restored.quantiles() == merged.quantiles()
+    assert QuantileSketch().quantile(0.5) == 0.0
+
+def test_quantile_sketch_grouped():
+    prices = _skewed_prices(6000, seed=7)
+    groups = np.arange(len(prices)) % 3
+    for group, sketch in QuantileSketch.grouped(groups, prices).items():
+        assert sketch.count == np.count_nonzero(groups == group)
+        assert abs(_rank_error(sketch, prices[groups == group], 0.5)) < 0.03